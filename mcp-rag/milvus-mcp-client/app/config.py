@@ -38,11 +38,58 @@ logger.add(
 DEFAULT_CHUNK_SIZE = int(os.getenv("DEFAULT_CHUNK_SIZE", "1000"))  # 默认文本分块大小
 DEFAULT_CHUNK_OVERLAP = int(os.getenv("DEFAULT_CHUNK_OVERLAP", "200"))  # 默认分块重叠大小
 MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "5"))  # 默认最大检索结果数
+SEARCH_RERANK = os.getenv("SEARCH_RERANK", "false").lower() == "true"  # 检索时由服务器用交叉编码器重排序（需服务器设置RERANK_MODEL）
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))  # 单次检索调用的超时秒数，超时的检索按无结果处理
+SEARCH_MMR = os.getenv("SEARCH_MMR", "false").lower() == "true"  # 检索时取回向量，按MMR挑选相关且彼此不重复的上下文（需要numpy）
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # MMR中相关性的权重，越小越偏向多样性
+MMR_DUPLICATE_THRESHOLD = float(os.getenv("MMR_DUPLICATE_THRESHOLD", "0.92"))  # 与已选上下文的余弦相似度达到该值时视为近似重复并丢弃，1表示不丢弃
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # 回答生成时上下文的token预算
+CONTEXT_MAX_ITEM_TOKENS = int(os.getenv("CONTEXT_MAX_ITEM_TOKENS", "800"))  # 单个上下文项的token上限，超出的文本块只保留最相关的句子
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")  # 计数使用的tiktoken编码，未安装tiktoken时按字符数估算
+DECOMPOSE_SKIP_MAX_LENGTH = int(os.getenv("DECOMPOSE_SKIP_MAX_LENGTH", "20"))  # 不超过该长度（汉字数+英文词数）的单一意图问题不拆解，0表示总是拆解
+DECOMPOSE_CACHE_SIZE = int(os.getenv("DECOMPOSE_CACHE_SIZE", "256"))  # 缓存的问题拆解结果数，0表示不缓存
+
+# 语义答案缓存配置：相似度超过阈值的历史问题直接返回缓存的回答（需安装sentence-transformers）
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "all-MiniLM-L6-v2")  # 问题向量化模型
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # 命中所需的最低余弦相似度
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))  # 条目有效秒数，0表示不过期
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))  # 最多保存的条目数
+SEMANTIC_CACHE_FILE = os.getenv("SEMANTIC_CACHE_FILE", "semantic_cache.json")  # 持久化文件
+
+# 知识库写入参数
+STORE_CONCURRENCY = int(os.getenv("STORE_CONCURRENCY", "4"))  # 同时进行的存储调用数
+STORE_BATCH_SIZE = int(os.getenv("STORE_BATCH_SIZE", "32"))  # 服务器提供批量工具时每次调用存储的条数，1表示逐条存储
+STORE_MAX_RETRIES = int(os.getenv("STORE_MAX_RETRIES", "3"))  # 每次存储调用的最大尝试次数
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))  # 长文本分段提取FAQ时同时进行的LLM调用数
+
+# 目录导入参数：通配符以逗号分隔，匹配相对于导入目录的路径
+INGEST_READ_WORKERS = int(os.getenv("INGEST_READ_WORKERS", "8"))  # 读取和切分文件的线程数
+INGEST_INCLUDE = [p.strip() for p in os.getenv("INGEST_INCLUDE", "*.md,*.txt").split(",") if p.strip()]  # 要导入的文件
+INGEST_EXCLUDE = [p.strip() for p in os.getenv("INGEST_EXCLUDE", ".*").split(",") if p.strip()]  # 跳过的文件和目录
+
+# 增量导入参数：记录每个文件的文本块哈希和ID，重新导入时只存储变化的文本块和FAQ
+# 默认关闭：之前以固定长度切分导入的文件第一次增量导入时会重新切分并全部存储，需先按README迁移
+INCREMENTAL_INGEST = os.getenv("INCREMENTAL_INGEST", "false").lower() == "true"
+# build --file 的文本块索引，相对路径相对于客户端目录而不是当前目录；目录导入记录在目录的清单中
+CHUNK_INDEX_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    os.getenv("CHUNK_INDEX_FILE", "chunk_index.jsonl")
+)
+CONTENT_DEFINED_CHUNKING = os.getenv("CONTENT_DEFINED_CHUNKING", "true").lower() == "true"  # 增量导入时按内容定义的边界切分，局部修改只影响附近的文本块；其他导入按固定长度切分
+
+# 链路追踪配置：file 将 span 以 JSON Lines 追加到 TRACING_FILE，otlp 通过 OTLP/HTTP 发送，为空则关闭
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "")
+TRACING_FILE = os.getenv("TRACING_FILE", "client_traces.jsonl")
 
 # 定义MCP服务器可用的工具
 TOOLS = {
     "storeKnowledge": "将文档存储到知识库中以便日后检索",
     "searchKnowledge": "在知识库中搜索相似文档",
     "storeFAQ": "将文档存储到常见问题解答库中以便日后检索",
-    "searchFAQ": "在常见问题解答库中搜索相似文档"
+    "searchFAQ": "在常见问题解答库中搜索相似文档",
+    "storeKnowledgeBatch": "批量将文档存储到知识库中",
+    "storeFAQBatch": "批量将常见问题解答存储到FAQ库中",
+    "deleteKnowledge": "按ID删除知识库中的文档",
+    "deleteFAQ": "按ID删除FAQ库中的常见问题解答"
 } 
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+目录导入清单模块
+功能：记录目录导入中已经完整写入知识库的文件
+作用：导入中断后重新运行时跳过已完成的文件，从中断处继续，而不是重新导入整个目录
+主要功能：
+1. 清单为 JSON Lines 文件，每完成一个文件追加一行，中断时最多丢失正在写入的一行
+2. 文件以相对于导入目录的路径记录，同一路径以最后一行为准
+3. 文件的大小或修改时间与清单记录不同，或上次导入有内容写入失败时视为未完成，重新导入
+4. 增量导入时记录还包括各文本块的哈希和ID，重新导入时据此只写入变化的部分
+"""
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+# 清单的默认文件名，位于导入目录下，遍历目录时跳过
+MANIFEST_FILE_NAME = ".ingest_manifest.jsonl"
+# 过时的行超过记录数加该值时重写清单
+COMPACT_MIN_LINES = 1000
+
+
+class IngestManifest:
+    """目录导入清单，记录已完成文件的大小、修改时间和写入条数"""
+
+    def __init__(self, path: str):
+        """
+        参数:
+            path: 清单文件路径
+        """
+        self.path = path
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        # 上次运行中断在一行中间时，下一行之前先补换行
+        self._pending_newline = False
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._entries)
+
+    def is_complete(self, rel_path: str, size: int, mtime: float) -> bool:
+        """
+        文件是否已经按当前内容完成导入
+
+        参数:
+            rel_path: 相对于导入目录的路径
+            size: 文件当前的字节数
+            mtime: 文件当前的修改时间
+
+        返回:
+            清单中有该文件、大小和修改时间一致且上次导入全部成功时返回True
+        """
+        self._load()
+        entry = self._entries.get(rel_path)
+        return (
+            entry is not None and entry.get("size") == size and entry.get("mtime") == mtime
+            and entry.get("complete", True)
+        )
+
+    def get(self, rel_path: str) -> Optional[Dict[str, Any]]:
+        """返回文件在清单中的记录，没有时返回None"""
+        self._load()
+        return self._entries.get(rel_path)
+
+    def paths(self) -> List[str]:
+        """清单中记录的所有文件"""
+        self._load()
+        return list(self._entries)
+
+    def remove(self, rel_path: str) -> None:
+        """删除文件的记录（如文件已从目录中删除），追加一行删除标记"""
+        self._load()
+        if self._entries.pop(rel_path, None) is not None:
+            self._append({"path": rel_path, "removed": True})
+
+    def record(self, rel_path: str, size: int, mtime: float, **fields: Any) -> None:
+        """
+        记录一个已完成的文件，立即追加写入清单文件
+
+        参数:
+            rel_path: 相对于导入目录的路径
+            size: 文件的字节数
+            mtime: 文件的修改时间
+            fields: 其他要记录的字段，如写入的文本块数和FAQ数
+        """
+        self._load()
+        entry = {"path": rel_path, "size": size, "mtime": mtime, **fields, "completed_at": time.time()}
+        self._entries[rel_path] = entry
+        self._append(entry)
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        """向清单文件追加一行"""
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                if self._pending_newline:
+                    f.write("\n")
+                    self._pending_newline = False
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to write ingest manifest {self.path}: {e}")
+
+    def _load(self) -> None:
+        """第一次使用时读取清单文件，跳过中断时写了一半的行"""
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not os.path.exists(self.path):
+            return
+        skipped = 0
+        lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                self._pending_newline = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                    if entry.get("removed"):
+                        self._entries.pop(entry["path"], None)
+                    else:
+                        self._entries[entry["path"]] = entry
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    skipped += 1
+        if skipped:
+            logger.warning(f"Skipped {skipped} unreadable lines in ingest manifest {self.path}")
+        logger.info(f"Loaded ingest manifest {self.path} with {len(self._entries)} files")
+        if lines > 2 * len(self._entries) + COMPACT_MIN_LINES:
+            self._compact()
+
+    def _compact(self) -> None:
+        """重复导入使清单中过时的行过多时，只保留每个文件的最新记录，先写临时文件再替换"""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+            self._pending_newline = False
+        except OSError as e:
+            logger.warning(f"Failed to compact ingest manifest {self.path}: {e}")
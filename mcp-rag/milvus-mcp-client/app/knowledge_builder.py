@@ -4,18 +4,55 @@
 作用：将文本内容切分、处理并存储到Milvus知识库，并提取文档中的常见问题(FAQ)
 主要功能：
 1. 文本切分：将长文本按照语义边界切分成较小的片段
-2. 知识库存储：将文本片段存储到向量知识库中
-3. FAQ提取：使用LLM从文本中自动提取常见问题和答案
+2. 知识库存储：将文本片段并发存储到向量知识库中，服务器提供批量工具时按批存储，失败时重试
+3. FAQ提取：使用LLM从文本中自动提取常见问题和答案，长文本分段并发提取，与文本块的存储同时进行
 4. 文件处理：读取文件并提取元数据
+5. 目录导入：按通配符遍历目录树，在线程池中读取和切分文件，跨文件按批写入，并记录清单以便中断后继续
+6. 增量导入：记录每个文件各文本块的哈希和ID，重新导入时只存储新的文本块、删除消失的文本块，
+   未变化的文本段不再提取FAQ；增量导入的文本按内容定义的边界切分，局部修改只影响附近的文本块
 """
 import os
+import re
+import json
+import zlib
+import uuid
 import asyncio
-from typing import Dict, List, Any, Optional, Union
+import hashlib
+from fnmatch import fnmatch
+from typing import Dict, List, Any, Optional, Union, Callable, Awaitable, Tuple
 from loguru import logger
 
-from app.mcp_client import MCPClient
+from app.mcp_client import MCPClient, MCPToolError
 from app.llm_client import LLMClient
-from app.config import DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP
+from app.semantic_cache import SemanticCache
+from app.ingest_manifest import IngestManifest, MANIFEST_FILE_NAME
+from app.config import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP, STORE_CONCURRENCY, STORE_BATCH_SIZE, STORE_MAX_RETRIES,
+    LLM_CONCURRENCY, SEMANTIC_CACHE_FILE, INGEST_READ_WORKERS, INGEST_INCLUDE, INGEST_EXCLUDE,
+    INCREMENTAL_INGEST, CHUNK_INDEX_FILE, CONTENT_DEFINED_CHUNKING
+)
+
+# 重试的初始等待秒数，之后每次翻倍；服务器过载时按其返回的retry_after等待
+RETRY_BACKOFF = 0.5
+
+# 超过该字符数的文本按块分段提取FAQ
+FAQ_SECTION_CHARS = 8000
+
+# 内容定义分块的切分单位：到中英文句末标点或换行为止的句子（英文句末标点后须有空白），包括其后的空白
+CDC_SENTENCE_PATTERN = re.compile(r".+?(?:[.!?](?=\s)|[。！？；\n]|$)\s*", re.S)
+# 块达到最小长度后，在哈希值能被该数整除的句子之后切分；越大块越接近上限
+CDC_BOUNDARY_DIVISOR = 4
+
+# 每次导入都会变化的元数据，不参与文本块的哈希
+VOLATILE_METADATA_KEYS = ("chunk_index", "total_chunks", "file_size")
+
+# 进度回调：(阶段 "chunks"、"faqs" 或目录导入的 "files", 已完成条数, 总条数)
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def _content_hash(text: str) -> str:
+    """文本内容的哈希，用作文本块和FAQ文本段在索引中的键"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 class KnowledgeBuilder:
     """知识库构建器，用于处理文档并将其存储到知识库中"""
@@ -23,7 +60,15 @@ class KnowledgeBuilder:
     def __init__(
         self,
         chunk_size: int = DEFAULT_CHUNK_SIZE,
-        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+        concurrency: int = STORE_CONCURRENCY,
+        batch_size: int = STORE_BATCH_SIZE,
+        max_retries: int = STORE_MAX_RETRIES,
+        llm_concurrency: int = LLM_CONCURRENCY,
+        read_workers: int = INGEST_READ_WORKERS,
+        incremental: bool = INCREMENTAL_INGEST,
+        index_path: str = CHUNK_INDEX_FILE,
+        content_defined_chunking: bool = CONTENT_DEFINED_CHUNKING
     ):
         """
         初始化知识库构建器
@@ -31,18 +76,39 @@ class KnowledgeBuilder:
         参数:
             chunk_size: 文本块的大小
             chunk_overlap: 文本块之间的重叠大小
+            concurrency: 同时进行的存储调用数
+            batch_size: 服务器提供批量工具时每次调用存储的条数，1表示逐条存储
+            max_retries: 每次存储调用的最大尝试次数
+            llm_concurrency: 长文本分段提取FAQ时同时进行的LLM调用数
+            read_workers: 目录导入时读取和切分文件的线程数
+            incremental: 重新导入文件时是否只存储变化的文本块和FAQ
+            index_path: build_from_file记录各文件文本块哈希和ID的索引文件
+            content_defined_chunking: 增量导入时是否按内容定义的边界切分文本，否则按固定长度切分；
+                非增量导入和build_from_text总是按固定长度切分
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(1, max_retries)
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.read_workers = max(1, read_workers)
+        self.incremental = incremental
+        self.index_path = index_path
+        self.content_defined_chunking = content_defined_chunking
         self.mcp_client = MCPClient()
         self.llm_client = LLMClient()
-        logger.info(f"Initialized KnowledgeBuilder with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+        logger.info(
+            f"Initialized KnowledgeBuilder with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}, "
+            f"concurrency={self.concurrency}, batch_size={self.batch_size}, incremental={incremental}"
+        )
         
     async def build_from_text(
         self, 
         text: str, 
         metadata: Optional[Dict[str, Any]] = None,
-        extract_faq: bool = True
+        extract_faq: bool = True,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         """
         从文本构建知识库
@@ -51,69 +117,403 @@ class KnowledgeBuilder:
             text: 文本内容
             metadata: 文档的可选元数据
             extract_faq: 是否从文本中提取FAQ
+            progress_callback: 可选的进度回调，每完成一次存储调用后以(阶段, 已完成条数, 总条数)调用
             
         返回:
-            包含处理结果的字典
+            包含处理结果的字典，chunk_results和faq_results按原顺序给出每一条的存储结果
+        """
+        result, _ = await self._build_text(text, metadata, extract_faq, progress_callback)
+        return result
+        
+    async def _build_text(
+        self,
+        text: str,
+        metadata: Optional[Dict[str, Any]],
+        extract_faq: bool,
+        progress_callback: Optional[ProgressCallback],
+        previous: Optional[Dict[str, Any]] = None,
+        indexed: bool = False
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        切分并存储文本，提取并存储FAQ
+        
+        previous为上次导入同一文件时记录的索引条目：内容和元数据都未变的文本块不再存储，
+        不再出现的文本块和FAQ被删除，未变的文本段不再提取FAQ
+        
+        参数:
+            text: 文本内容
+            metadata: 文档的可选元数据
+            extract_faq: 是否从文本中提取FAQ
+            progress_callback: 可选的进度回调
+            previous: 上次导入记录的索引条目，没有时全部存储
+            indexed: 返回的条目是否会记入索引（增量导入），决定切分方式（见_chunk_text）
+            
+        返回:
+            处理结果，以及本次应记录到索引的条目
         """
         # 连接到MCP服务器
         if not hasattr(self.mcp_client, '_connected') or not self.mcp_client._connected:
             await self.mcp_client.connect()
             
-        # 将文本处理成块
-        chunks = self._chunk_text(text)
-        logger.info(f"Split text into {len(chunks)} chunks")
+        # 将文本处理成块，与上次导入的文本块比较
+        chunks = self._chunk_text(text, indexed)
+        documents = self._chunk_documents(chunks, metadata)
+        keys, to_store, chunk_ids, stale = self._diff_chunks(documents, previous)
+        logger.info(f"Split text into {len(chunks)} chunks, {len(chunk_ids)} unchanged, {len(to_store)} to store")
+        deleted_chunks, stale_chunks = await self._delete_ids("knowledge", stale)
+            
+        # 文本块的存储与FAQ的提取（等待LLM）同时进行
+        chunk_results, faq_outcome = await asyncio.gather(
+            self._store_items(
+                "chunks",
+                [documents[i] for i in to_store],
+                lambda document: self.mcp_client.store_knowledge(**document),
+                "storeKnowledgeBatch",
+                self.mcp_client.store_knowledge_batch,
+                progress_callback
+            ),
+            self._extract_and_store_faqs(text, metadata, progress_callback, previous, indexed) if extract_faq
+            else self._no_faqs(previous)
+        )
+        for i, result in zip(to_store, chunk_results):
+            result["index"] = i
+            if result["status"] == "stored" and result["id"]:
+                chunk_ids[keys[i]] = result["id"]
+        self._warn_untracked(chunk_results)
+        faq_results = faq_outcome["results"]
+        
+        # 知识库发生变化，缓存的回答可能已经过时
+        if deleted_chunks or faq_outcome["deleted"] or any(
+            result["status"] == "stored" for result in chunk_results + faq_results
+        ):
+            self._invalidate_cache()
+            
+        reused_chunks = len(keys) - len(to_store)
+        entry = {
+            "chunks": len(chunks),
+            "faqs": sum(len(ids) for ids in faq_outcome["faq_ids"].values()),
+            "chunk_ids": chunk_ids,
+            "faq_ids": faq_outcome["faq_ids"],
+            "stale_ids": {"knowledge": stale_chunks, "faq": faq_outcome["stale_ids"]},
+            "complete": faq_outcome["complete"] and all(result["status"] == "stored" for result in chunk_results)
+        }
+        return {
+            "stored_chunks": sum(1 for result in chunk_results if result["status"] == "stored"),
+            "total_chunks": len(chunks),
+            "failed_chunks": [result["index"] for result in chunk_results if result["status"] == "failed"],
+            "chunk_results": chunk_results,
+            "extracted_faqs": len(faq_outcome["faqs"]),
+            "stored_faqs": sum(1 for result in faq_results if result["status"] == "stored"),
+            "faq_results": faq_results,
+            "faqs": faq_outcome["faqs"],
+            "reused_chunks": reused_chunks,
+            "deleted_chunks": deleted_chunks,
+            "reused_faqs": faq_outcome["reused"],
+            "deleted_faqs": faq_outcome["deleted"],
+            "saved_embeddings": reused_chunks + faq_outcome["reused"],
+            "saved_llm_calls": faq_outcome["saved_llm_calls"]
+        }, entry
+        
+    def _chunk_key(self, document: Dict[str, Any], occurrence: int = 0) -> str:
+        """
+        文本块在索引中的键：内容和（不随每次导入变化的）元数据的哈希
+        
+        块序号和块总数不参与哈希，因此沿用的文本块在服务器上保留上次导入时的chunk_index和total_chunks，
+        文档中插入或删除文本块后这两个值可能已经过时。
+        
+        参数:
+            document: 文本块文档
+            occurrence: 同一文档中相同文本块的出现次序，第一次出现为0
+        """
+        metadata = {k: v for k, v in document["metadata"].items() if k not in VOLATILE_METADATA_KEYS}
+        key = _content_hash(document["content"] + "\0" + json.dumps(metadata, sort_keys=True, ensure_ascii=False))
+        return f"{key}#{occurrence}" if occurrence else key
+        
+    def _diff_chunks(
+        self,
+        documents: List[Dict[str, Any]],
+        previous: Optional[Dict[str, Any]]
+    ) -> Tuple[List[str], List[int], Dict[str, str], List[str]]:
+        """
+        将本次切分的文本块与上次导入的记录比较
+        
+        参数:
+            documents: 本次的文本块文档
+            previous: 上次导入记录的索引条目
+            
+        返回:
+            各文本块的键（同一文档中相同的文本块按出现次序区分，各自存储）、需要存储的文本块序号、
+            未变化文本块的键到ID的映射、需要删除的ID（不再出现的文本块和上次未能删除的ID）
+        """
+        previous_ids = (previous or {}).get("chunk_ids", {})
+        occurrences: Dict[str, int] = {}
+        keys = []
+        for document in documents:
+            key = self._chunk_key(document)
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            keys.append(self._chunk_key(document, occurrence) if occurrence else key)
+            
+        to_store = []
+        chunk_ids: Dict[str, str] = {}
+        for i, key in enumerate(keys):
+            if previous_ids.get(key):
+                chunk_ids[key] = previous_ids[key]
+            else:
+                to_store.append(i)
+                
+        current = set(keys)
+        stale = [chunk_id for key, chunk_id in previous_ids.items() if key not in current and chunk_id]
+        stale += (previous or {}).get("stale_ids", {}).get("knowledge", [])
+        return keys, to_store, chunk_ids, stale
+        
+    @staticmethod
+    def _warn_untracked(results: List[Dict[str, Any]]) -> None:
+        """服务器未返回ID的内容无法记入索引，下次导入时会再次存储"""
+        untracked = sum(1 for result in results if result["status"] == "stored" and not result["id"])
+        if untracked:
+            logger.warning(f"The server returned no ID for {untracked} stored items, they cannot be reused or deleted later")
+        
+    async def _delete_ids(self, kind: str, ids: List[str]) -> Tuple[int, List[str]]:
+        """
+        每batch_size个ID调用一次删除工具
+        
+        参数:
+            kind: "knowledge"或"faq"
+            ids: 要删除的ID
+            
+        返回:
+            删除的ID数和未能删除的ID（记入索引，下次导入时重试）
+        """
+        delete = self.mcp_client.delete_knowledge if kind == "knowledge" else self.mcp_client.delete_faq
+        deleted = 0
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            try:
+                await delete(batch)
+                deleted += len(batch)
+            except Exception as e:
+                if isinstance(e, MCPToolError) and e.unavailable:
+                    logger.warning(f"The server has no delete tool, keeping {len(ids) - start} stale {kind} items")
+                else:
+                    logger.warning(f"Failed to delete {kind} items, retrying on the next import: {e}")
+                return deleted, ids[start:]
+        if deleted:
+            logger.info(f"Deleted {deleted} stale {kind} items")
+        return deleted, []
         
-        # 将块存储到知识库中
-        stored_count = 0
+    def _chunk_documents(self, chunks: List[str], metadata: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """为每个文本块附加文档元数据和块序号"""
+        documents = []
         for i, chunk in enumerate(chunks):
             chunk_metadata = metadata.copy() if metadata else {}
             chunk_metadata["chunk_index"] = i
             chunk_metadata["total_chunks"] = len(chunks)
+            documents.append({"content": chunk, "metadata": chunk_metadata})
+        return documents
+        
+    def _invalidate_cache(self) -> None:
+        """知识库发生变化，使语义缓存中可能已经过时的回答失效"""
+        if os.path.exists(SEMANTIC_CACHE_FILE):
+            SemanticCache().invalidate()
             
-            # 将块存储到知识库中
-            try:
-                await self.mcp_client.store_knowledge(content=chunk, metadata=chunk_metadata)
-                stored_count += 1
-            except Exception as e:
-                logger.error(f"Failed to store chunk {i}: {str(e)}")
+    async def _extract_and_store_faqs(
+        self,
+        text: str,
+        metadata: Optional[Dict[str, Any]],
+        progress_callback: Optional[ProgressCallback],
+        previous: Optional[Dict[str, Any]] = None,
+        indexed: bool = False
+    ) -> Dict[str, Any]:
+        """
+        提取并存储FAQ
+        
+        FAQ按文本段提取（见_faq_sections），上次导入中已经提取过的文本段不再调用LLM，
+        沿用其FAQ；不再出现的文本段的FAQ被删除
+        
+        参数:
+            text: 要提取FAQ的文本
+            metadata: 文档的可选元数据
+            progress_callback: 可选的进度回调
+            previous: 上次导入记录的索引条目
+            indexed: 结果是否会记入索引，决定长文本的分段方式
+            
+        返回:
+            包含faqs（新提取的FAQ）、results（每条的存储结果）、faq_ids（各文本段的哈希到FAQ ID的映射）、
+            stale_ids（未能删除的ID）、reused、deleted、saved_llm_calls和complete的字典
+        """
+        sections = self._faq_sections(text, indexed)
+        keys = [_content_hash(section) for section in sections]
+        previous_ids = (previous or {}).get("faq_ids", {})
+        faq_ids = {key: previous_ids[key] for key in keys if key in previous_ids}
+        changed = [i for i, key in enumerate(keys) if key not in faq_ids and key not in keys[:i]]
+        
+        stale = [faq_id for key, ids in previous_ids.items() if key not in faq_ids for faq_id in ids]
+        stale += (previous or {}).get("stale_ids", {}).get("faq", [])
+        deleted, stale = await self._delete_ids("faq", stale)
+        
+        section_faqs = await self._extract_sections([sections[i] for i in changed])
+        faqs, owners = [], []
+        for i, found in zip(changed, section_faqs):
+            faqs.extend(found or [])
+            owners.extend([i] * len(found or []))
+        logger.info(f"Extracted {len(faqs)} FAQs from {len(changed)}/{len(sections)} changed sections")
+        
+        faq_results = await self._store_items(
+            "faqs",
+            [{"question": faq["question"], "answer": faq["answer"]} for faq in faqs],
+            lambda faq: self.mcp_client.store_faq(metadata=metadata, **faq),
+            "storeFAQBatch",
+            self.mcp_client.store_faq_batch,
+            progress_callback
+        )
+        
+        # 提取和存储都成功的文本段记入索引；否则已存储的FAQ下次删除，该段下次重新提取
+        complete = True
+        for i, found in zip(changed, section_faqs):
+            results = [result for result, owner in zip(faq_results, owners) if owner == i]
+            ids = [result["id"] for result in results if result["status"] == "stored" and result["id"]]
+            if found is not None and all(result["status"] == "stored" for result in results):
+                faq_ids[keys[i]] = ids
+            else:
+                stale.extend(ids)
+                complete = False
                 
-        # 如果需要，提取并存储FAQ
-        faqs = []
-        if extract_faq:
-            faqs = await self._extract_faqs(text)
-            logger.info(f"Extracted {len(faqs)} FAQs from text")
-            
-            # 存储FAQ
-            for faq in faqs:
-                try:
-                    await self.mcp_client.store_faq(
-                        question=faq["question"],
-                        answer=faq["answer"],
-                        metadata=metadata
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to store FAQ: {str(e)}")
-                    
         return {
-            "stored_chunks": stored_count,
-            "total_chunks": len(chunks),
-            "extracted_faqs": len(faqs),
-            "faqs": faqs
+            "faqs": faqs,
+            "results": faq_results,
+            "faq_ids": faq_ids,
+            "stale_ids": stale,
+            "reused": sum(len(previous_ids[key]) for key in set(keys) if key in previous_ids),
+            "deleted": deleted,
+            "saved_llm_calls": len(set(keys)) - len(changed),
+            "complete": complete
         }
         
+    async def _no_faqs(self, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """不提取FAQ时的占位协程，保留上次导入的FAQ"""
+        previous = previous or {}
+        return {
+            "faqs": [],
+            "results": [],
+            "faq_ids": previous.get("faq_ids", {}),
+            "stale_ids": previous.get("stale_ids", {}).get("faq", []),
+            "reused": 0,
+            "deleted": 0,
+            "saved_llm_calls": 0,
+            "complete": True
+        }
+        
+    async def _store_items(
+        self,
+        stage: str,
+        items: List[Dict[str, Any]],
+        store_one: Callable[[Dict[str, Any]], Awaitable[Any]],
+        batch_tool: str,
+        store_batch: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        以有限并发存储多条内容，每次调用失败时按指数退避重试
+        
+        服务器提供批量工具且batch_size大于1时，每batch_size条合并为一次批量调用；
+        批量调用用尽重试仍失败（或服务器不支持该工具）时，该批内容改为逐条存储，
+        避免一条有问题的内容导致整批失败。
+        每条内容在第一次尝试前分配ID，重试和逐条存储时沿用，服务器按ID覆盖已写入的内容，
+        因此超时后实际已写入的调用被重试时不会重复写入。
+        
+        参数:
+            stage: 进度回调和日志中使用的阶段名
+            items: 待存储的内容
+            store_one: 存储单条内容的协程函数
+            batch_tool: 批量工具名称
+            store_batch: 批量存储的协程函数
+            progress_callback: 可选的进度回调
+            
+        返回:
+            与items顺序一致的结果列表，每项包含index、status("stored"或"failed")、attempts、error
+            和服务器返回的id（旧版本服务器不返回时为None）
+        """
+        items = [{**item, "id": item.get("id") or str(uuid.uuid4())} for item in items]
+        results = [{"index": i, "status": "failed", "attempts": 0, "error": None, "id": None} for i in range(len(items))]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        completed = 0
+        
+        async def store(indices: List[int], batch: bool) -> bool:
+            nonlocal completed
+            for attempt in range(1, self.max_retries + 1):
+                for i in indices:
+                    results[i]["attempts"] += 1
+                async with semaphore:
+                    try:
+                        if batch:
+                            response = await store_batch([items[i] for i in indices])
+                            ids = response.get("ids") if isinstance(response, dict) else None
+                        else:
+                            response = await store_one(items[indices[0]])
+                            ids = [response.get("id")] if isinstance(response, dict) else None
+                        error = None
+                    except Exception as e:
+                        error = e
+                if error is None:
+                    if not ids or len(ids) != len(indices):
+                        ids = [None] * len(indices)
+                    for i, item_id in zip(indices, ids):
+                        results[i].update(status="stored", error=None, id=item_id)
+                    completed += len(indices)
+                    if progress_callback:
+                        progress_callback(stage, completed, len(items))
+                    return True
+                for i in indices:
+                    results[i]["error"] = str(error)
+                if isinstance(error, MCPToolError) and error.unavailable:
+                    # 服务器不支持批量工具，后续调用直接逐条存储
+                    self.mcp_client.tools.pop(batch_tool, None)
+                    break
+                if attempt < self.max_retries:
+                    retry_after = error.retry_after if isinstance(error, MCPToolError) else None
+                    delay = retry_after if retry_after else RETRY_BACKOFF * 2 ** (attempt - 1)
+                    logger.warning(f"Storing {stage} {indices[0]}..{indices[-1]} failed (attempt {attempt}), retrying in {delay}s: {error}")
+                    await asyncio.sleep(delay)
+            if not batch:
+                logger.error(f"Failed to store {stage} item {indices[0]}: {results[indices[0]]['error']}")
+                completed += 1
+                if progress_callback:
+                    progress_callback(stage, completed, len(items))
+            return False
+        
+        pending = list(range(len(items)))
+        if self.batch_size > 1 and len(items) > 1 and self.mcp_client.has_tool(batch_tool):
+            batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+            stored = await asyncio.gather(*(store(indices, True) for indices in batches))
+            pending = [i for indices, ok in zip(batches, stored) if not ok for i in indices]
+            if pending:
+                logger.warning(f"Batch store of {len(pending)} {stage} failed, falling back to single stores")
+                
+        await asyncio.gather(*(store([i], False) for i in pending))
+        
+        failed = sum(1 for result in results if result["status"] == "failed")
+        logger.info(f"Stored {len(items) - failed}/{len(items)} {stage}")
+        return results
+        
     async def build_from_file(
         self, 
         file_path: str, 
         metadata: Optional[Dict[str, Any]] = None,
-        extract_faq: bool = True
+        extract_faq: bool = True,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         """
         从文件构建知识库
         
+        增量导入时以文件的绝对路径在index_path中记录各文本块的哈希和ID，
+        再次导入同一文件时只存储变化的文本块和FAQ
+        
         参数:
             file_path: 文件路径
             metadata: 文档的可选元数据
             extract_faq: 是否从文本中提取FAQ
+            progress_callback: 可选的进度回调
             
         返回:
             包含处理结果的字典
@@ -134,18 +534,396 @@ class KnowledgeBuilder:
         metadata["file_size"] = os.path.getsize(file_path)
         
         # 处理文件内容
-        return await self.build_from_text(text, metadata, extract_faq)
+        if not self.incremental:
+            return await self.build_from_text(text, metadata, extract_faq, progress_callback)
+        index = IngestManifest(self.index_path)
+        key = os.path.abspath(file_path)
+        result, entry = await self._build_text(text, metadata, extract_faq, progress_callback, index.get(key), indexed=True)
+        stat = os.stat(file_path)
+        index.record(key, stat.st_size, stat.st_mtime, **entry)
+        return result
+        
+    async def build_from_directory(
+        self,
+        directory: str,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        extract_faq: bool = True,
+        manifest_path: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        从目录树构建知识库
+        
+        read_workers个线程读取和切分文件，各文件的文本块汇集后每batch_size * concurrency条写入一次，
+        小文件也能用满批量调用；llm_concurrency个FAQ任务按文件提取FAQ，等待提取的文件不超过read_workers * 2个，
+        排满时读取暂停，内存中只保留有限的文件。
+        一个文件处理完后记入清单，再次运行时跳过清单中大小和修改时间未变且全部写入成功的文件，
+        因此中断的导入可以从中断处继续。增量导入时清单同时记录各文本块和FAQ的ID：
+        修改过的文件只存储变化的部分，已从目录中删除的文件的文本块和FAQ也被删除。
+        文件的文本块写入后、FAQ完成前先记入清单（标记为未完成），中断后继续时沿用已写入的文本块。
+        
+        参数:
+            directory: 要导入的目录
+            include: 文件相对路径需匹配其中之一的通配符，默认为INGEST_INCLUDE
+            exclude: 匹配其中之一的文件或目录被跳过，默认为INGEST_EXCLUDE
+            metadata: 所有文件共用的可选元数据，每个文件另外附加文件名、路径和大小
+            extract_faq: 是否从文件中提取FAQ
+            manifest_path: 清单文件路径，默认为目录下的.ingest_manifest.jsonl
+            progress_callback: 可选的进度回调，每处理完一个文件以("files", 已处理文件数, 待处理文件数)调用
+            
+        返回:
+            包含处理结果的字典，failed_files为未能完整导入的文件（下次运行时重试）
+        """
+        if not os.path.isdir(directory):
+            raise NotADirectoryError(f"Directory not found: {directory}")
+        manifest = IngestManifest(manifest_path or os.path.join(directory, MANIFEST_FILE_NAME))
+        
+        # 遍历目录，跳过清单中已完成的文件
+        files = self._find_files(directory, include or INGEST_INCLUDE, exclude or INGEST_EXCLUDE, manifest.path)
+        removed = [
+            rel_path for rel_path in manifest.paths()
+            if self.incremental and not os.path.exists(os.path.join(directory, rel_path))
+        ]
+        pending = []
+        for rel_path in files:
+            stat = os.stat(os.path.join(directory, rel_path))
+            if not manifest.is_complete(rel_path, stat.st_size, stat.st_mtime):
+                pending.append((rel_path, stat.st_size, stat.st_mtime))
+        logger.info(
+            f"Found {len(files)} files under {directory}, {len(files) - len(pending)} already ingested, "
+            f"{len(pending)} to process, {len(removed)} removed"
+        )
+        
+        report = {
+            "total_files": len(files),
+            "skipped_files": len(files) - len(pending),
+            "processed_files": 0,
+            "failed_files": [],
+            "stored_chunks": 0,
+            "total_chunks": 0,
+            "extracted_faqs": 0,
+            "stored_faqs": 0,
+            "reused_chunks": 0,
+            "deleted_chunks": 0,
+            "reused_faqs": 0,
+            "deleted_faqs": 0,
+            "saved_embeddings": 0,
+            "saved_llm_calls": 0,
+            "removed_files": 0,
+            "manifest": manifest.path
+        }
+        if not pending and not removed:
+            return report
+            
+        if not hasattr(self.mcp_client, '_connected') or not self.mcp_client._connected:
+            await self.mcp_client.connect()
+            
+        # 删除已从目录中删除的文件的文本块和FAQ，未能删除的ID留在清单中下次重试
+        for rel_path in removed:
+            entry = manifest.get(rel_path)
+            stale_ids = entry.get("stale_ids", {})
+            chunk_ids = [chunk_id for chunk_id in entry.get("chunk_ids", {}).values() if chunk_id]
+            faq_ids = [faq_id for ids in entry.get("faq_ids", {}).values() for faq_id in ids]
+            deleted_chunks, stale_chunks = await self._delete_ids("knowledge", chunk_ids + stale_ids.get("knowledge", []))
+            deleted_faqs, stale_faqs = await self._delete_ids("faq", faq_ids + stale_ids.get("faq", []))
+            report["deleted_chunks"] += deleted_chunks
+            report["deleted_faqs"] += deleted_faqs
+            if stale_chunks or stale_faqs:
+                manifest.record(
+                    rel_path, entry.get("size"), entry.get("mtime"), chunks=0, faqs=0, chunk_ids={}, faq_ids={},
+                    stale_ids={"knowledge": stale_chunks, "faq": stale_faqs}, complete=False
+                )
+            else:
+                manifest.remove(rel_path)
+                report["removed_files"] += 1
+        if not pending:
+            if report["deleted_chunks"] or report["deleted_faqs"]:
+                self._invalidate_cache()
+            return report
+            
+
+        # 读取线程通过有界队列交给写入方，写入跟不上时读取暂停，内存中只保留有限的文件
+        paths: asyncio.Queue = asyncio.Queue()
+        for item in pending:
+            paths.put_nowait(item)
+        loaded: asyncio.Queue = asyncio.Queue(maxsize=self.read_workers * 2)
+        
+        async def read_files():
+            while True:
+                try:
+                    rel_path, size, mtime = paths.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                file_path = os.path.join(directory, rel_path)
+                try:
+                    text, chunks = await asyncio.to_thread(self._read_and_chunk, file_path)
+                    error = None
+                except Exception as e:
+                    text, chunks, error = None, [], e
+                await loaded.put((rel_path, size, mtime, text, chunks, error))
+                
+        # 每个文件等待完成的部分：文本块和FAQ，全部完成后记入清单，有失败时标记为未完成，下次重试
+        files_state: Dict[str, Dict[str, Any]] = {}
+        done = 0
+        
+        def record(rel_path: str, state: Dict[str, Any], complete: bool) -> None:
+            manifest.record(
+                rel_path, state["size"], state["mtime"], chunks=state["chunks"],
+                faqs=sum(len(ids) for ids in state["faq_ids"].values()),
+                chunk_ids=state["chunk_ids"], faq_ids=state["faq_ids"],
+                stale_ids={"knowledge": state["stale_chunks"], "faq": state["stale_faqs"]},
+                complete=complete
+            )
+            
+        def finish(rel_path: str) -> None:
+            nonlocal done
+            state = files_state[rel_path]
+            if state["chunks_left"]:
+                return
+            if not state["faqs_done"]:
+                # 文本块已写入而FAQ还在排队：先记下文本块的ID，中断后继续时不再重复存储
+                if not state["chunks_recorded"]:
+                    state["chunks_recorded"] = True
+                    record(rel_path, state, complete=False)
+                return
+            del files_state[rel_path]
+            if state["failed"]:
+                report["failed_files"].append(rel_path)
+            record(rel_path, state, complete=not state["failed"])
+            report["processed_files"] += 1
+            done += 1
+            if progress_callback:
+                progress_callback("files", done, len(pending))
+                
+        # 缓冲区中每项为(文件, 文本块在文件中的序号, 文本块文档)
+        buffer: List[Tuple[str, int, Dict[str, Any]]] = []
+        flush_size = self.batch_size * self.concurrency
+        
+        async def flush():
+            batch = buffer[:]
+            buffer.clear()
+            results = await self._store_items(
+                "chunks",
+                [document for _, _, document in batch],
+                lambda document: self.mcp_client.store_knowledge(**document),
+                "storeKnowledgeBatch",
+                self.mcp_client.store_knowledge_batch
+            )
+            for (rel_path, i, _), result in zip(batch, results):
+                state = files_state[rel_path]
+                state["chunks_left"] -= 1
+                if result["status"] == "stored":
+                    report["stored_chunks"] += 1
+                    if result["id"]:
+                        state["chunk_ids"][state["keys"][i]] = result["id"]
+                else:
+                    state["failed"] = True
+            self._warn_untracked(results)
+            for rel_path in {rel_path for rel_path, _, _ in batch}:
+                finish(rel_path)
+                
+        # llm_concurrency个FAQ任务从有界队列中取文件，队列排满时写入方先写出缓冲的文本块，再等待空位
+        faq_queue: asyncio.Queue = asyncio.Queue(maxsize=self.read_workers * 2)
+        
+        async def extract_faqs():
+            while True:
+                item = await faq_queue.get()
+                if item is None:
+                    return
+                rel_path, text, file_metadata, previous = item
+                state = files_state[rel_path]
+                try:
+                    outcome = await self._extract_and_store_faqs(text, file_metadata, None, previous, self.incremental)
+                    report["extracted_faqs"] += len(outcome["faqs"])
+                    report["stored_faqs"] += sum(1 for result in outcome["results"] if result["status"] == "stored")
+                    report["reused_faqs"] += outcome["reused"]
+                    report["deleted_faqs"] += outcome["deleted"]
+                    report["saved_embeddings"] += outcome["reused"]
+                    report["saved_llm_calls"] += outcome["saved_llm_calls"]
+                    state["faq_ids"] = outcome["faq_ids"]
+                    state["stale_faqs"] = outcome["stale_ids"]
+                    state["failed"] = state["failed"] or not outcome["complete"]
+                except Exception as e:
+                    logger.error(f"Failed to extract FAQs from {rel_path}: {e}")
+                    state["failed"] = True
+                state["faqs_done"] = True
+                finish(rel_path)
+                
+        readers = [asyncio.create_task(read_files()) for _ in range(min(self.read_workers, len(pending)))]
+        faq_workers = [asyncio.create_task(extract_faqs()) for _ in range(self.llm_concurrency if extract_faq else 0)]
+        try:
+            for _ in range(len(pending)):
+                rel_path, size, mtime, text, chunks, error = await loaded.get()
+                if error is not None:
+                    logger.error(f"Failed to read {rel_path}: {error}")
+                    report["failed_files"].append(rel_path)
+                    report["processed_files"] += 1
+                    done += 1
+                    if progress_callback:
+                        progress_callback("files", done, len(pending))
+                    continue
+                    
+                file_metadata = metadata.copy() if metadata else {}
+                file_metadata["file_name"] = os.path.basename(rel_path)
+                file_metadata["file_path"] = os.path.join(directory, rel_path)
+                file_metadata["file_size"] = size
+                
+                # 增量导入时只存储与清单中的记录相比新出现的文本块
+                previous = manifest.get(rel_path) if self.incremental else None
+                documents = self._chunk_documents(chunks, file_metadata)
+                keys, to_store, chunk_ids, stale = self._diff_chunks(documents, previous)
+                deleted_chunks, stale_chunks = await self._delete_ids("knowledge", stale)
+                files_state[rel_path] = {
+                    "size": size, "mtime": mtime, "chunks": len(chunks), "chunks_left": len(to_store),
+                    "keys": keys, "chunk_ids": chunk_ids, "stale_chunks": stale_chunks,
+                    "faq_ids": (previous or {}).get("faq_ids", {}),
+                    "stale_faqs": (previous or {}).get("stale_ids", {}).get("faq", []),
+                    "faqs_done": not extract_faq, "chunks_recorded": not to_store, "failed": False
+                }
+                report["total_chunks"] += len(chunks)
+                report["reused_chunks"] += len(keys) - len(to_store)
+                report["saved_embeddings"] += len(keys) - len(to_store)
+                report["deleted_chunks"] += deleted_chunks
+                buffer.extend((rel_path, i, documents[i]) for i in to_store)
+                if len(buffer) >= flush_size:
+                    await flush()
+                    
+                if extract_faq:
+                    if faq_queue.full() and buffer:
+                        await flush()
+                    await faq_queue.put((rel_path, text, file_metadata, previous))
+                elif not to_store:
+                    finish(rel_path)
+                    
+            if buffer:
+                await flush()
+            for _ in faq_workers:
+                await faq_queue.put(None)
+            await asyncio.gather(*faq_workers)
+        finally:
+            for task in readers + faq_workers:
+                task.cancel()
+            if report["stored_chunks"] or report["stored_faqs"] or report["deleted_chunks"] or report["deleted_faqs"]:
+                self._invalidate_cache()
+                
+        logger.info(
+            f"Ingested {report['processed_files'] - len(report['failed_files'])}/{len(pending)} files "
+            f"({report['stored_chunks']}/{report['total_chunks']} chunks, {report['stored_faqs']} FAQs), "
+            f"{len(report['failed_files'])} failed; saved {report['saved_embeddings']} embeddings "
+            f"and {report['saved_llm_calls']} LLM calls"
+        )
+        return report
+        
+    def _find_files(self, directory: str, include: List[str], exclude: List[str], manifest_path: str) -> List[str]:
+        """
+        遍历目录，返回匹配通配符的文件
+        
+        通配符匹配相对于directory、以/分隔的路径（*也匹配/）；exclude也匹配文件名或目录名，
+        如".*"跳过所有隐藏文件和目录，exclude匹配的目录整个跳过
+        
+        参数:
+            directory: 要遍历的目录
+            include: 文件需匹配其中之一的通配符
+            exclude: 要跳过的文件或目录的通配符
+            manifest_path: 清单文件路径，不作为文档导入
+            
+        返回:
+            排序后的相对路径列表
+        """
+        def excluded(rel_path: str, name: str) -> bool:
+            return any(fnmatch(rel_path, pattern) or fnmatch(name, pattern) for pattern in exclude)
+            
+        manifest_path = os.path.abspath(manifest_path)
+        files = []
+        for root, dirs, names in os.walk(directory):
+            rel_root = os.path.relpath(root, directory).replace(os.sep, "/")
+            rel_root = "" if rel_root == "." else rel_root + "/"
+            dirs[:] = [name for name in dirs if not excluded(rel_root + name, name)]
+            for name in names:
+                rel_path = rel_root + name
+                if os.path.abspath(os.path.join(root, name)) == manifest_path:
+                    continue
+                if any(fnmatch(rel_path, pattern) for pattern in include) and not excluded(rel_path, name):
+                    files.append(rel_path)
+        return sorted(files)
+        
+    def _read_and_chunk(self, file_path: str) -> Tuple[str, List[str]]:
+        """在读取线程中读取文件并切分文本"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        return text, self._chunk_text(text, self.incremental)
     
-    def _chunk_text(self, text: str) -> List[str]:
+    def _chunk_text(self, text: str, indexed: bool = False) -> List[str]:
         """
         将文本划分为带有重叠的块
         
+        内容定义的切分只用于记入索引的增量导入，使局部修改只改变附近的文本块；
+        其他情况按固定长度切分，文本块与之前的版本一致
+        
         参数:
             text: 要划分的文本
+            indexed: 文本块是否记入增量导入的索引
             
         返回:
             文本块列表
         """
+        if indexed and self.content_defined_chunking:
+            return self._chunk_text_content_defined(text)
+        return self._chunk_text_fixed(text)
+        
+    def _chunk_text_content_defined(self, text: str) -> List[str]:
+        """
+        按内容定义的边界将文本划分为带有重叠的块
+        
+        文本按句子切分（超过上限的句子按上限硬切），句子依次放入当前块：块达到上限的一半后，
+        在哈希值能被CDC_BOUNDARY_DIVISOR整除的句子之后切分，放不下下一个句子时也切分。
+        边界只由附近的句子决定，修改一段文字后，其后的块很快回到与修改前相同的边界，
+        增量导入时只有修改处附近的块需要重新存储。每个块（第一个除外）开头重复上一个块
+        末尾不超过chunk_overlap个字符的完整句子，块的总长度不超过chunk_size。
+        
+        参数:
+            text: 要划分的文本
+            
+        返回:
+            文本块列表
+        """
+        if len(text) <= self.chunk_size:
+            return [text]
+            
+        limit = max(self.chunk_size - self.chunk_overlap, self.chunk_size // 2, 1)
+        units = []
+        for sentence in CDC_SENTENCE_PATTERN.findall(text):
+            units.extend(sentence[i:i + limit] for i in range(0, len(sentence), limit))
+            
+        groups, current, length = [], [], 0
+        for unit in units:
+            if current and length + len(unit) > limit:
+                groups.append(current)
+                current, length = [], 0
+            current.append(unit)
+            length += len(unit)
+            if length >= limit // 2 and zlib.crc32(unit.strip().encode("utf-8")) % CDC_BOUNDARY_DIVISOR == 0:
+                groups.append(current)
+                current, length = [], 0
+        if current:
+            groups.append(current)
+            
+        chunks = []
+        for i, group in enumerate(groups):
+            body = "".join(group)
+            room = min(self.chunk_overlap, self.chunk_size - len(body))
+            overlap = ""
+            for unit in reversed(groups[i - 1] if i else []):
+                if len(overlap) + len(unit) > room:
+                    break
+                overlap = unit + overlap
+            chunks.append(overlap + body)
+        return chunks
+        
+    def _chunk_text_fixed(self, text: str) -> List[str]:
+        """按固定长度将文本划分为带有重叠的块，尽量在句末切分"""
         # 简单的基于字符的分块
         chunks = []
         
@@ -169,19 +947,17 @@ class KnowledgeBuilder:
                     text.rfind('! ', start, end)
                 )
                 
-                # 如果找到句子结尾，将其作为块的结束
-                if sentence_end > start:
+                # 如果找到句子结尾，将其作为块的结束；句末离块起点太近时不采用，否则重叠后的起点不会前进
+                if sentence_end + 1 - self.chunk_overlap > start:
                     end = sentence_end + 1  # 包括句号
             
             # 添加块
             chunks.append(text[start:min(end, len(text))])
             
             # 移动起始位置到下一个块，考虑重叠
-            start = end - self.chunk_overlap
-            
-            # 确保有进展
-            if start >= len(text) or start <= 0:
+            if end >= len(text):
                 break
+            start = end - self.chunk_overlap
                 
         return chunks
         
@@ -195,15 +971,34 @@ class KnowledgeBuilder:
         返回:
             提取的FAQ列表
         """
-        # 如果文本太长，拆分并从每个部分提取FAQ
-        if len(text) > 8000:
-            chunks = self._chunk_text(text)
-            faqs = []
-            for chunk in chunks:
-                chunk_faqs = await self._extract_faqs(chunk)
-                faqs.extend(chunk_faqs)
-            return faqs
+        # 如果文本太长，拆分后以llm_concurrency个并发调用从每个部分提取FAQ，结果按部分的顺序合并
+        section_faqs = await self._extract_sections(self._faq_sections(text))
+        return [faq for faqs in section_faqs for faq in faqs or []]
+        
+    def _faq_sections(self, text: str, indexed: bool = False) -> List[str]:
+        """提取FAQ的文本段：超过FAQ_SECTION_CHARS的文本按块拆分（切分方式见_chunk_text），否则为整个文本"""
+        return self._chunk_text(text, indexed) if len(text) > FAQ_SECTION_CHARS else [text]
+        
+    async def _extract_sections(self, sections: List[str]) -> List[Optional[List[Dict[str, str]]]]:
+        """以llm_concurrency个并发LLM调用从每个文本段提取FAQ，提取失败的文本段为None"""
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+        
+        async def extract(section: str) -> Optional[List[Dict[str, str]]]:
+            async with semaphore:
+                return await self._extract_section_faqs(section)
+                
+        return await asyncio.gather(*(extract(section) for section in sections))
+        
+    async def _extract_section_faqs(self, text: str) -> Optional[List[Dict[str, str]]]:
+        """
+        使用一次LLM调用从一段文本中提取FAQ
+        
+        参数:
+            text: 要提取FAQ的文本
             
+        返回:
+            提取的FAQ列表，只保留包含question和answer的项；LLM调用失败或响应无法解析时返回None
+        """
         # FAQ提取的提示模板
         system_prompt = """你是一位专业的知识提取专家。你的任务是从文本中提取可能的常见问题(FAQ)。这些问题应该是用户可能会问的关于文本内容的自然问题，答案应该能在文本中找到。提取的FAQ应该覆盖文本中最重要的概念和信息。
 
@@ -238,7 +1033,7 @@ class KnowledgeBuilder:
 
         try:
             # 生成FAQ
-            response = self.llm_client.sync_generate(
+            response = await self.llm_client.async_generate(
                 prompt=user_prompt,
                 system_prompt=system_prompt,
                 temperature=0.2
@@ -254,14 +1049,17 @@ class KnowledgeBuilder:
                 if start_idx >= 0 and end_idx > start_idx:
                     json_str = response[start_idx:end_idx]
                     faqs = json.loads(json_str)
-                    return faqs
+                    return [
+                        faq for faq in faqs
+                        if isinstance(faq, dict) and isinstance(faq.get("question"), str) and isinstance(faq.get("answer"), str)
+                    ]
                 else:
                     logger.error(f"No valid JSON found in LLM response: {response}")
-                    return []
+                    return None
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse JSON from LLM response: {str(e)}")
-                return []
+                return None
                 
         except Exception as e:
             logger.error(f"Failed to extract FAQs: {str(e)}")
-            return [] 
\ No newline at end of file
+            return None 
\ No newline at end of file
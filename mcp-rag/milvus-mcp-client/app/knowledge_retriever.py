@@ -3,31 +3,127 @@
 功能：实现RAG(检索增强生成)技术与知识库交互
 作用：对用户问题进行拆解、知识检索、内容筛选和回答生成
 主要功能：
-1. 问题拆解：将复杂问题拆解为更简单的子问题
-2. 知识检索：在知识库和FAQ库中检索相关内容
-3. 内容筛选：根据相关性对检索结果进行筛选和排序
-4. 回答生成：基于检索内容使用LLM生成回答
+1. 问题拆解：将复杂问题拆解为更简单的子问题，简短的单一意图问题跳过拆解，拆解结果按问题缓存
+2. 知识检索：并发地在知识库和FAQ库中检索所有子问题的相关内容
+3. 内容筛选：根据相关性（启用SEARCH_MMR时按MMR兼顾多样性）对检索结果排序，在token预算内挑选上下文，过长的文本块只保留最相关的句子
+4. 回答生成：基于检索内容使用LLM生成回答，query_stream逐段输出回答
+5. 语义缓存：启用SEMANTIC_CACHE时，与历史问题足够相似的问题直接返回缓存的回答
 """
+import re
+import time
 import asyncio
-from typing import Dict, List, Any, Optional, Union
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Union, Callable, Awaitable, AsyncIterator, Tuple
 from loguru import logger
 import json
 
-from app.mcp_client import MCPClient
+from app.mcp_client import MCPClient, MCPToolError
 from app.llm_client import LLMClient
-from app.config import MAX_SEARCH_RESULTS
+from app.config import (
+    MAX_SEARCH_RESULTS, SEARCH_RERANK, SEARCH_TIMEOUT, SEMANTIC_CACHE, DECOMPOSE_SKIP_MAX_LENGTH, DECOMPOSE_CACHE_SIZE,
+    CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_ITEM_TOKENS, SEARCH_MMR, MMR_LAMBDA, MMR_DUPLICATE_THRESHOLD
+)
+from app.semantic_cache import SemanticCache
+from app.token_counter import get_token_counter
+from app.tracing import start_span
+
+try:
+    import numpy as np
+except ImportError:  # MMR为可选功能
+    np = None
+
+# 没有检索到上下文和生成失败时的回答，这两种回答不进入语义缓存
+NO_CONTEXT_ANSWER = "抱歉，我没有找到与您问题相关的信息。请尝试用不同的方式提问，或者提供更多的上下文信息。"
+ERROR_ANSWER = "抱歉，在生成回答时发生了错误。请稍后再试。"
+
+# 问题包含多个意图的标志：连接词、比较、列举和多个问句
+MULTI_INTENT_PATTERN = re.compile(
+    r"和|与|及|以及|还有|并且|而且|同时|分别|区别|比较|对比|优缺点|哪些|、|；|;"
+    r"|\b(and|or|vs|versus|compare|difference|between|both)\b",
+    re.IGNORECASE
+)
+# 长度按汉字数加英文单词数计算
+QUESTION_TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[A-Za-z0-9]+")
+
+# 句子：到中英文句末标点、换行或文本结尾为止，包括其后的空白（英文句点后须有空白，避免切开小数）
+SENTENCE_PATTERN = re.compile(r".+?(?:[。！？!?；;]+|\.(?=\s)|\n|$)\s*", re.S)
+# 每个上下文项在提示中的序号和换行大约占用的token数
+ITEM_OVERHEAD_TOKENS = 4
+# 剩余预算少于该值时不再裁剪文本块放入上下文
+MIN_TRIMMED_ITEM_TOKENS = 32
+
+
+def _terms(text: str) -> set:
+    """文本的词项：小写英文单词和数字，以及相邻两个汉字组成的二元组（单字文本取单字）"""
+    text = text.lower()
+    terms = set(re.findall(r"[a-z0-9]{2,}", text))
+    for run in re.findall(r"[\u4e00-\u9fff]+", text):
+        if len(run) == 1:
+            terms.add(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def _overlap(question_terms: set, text: str) -> float:
+    """问题词项在文本中出现的比例"""
+    if not question_terms:
+        return 0.0
+    return len(question_terms & _terms(text)) / len(question_terms)
+
+
+def _item_text(item: Dict[str, Any]) -> str:
+    """上下文项放入提示的文本"""
+    content = item["content"]
+    if item["type"] == "faq":
+        return f"问: {content['question']}\n   答: {content['answer']}"
+    return content["content"]
 
 class KnowledgeRetriever:
     """知识检索器，用于对知识库执行RAG查询"""
     
-    def __init__(self, max_search_results: int = MAX_SEARCH_RESULTS):
+    def __init__(
+        self,
+        max_search_results: int = MAX_SEARCH_RESULTS,
+        rerank: bool = SEARCH_RERANK,
+        search_timeout: float = SEARCH_TIMEOUT,
+        semantic_cache: bool = SEMANTIC_CACHE,
+        mmr: bool = SEARCH_MMR
+    ):
         """
         初始化知识检索器
         
         参数:
             max_search_results: 返回的最大搜索结果数量
+            rerank: 是否请求服务器对检索结果进行交叉编码器重排序
+            search_timeout: 单次检索调用的超时秒数
+            semantic_cache: 是否启用语义答案缓存
+            mmr: 是否取回检索结果的向量，按MMR挑选上下文
         """
         self.max_search_results = max_search_results
+        self.rerank = rerank
+        self.search_timeout = search_timeout
+        if mmr and np is None:
+            logger.warning("SEARCH_MMR is enabled but numpy is not installed, MMR disabled")
+            mmr = False
+        self.mmr = mmr
+        self.mmr_lambda = MMR_LAMBDA
+        self.mmr_duplicate_threshold = MMR_DUPLICATE_THRESHOLD
+        self.context_token_budget = CONTEXT_TOKEN_BUDGET
+        self.context_max_item_tokens = CONTEXT_MAX_ITEM_TOKENS
+        self.token_counter = get_token_counter()
+        self.last_prompt_tokens = 0
+        self.decompose_skip_max_length = DECOMPOSE_SKIP_MAX_LENGTH
+        self.decompose_cache_size = DECOMPOSE_CACHE_SIZE
+        self._decompose_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.decompose_stats = {"questions": 0, "skipped": 0, "cached": 0, "llm": 0}
+        # 最近一次查询各步骤的耗时（秒），流式查询包含首个token的时间ttft
+        self.last_timings: Dict[str, float] = {}
+        self.cache = None
+        if semantic_cache:
+            if SemanticCache.available():
+                self.cache = SemanticCache()
+            else:
+                logger.warning("SEMANTIC_CACHE is enabled but sentence-transformers is not installed, cache disabled")
         self.mcp_client = MCPClient()
         self.llm_client = LLMClient()
         logger.info(f"Initialized KnowledgeRetriever with max_search_results={max_search_results}")
@@ -42,57 +138,308 @@ class KnowledgeRetriever:
         返回:
             问题的答案
         """
+        # 整个查询记录为一条链路的根 span，各步骤与服务器端的工具调用均为其子 span
+        with start_span("rag.query", attributes={"rag.question": question[:200]}) as span:
+            if self.cache is None:
+                return await self._query(question)
+                
+            # 语义缓存：相似问题命中时跳过拆解、检索和生成
+            embedding = await self.cache.embed(question)
+            hit = self.cache.lookup(embedding, self._cache_scope())
+            if span is not None:
+                span.set_attribute("rag.cache_hit", hit is not None)
+            if hit is not None:
+                return hit["answer"]
+                
+            answer = await self._query(question)
+            if answer not in (NO_CONTEXT_ANSWER, ERROR_ANSWER):
+                self.cache.store(question, embedding, answer, self._cache_scope())
+            return answer
+            
+    async def query_stream(self, question: str) -> AsyncIterator[str]:
+        """
+        查询知识库，在回答生成的过程中逐段产出回答
+        
+        问题拆解、检索和过滤与query相同，回答生成改为流式调用LLM，首段文本到达即可输出，
+        首段文本的耗时记录在last_timings["ttft"]中
+        
+        参数:
+            question: 要回答的问题
+            
+        返回:
+            逐段产出回答文本的异步迭代器
+        """
+        with start_span("rag.query", attributes={"rag.question": question[:200]}) as span:
+            start = time.perf_counter()
+            embedding = None
+            if self.cache is not None:
+                embedding = await self.cache.embed(question)
+                hit = self.cache.lookup(embedding, self._cache_scope())
+                if span is not None:
+                    span.set_attribute("rag.cache_hit", hit is not None)
+                if hit is not None:
+                    elapsed = time.perf_counter() - start
+                    self.last_timings = {"ttft": elapsed, "total": elapsed}
+                    yield hit["answer"]
+                    return
+                    
+            timings = {}
+            filtered_context = await self._prepare_context(question, timings, start)
+            
+            # 步骤4: 流式生成答案
+            step_start = time.perf_counter()
+            parts = []
+            failed = False
+            with start_span("rag.generate", attributes={"rag.context_items": len(filtered_context)}) as generate_span:
+                prompts = self._build_answer_prompts(question, filtered_context)
+                if prompts is None:
+                    parts.append(NO_CONTEXT_ANSWER)
+                    timings["ttft"] = time.perf_counter() - start
+                    yield NO_CONTEXT_ANSWER
+                else:
+                    system_prompt, user_prompt = prompts
+                    try:
+                        async for text in self.llm_client.generate_stream(
+                            prompt=user_prompt,
+                            system_prompt=system_prompt,
+                            temperature=0.5
+                        ):
+                            if not parts:
+                                timings["ttft"] = time.perf_counter() - start
+                                if generate_span is not None:
+                                    generate_span.set_attribute("rag.ttft_ms", round(timings["ttft"] * 1000, 1))
+                            parts.append(text)
+                            yield text
+                    except Exception as e:
+                        failed = True
+                        logger.error(f"Error generating answer: {str(e)}")
+                        if not parts:
+                            timings["ttft"] = time.perf_counter() - start
+                            yield ERROR_ANSWER
+            timings["generate"] = time.perf_counter() - step_start
+            
+            timings["total"] = time.perf_counter() - start
+            self._log_timings(timings)
+            
+            answer = "".join(parts)
+            if embedding is not None and not failed and answer and answer != NO_CONTEXT_ANSWER:
+                self.cache.store(question, embedding, answer, self._cache_scope())
+                
+    def _cache_scope(self) -> str:
+        """影响检索结果从而影响回答的参数，参数不同的查询不共享语义缓存条目"""
+        return f"max_results={self.max_search_results};rerank={self.rerank};mmr={self.mmr}"
+            
+    async def _query(self, question: str) -> str:
+        """
+        执行查询的各个步骤：问题分解、检索、过滤和回答生成
+        
+        参数:
+            question: 要回答的问题
+            
+        返回:
+            问题的答案
+        """
+        # 记录各步骤耗时（秒）
+        timings = {}
+        start = time.perf_counter()
+        filtered_context = await self._prepare_context(question, timings, start)
+        
+        # 步骤4: 使用过滤后的上下文生成答案
+        step_start = time.perf_counter()
+        with start_span("rag.generate", attributes={"rag.context_items": len(filtered_context)}):
+            answer = await self._generate_answer(question, filtered_context)
+        timings["generate"] = time.perf_counter() - step_start
+        
+        timings["total"] = time.perf_counter() - start
+        self._log_timings(timings)
+        return answer
+        
+    def _log_timings(self, timings: Dict[str, float]) -> None:
+        """记录并输出一次查询各步骤的耗时"""
+        self.last_timings = timings
+        logger.info("Query timings: " + ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items()))
+        
+    async def _prepare_context(self, question: str, timings: Dict[str, float], start: float) -> List[Dict[str, Any]]:
+        """
+        执行生成回答之前的步骤：连接、问题分解、检索和过滤
+        
+        参数:
+            question: 要回答的问题
+            timings: 记录各步骤耗时的字典
+            start: 查询开始的时间
+            
+        返回:
+            过滤后的上下文项
+        """
         # 如果需要，连接到MCP服务器
         if not hasattr(self.mcp_client, '_connected') or not self.mcp_client._connected:
-            await self.mcp_client.connect()
+            with start_span("mcp.connect"):
+                await self.mcp_client.connect()
+            timings["connect"] = time.perf_counter() - start
             
         # 步骤1: 重写并分解问题
-        sub_questions = await self._decompose_question(question)
+        step_start = time.perf_counter()
+        with start_span("rag.decompose") as span:
+            sub_questions = await self._decompose_question(question)
+            if span is not None:
+                span.set_attribute("rag.sub_questions", len(sub_questions))
+        timings["decompose"] = time.perf_counter() - step_start
         logger.info(f"Decomposed question into {len(sub_questions)} sub-questions")
         
-        # 步骤2: 为每个子问题搜索相关内容
-        all_context = []
-        
-        for sub_q in sub_questions:
-            # 搜索知识库
-            try:
-                knowledge_results = await self.mcp_client.search_knowledge(
-                    query=sub_q,
-                    size=self.max_search_results
-                )
-                all_context.extend([{"type": "knowledge", "content": item} for item in knowledge_results])
-            except Exception as e:
-                logger.error(f"Error searching knowledge base: {str(e)}")
-                
-            # 搜索FAQ库
-            try:
-                faq_results = await self.mcp_client.search_faq(
-                    query=sub_q,
-                    size=self.max_search_results
-                )
-                all_context.extend([{"type": "faq", "content": item} for item in faq_results])
-            except Exception as e:
-                logger.error(f"Error searching FAQ base: {str(e)}")
+        # 步骤2: 并发搜索每个子问题的相关内容
+        step_start = time.perf_counter()
+        with start_span("rag.retrieve", attributes={"rag.searches": 2 * len(sub_questions)}):
+            all_context = await self._retrieve(sub_questions)
+        timings["retrieve"] = time.perf_counter() - step_start
                 
         # 步骤3: 过滤和排序搜索结果
+        step_start = time.perf_counter()
         filtered_context = await self._filter_context(question, all_context)
+        timings["filter"] = time.perf_counter() - step_start
         logger.info(f"Filtered {len(all_context)} context items to {len(filtered_context)}")
+        return filtered_context
         
-        # 步骤4: 使用过滤后的上下文生成答案
-        answer = await self._generate_answer(question, filtered_context)
+    async def _retrieve(self, sub_questions: List[str]) -> List[Dict[str, Any]]:
+        """
+        并发地在知识库和FAQ库中搜索所有子问题
         
-        return answer
+        每次检索单独设置search_timeout超时，失败或超时的检索按无结果处理，不影响其他检索
+        
+        参数:
+            sub_questions: 子问题列表
+            
+        返回:
+            上下文项列表，按子问题顺序排列，每个子问题的知识库结果在FAQ结果之前；
+            search为结果所属检索的序号
+        """
+        searches = []
+        for sub_q in sub_questions:
+            searches.append(("knowledge", self.mcp_client.search_knowledge, sub_q))
+            searches.append(("faq", self.mcp_client.search_faq, sub_q))
+            
+        results = await asyncio.gather(*(self._search(kind, search, sub_q) for kind, search, sub_q in searches))
+        
+        all_context = []
+        failed = 0
+        for index, ((kind, _, _), items) in enumerate(zip(searches, results)):
+            if items is None:
+                failed += 1
+                continue
+            all_context.extend([{"type": kind, "content": item, "search": index} for item in items])
+        if failed:
+            logger.warning(f"{failed}/{len(searches)} searches failed or timed out, continuing with partial results")
+        return all_context
+        
+    async def _search(
+        self,
+        kind: str,
+        search: Callable[..., Awaitable[List[Dict[str, Any]]]],
+        query: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        执行一次带超时的检索
+        
+        参数:
+            kind: 检索的库，"knowledge"或"faq"
+            search: MCP客户端的检索方法
+            query: 检索的问题
+            
+        返回:
+            检索结果，失败（包括服务器返回错误或过载）或超时时返回None
+        """
+        try:
+            return await asyncio.wait_for(
+                search(query=query, size=self.max_search_results, rerank=self.rerank, include_vectors=self.mmr),
+                timeout=self.search_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Searching {kind} base timed out after {self.search_timeout}s: {query}")
+        except MCPToolError as e:
+            retry = f", server asks to retry after {e.retry_after}s" if e.retry_after else ""
+            logger.error(f"Searching {kind} base failed{retry}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error searching {kind} base: {str(e)}")
+        return None
         
     async def _decompose_question(self, question: str) -> List[str]:
         """
         将复杂问题分解为更简单的子问题
         
+        简短的单一意图问题直接作为唯一的子问题，不调用LLM；
+        LLM拆解的结果按规范化后的问题缓存在LRU中
+        
         参数:
-            question:, 要分解的问题
+            question: 要分解的问题
             
         返回:
             子问题列表
         """
+        self.decompose_stats["questions"] += 1
+        if self._is_simple_question(question):
+            self.decompose_stats["skipped"] += 1
+            source = "skipped (simple question)"
+            sub_questions = [question]
+        else:
+            key = self._normalize_question(question)
+            cached = self._decompose_cache.get(key)
+            if cached is not None:
+                self._decompose_cache.move_to_end(key)
+                self.decompose_stats["cached"] += 1
+                source = "cached"
+                sub_questions = list(cached)
+            else:
+                self.decompose_stats["llm"] += 1
+                source = "llm"
+                sub_questions = await self._decompose_with_llm(question)
+                if sub_questions is None:
+                    sub_questions = [question]
+                elif self.decompose_cache_size > 0:
+                    self._decompose_cache[key] = list(sub_questions)
+                    if len(self._decompose_cache) > self.decompose_cache_size:
+                        self._decompose_cache.popitem(last=False)
+                        
+        stats = self.decompose_stats
+        avoided = stats["skipped"] + stats["cached"]
+        logger.info(
+            f"Decomposition {source}; LLM calls avoided {avoided}/{stats['questions']} "
+            f"({avoided / stats['questions']:.0%})"
+        )
+        return sub_questions
+        
+    def _is_simple_question(self, question: str) -> bool:
+        """
+        判断问题是否简短且只有一个意图，这类问题拆解后通常只得到原问题本身
+        
+        参数:
+            question: 问题
+            
+        返回:
+            是否可以跳过拆解
+        """
+        if self.decompose_skip_max_length <= 0:
+            return False
+        if len(QUESTION_TOKEN_PATTERN.findall(question)) > self.decompose_skip_max_length:
+            return False
+        if re.search(r"[?？]", question.rstrip("?？ ")):
+            # 除结尾外还有问号，说明包含多个问句
+            return False
+        return MULTI_INTENT_PATTERN.search(question) is None
+        
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """规范化问题作为缓存键：小写、合并空白、去掉结尾的标点"""
+        return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?？。.!！ ")
+        
+    async def _decompose_with_llm(self, question: str) -> Optional[List[str]]:
+        """
+        调用LLM拆解问题
+        
+        参数:
+            question: 要分解的问题
+            
+        返回:
+            子问题列表，调用或解析失败时返回None
+        """
         system_prompt = """你是一位问题分析专家。你的任务是将复杂问题分解为更简单的子问题，以便更好地检索相关信息。
 
 请遵循以下规则：
@@ -117,7 +464,7 @@ class KnowledgeRetriever:
 
         try:
             # 生成子问题
-            response = self.llm_client.sync_generate(
+            response = await self.llm_client.async_generate(
                 prompt=user_prompt,
                 system_prompt=system_prompt,
                 temperature=0.3
@@ -132,21 +479,28 @@ class KnowledgeRetriever:
                 if start_idx >= 0 and end_idx > start_idx:
                     json_str = response[start_idx:end_idx]
                     sub_questions = json.loads(json_str)
-                    return sub_questions
-                else:
-                    logger.warning(f"No valid JSON found in LLM response, using original question")
-                    return [question]
+                    if isinstance(sub_questions, list):
+                        sub_questions = [q for q in sub_questions if isinstance(q, str) and q.strip()]
+                        if sub_questions:
+                            return sub_questions
+                logger.warning(f"No valid JSON found in LLM response, using original question")
+                return None
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse JSON from LLM response: {str(e)}")
-                return [question]
+                return None
                 
         except Exception as e:
             logger.error(f"Error decomposing question: {str(e)}")
-            return [question]
+            return None
             
     async def _filter_context(self, question: str, context_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        根据与问题的相关性过滤上下文项
+        根据与问题的相关性，在token预算内挑选上下文项
+        
+        去重后按相关性从高到低依次放入上下文，直到用完context_token_budget：重排序的结果使用服务器返回的score
+        在所属检索内归一化后的值（见_rerank_relevance），否则使用与问题的词项重合度（相同时FAQ在前，其余保持检索顺序）。启用MMR且所有结果都带有向量时，
+        改为按MMR顺序放入，并丢弃与已选内容近似重复的结果。超过context_max_item_tokens
+        或剩余预算的知识库文本块只保留与问题最相关的句子，放不下的FAQ跳过。
         
         参数:
             question: 原始问题
@@ -155,43 +509,181 @@ class KnowledgeRetriever:
         返回:
             过滤后的上下文项列表
         """
-        # 简单过滤：去重和截断
+        # 交叉编码器的得分只在同一检索内可比，去重前先在各检索内归一化
+        rerank_relevance = self._rerank_relevance(context_items) if self.rerank else {}
+        
+        # 简单过滤：去重
         seen_contents = set()
-        filtered_items = []
+        unique_items = []
         
         # 优先处理FAQ类型
         faq_items = [item for item in context_items if item["type"] == "faq"]
         knowledge_items = [item for item in context_items if item["type"] == "knowledge"]
         
-        # 首先处理FAQ
-        for item in faq_items:
-            content_key = None
+        for item in faq_items + knowledge_items:
+            content = item["content"]
             if item["type"] == "faq":
-                content = item["content"]
                 content_key = f"faq:{content['question']}"
-            
-            if content_key and content_key not in seen_contents:
+            else:
+                content_key = f"knowledge:{content['content'][:100]}"  # 使用前100个字符作为键
+            if content_key not in seen_contents:
                 seen_contents.add(content_key)
-                filtered_items.append(item)
+                unique_items.append(item)
         
-        # 然后处理知识库项
-        for item in knowledge_items:
-            content_key = None
-            if item["type"] == "knowledge":
-                content = item["content"]
-                content_key = f"knowledge:{content['content'][:100]}"  # 使用前100个字符作为键
+        # 按相关性排序，sorted是稳定排序，相关性相同时保持FAQ在前和检索顺序
+        question_terms = _terms(question)
+        
+        def relevance(item: Dict[str, Any]) -> float:
+            if self.rerank:
+                return rerank_relevance.get(id(item), float("-inf"))
+            return _overlap(question_terms, _item_text(item))
             
-            if content_key and content_key not in seen_contents:
-                seen_contents.add(content_key)
-                filtered_items.append(item)
+        ranked_items = None
+        if self.mmr and unique_items:
+            ranked_items = self._mmr_order(unique_items, [relevance(item) for item in unique_items])
+        if ranked_items is None:
+            ranked_items = sorted(unique_items, key=relevance, reverse=True)
         
-        # 限制上下文项的总数
-        max_context_items = 6  # 根据上下文容量调整
-        if len(filtered_items) > max_context_items:
-            filtered_items = filtered_items[:max_context_items]
+        # 按token预算装入上下文
+        used_tokens = 0
+        trimmed = 0
+        filtered_items = []
+        for item in ranked_items:
+            limit = min(self.context_max_item_tokens, self.context_token_budget - used_tokens)
+            tokens = self._item_tokens(item)
+            if tokens > limit:
+                if item["type"] != "knowledge" or limit < MIN_TRIMMED_ITEM_TOKENS:
+                    continue
+                item = self._trim_item(item, question_terms, limit)
+                if item is None:
+                    continue
+                tokens = self._item_tokens(item)
+                trimmed += 1
+            filtered_items.append(item)
+            used_tokens += tokens
             
+        logger.info(
+            f"Packed {len(filtered_items)}/{len(unique_items)} context items ({trimmed} trimmed) "
+            f"into {used_tokens}/{self.context_token_budget} tokens"
+        )
         return filtered_items
         
+    @staticmethod
+    def _rerank_relevance(context_items: List[Dict[str, Any]]) -> Dict[int, float]:
+        """
+        将重排序得分在各次检索内归一化到[0, 1]
+        
+        服务器对每次检索的结果分别以该检索的子问题打分，交叉编码器的原始得分在不同子问题之间没有可比性，
+        直接合并排序会让得分整体偏高的子问题占满上下文。归一化后每次检索的最佳结果都为1，最差结果为0，
+        只有一个结果或得分相同时均为1。
+        
+        参数:
+            context_items: 检索得到的上下文项，search为所属检索的序号，没有时视为同一检索
+            
+        返回:
+            以id(上下文项)为键的相关性，没有score的项不在其中
+        """
+        groups: Dict[Any, List[Dict[str, Any]]] = {}
+        for item in context_items:
+            if item["content"].get("score") is not None:
+                groups.setdefault(item.get("search"), []).append(item)
+                
+        relevance = {}
+        for items in groups.values():
+            scores = [item["content"]["score"] for item in items]
+            low, spread = min(scores), max(scores) - min(scores)
+            for item, score in zip(items, scores):
+                relevance[id(item)] = (score - low) / spread if spread > 0 else 1.0
+        return relevance
+        
+    def _mmr_order(self, items: List[Dict[str, Any]], relevances: List[float]) -> Optional[List[Dict[str, Any]]]:
+        """
+        按最大边际相关性（MMR）排列上下文项
+        
+        每一步选出 mmr_lambda * 相关性 - (1 - mmr_lambda) * 与已选项的最大余弦相似度 最高的项，
+        相关性归一化到[0, 1]；与已选项的相似度达到mmr_duplicate_threshold的项视为近似重复，直接丢弃。
+        相似度矩阵由检索结果自带的向量一次算出。
+        
+        参数:
+            items: 去重后的上下文项
+            relevances: 各项与问题的相关性
+            
+        返回:
+            按MMR顺序排列的上下文项，有结果不带向量（如服务器不支持include_vectors）时返回None
+        """
+        vectors = [item["content"].get("vector") for item in items]
+        if any(not vector for vector in vectors) or len({len(vector) for vector in vectors}) != 1:
+            logger.warning("Search results carry no vectors, falling back to relevance ordering")
+            return None
+            
+        matrix = np.asarray(vectors, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        similarity = matrix @ matrix.T
+        
+        relevance = np.asarray(relevances, dtype=np.float32)
+        finite = np.isfinite(relevance)
+        relevance[~finite] = relevance[finite].min() if finite.any() else 0.0
+        spread = relevance.max() - relevance.min()
+        relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+        
+        # max_similarity[i]：候选i与已选项的最大相似度；remaining标记尚未选中也未丢弃的候选
+        max_similarity = np.full(len(items), -np.inf, dtype=np.float32)
+        remaining = np.ones(len(items), dtype=bool)
+        order = []
+        while remaining.any():
+            penalty = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * penalty
+            scores[~remaining] = -np.inf
+            best = int(np.argmax(scores))
+            order.append(best)
+            remaining[best] = False
+            max_similarity = np.maximum(max_similarity, similarity[best])
+            remaining &= max_similarity < self.mmr_duplicate_threshold
+            
+        dropped = len(items) - len(order)
+        if dropped:
+            logger.info(f"MMR dropped {dropped}/{len(items)} near-duplicate context items")
+        return [items[i] for i in order]
+        
+    def _item_tokens(self, item: Dict[str, Any]) -> int:
+        """上下文项在提示中占用的token数（包括序号和换行）"""
+        return self.token_counter.count(_item_text(item)) + ITEM_OVERHEAD_TOKENS
+        
+    def _trim_item(self, item: Dict[str, Any], question_terms: set, limit: int) -> Optional[Dict[str, Any]]:
+        """
+        将知识库文本块裁剪为与问题最相关的句子
+        
+        按与问题的词项重合度从高到低选取与问题有重合的句子，直到达到limit个token，选中的句子按原文顺序拼接；
+        没有句子与问题重合时保留开头的句子
+        
+        参数:
+            item: 知识库上下文项
+            question_terms: 问题的词项
+            limit: 裁剪后最多的token数（包括序号和换行）
+            
+        返回:
+            裁剪后的上下文项，一个句子都放不下时返回None
+        """
+        sentences = SENTENCE_PATTERN.findall(item["content"]["content"])
+        scores = [_overlap(question_terms, sentence) for sentence in sentences]
+        order = sorted((i for i in range(len(sentences)) if scores[i] > 0), key=lambda i: scores[i], reverse=True)
+        if not order:
+            order = range(len(sentences))
+        
+        budget = limit - ITEM_OVERHEAD_TOKENS
+        chosen = []
+        for i in order:
+            tokens = self.token_counter.count(sentences[i])
+            if tokens <= budget:
+                chosen.append(i)
+                budget -= tokens
+        if not chosen:
+            return None
+            
+        content = dict(item["content"])
+        content["content"] = "".join(sentences[i] for i in sorted(chosen)).strip()
+        return {**item, "content": content}
+        
     async def _generate_answer(self, question: str, context_items: List[Dict[str, Any]]) -> str:
         """
         基于问题和上下文生成答案
@@ -203,6 +695,36 @@ class KnowledgeRetriever:
         返回:
             生成的答案
         """
+        prompts = self._build_answer_prompts(question, context_items)
+        if prompts is None:
+            return NO_CONTEXT_ANSWER
+        system_prompt, user_prompt = prompts
+        
+        try:
+            # 生成答案
+            response = await self.llm_client.async_generate(
+                prompt=user_prompt,
+                system_prompt=system_prompt,
+                temperature=0.5
+            )
+            
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error generating answer: {str(e)}")
+            return ERROR_ANSWER
+            
+    def _build_answer_prompts(self, question: str, context_items: List[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+        """
+        构建回答生成的系统提示和用户提示
+        
+        参数:
+            question: 原始问题
+            context_items: 过滤后的上下文项
+            
+        返回:
+            (系统提示, 用户提示)，没有上下文时返回None
+        """
         # 准备上下文文本
         context_text = ""
         
@@ -219,13 +741,13 @@ class KnowledgeRetriever:
         if faq_items:
             context_text += "【FAQ内容】\n"
             for i, item in enumerate(faq_items, 1):
-                question = item["content"]["question"]
-                answer = item["content"]["answer"]
-                context_text += f"{i}. 问: {question}\n   答: {answer}\n\n"
+                faq_question = item["content"]["question"]
+                faq_answer = item["content"]["answer"]
+                context_text += f"{i}. 问: {faq_question}\n   答: {faq_answer}\n\n"
                 
         # 如果没有找到上下文
         if not context_text:
-            return "抱歉，我没有找到与您问题相关的信息。请尝试用不同的方式提问，或者提供更多的上下文信息。"
+            return None
             
         # 准备系统提示
         system_prompt = """你是一个专业的问答助手。你的任务是基于提供的上下文信息，回答用户的问题。请遵循以下规则：
@@ -245,16 +767,9 @@ class KnowledgeRetriever:
 
 问题：{question}"""
 
-        try:
-            # 生成答案
-            response = self.llm_client.sync_generate(
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                temperature=0.5
-            )
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"Error generating answer: {str(e)}")
-            return "抱歉，在生成回答时发生了错误。请稍后再试。" 
\ No newline at end of file
+        self.last_prompt_tokens = self.token_counter.count(system_prompt) + self.token_counter.count(user_prompt)
+        logger.info(
+            f"Prompt tokens: {self.last_prompt_tokens} (context budget {self.context_token_budget}, "
+            f"{'tokenizer ' + self.token_counter.encoding_name if self.token_counter.exact else 'estimated'})"
+        )
+        return system_prompt, user_prompt
\ No newline at end of file
@@ -3,12 +3,12 @@ LLM 客户端模块
 功能：提供与大型语言模型(LLM)的交互接口
 作用：使用OpenAI兼容API调用LLM模型，用于生成文本、问题拆解和FAQ提取
 主要功能：
-1. 异步和同步调用LLM模型生成文本
+1. 异步和同步调用LLM模型生成文本，支持流式输出
 2. 支持工具调用功能(Function Calling)
 3. 处理模型响应并转换为适当的数据结构
 """
 import json
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, AsyncIterator
 from loguru import logger
 import os
 from openai import OpenAI, AsyncOpenAI
@@ -46,7 +46,7 @@ class LLMClient:
         self, 
         messages: List[Dict[str, str]], 
         temperature: float = 0.7,
-        max_tokens: int = 1500,
+        max_tokens: Optional[int] = 1500,
         tools: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
@@ -55,7 +55,7 @@ class LLMClient:
         参数:
             messages: 包含角色和内容的消息对象列表
             temperature: 采样温度
-            max_tokens: 生成的最大token数量
+            max_tokens: 生成的最大token数量，None表示使用模型的默认值
             tools: 提供给模型的可选工具列表
             
         返回:
@@ -68,6 +68,8 @@ class LLMClient:
             
             # 如果提供了工具，准备额外参数
             kwargs = {}
+            if max_tokens is not None:
+                kwargs["max_tokens"] = max_tokens
             if tools:
                 kwargs["tools"] = tools
                 kwargs["tool_choice"] = "auto"
@@ -77,7 +79,6 @@ class LLMClient:
                 model=self.model,
                 messages=messages,
                 temperature=temperature,
-                max_tokens=max_tokens,
                 **kwargs
             )
             
@@ -121,6 +122,79 @@ class LLMClient:
             logger.error(f"Error generating response: {str(e)}")
             raise Exception(f"Failed to generate response: {str(e)}")
             
+    async def async_generate(
+        self, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        sync_generate的异步版本，通过AsyncOpenAI调用模型，不阻塞事件循环
+        
+        与sync_generate不同，调用失败时抛出异常而不是返回错误文本
+        
+        参数:
+            prompt: 用户提示
+            system_prompt: 可选的系统提示
+            temperature: 采样温度
+            max_tokens: 生成的最大token数量，None表示使用模型的默认值
+            
+        返回:
+            生成的文本响应
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        response = await self.generate(messages, temperature=temperature, max_tokens=max_tokens)
+        return response["choices"][0]["message"]["content"] or ""
+        
+    async def generate_stream(
+        self, 
+        prompt: str, 
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        以流式方式生成文本，模型每输出一段文本就产出一次
+        
+        参数:
+            prompt: 用户提示
+            system_prompt: 可选的系统提示
+            temperature: 采样温度
+            max_tokens: 生成的最大token数量，None表示使用模型的默认值
+            
+        返回:
+            逐段产出生成文本的异步迭代器，调用失败时抛出异常
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        kwargs = {}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        
+        logger.debug(f"Sending streaming request to LLM API with {len(messages)} messages")
+        stream = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            **kwargs
+        )
+        try:
+            async for chunk in stream:
+                # 部分兼容接口的最后一个chunk没有choices（如携带usage时）
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+            
     def sync_generate(
         self, 
         prompt: str, 
@@ -3,32 +3,44 @@ MCP客户端应用程序入口
 功能：基于Milvus向量数据库的MCP（模型上下文协议）客户端主程序
 作用：提供命令行界面，用于构建知识库和查询知识库
 主要功能：
-1. 知识库构建：从文件或文本中提取内容，切段后存储到Milvus向量数据库
+1. 知识库构建：从文件、目录或文本中提取内容，切段后存储到Milvus向量数据库
 2. FAQ提取：从文本中自动提取常见问题答案对
 3. 知识检索：通过提问检索相关知识，利用RAG技术生成回答
 """
 import os
 import sys
 import asyncio
+import json
 import argparse
 from typing import Dict, List, Any, Optional
 from loguru import logger
 
 from app.knowledge_builder import KnowledgeBuilder
 from app.knowledge_retriever import KnowledgeRetriever
-from app.config import DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP, MAX_SEARCH_RESULTS
+from app.semantic_cache import SemanticCache
+from app.config import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP, MAX_SEARCH_RESULTS, STORE_CONCURRENCY, STORE_BATCH_SIZE, SEMANTIC_CACHE,
+    INGEST_READ_WORKERS, INCREMENTAL_INGEST
+)
 
 async def build_knowledge_base(args):
     """
-    构建知识库：从文件或文本内容构建知识库
+    构建知识库：从文件、目录或文本内容构建知识库
     参数：
-        args: 命令行参数，包含文件路径/文本内容、元数据和分块参数
+        args: 命令行参数，包含文件路径/目录/文本内容、元数据和分块参数
     """
     builder = KnowledgeBuilder(
         chunk_size=args.chunk_size,
-        chunk_overlap=args.chunk_overlap
+        chunk_overlap=args.chunk_overlap,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        read_workers=args.read_workers,
+        incremental=(INCREMENTAL_INGEST or args.incremental) and not args.no_incremental
     )
     
+    def report_progress(stage: str, completed: int, total: int):
+        logger.info(f"Progress ({stage}): {completed}/{total}")
+    
     try:
         metadata = {}
         if args.title:
@@ -38,29 +50,67 @@ async def build_knowledge_base(args):
         if args.tags:
             metadata["tags"] = args.tags.split(",")
             
-        # 从文件或文本构建知识库
-        if args.file:
+        # 从目录、文件或文本构建知识库
+        if args.dir:
+            logger.info(f"Building knowledge base from directory: {args.dir}")
+            result = await builder.build_from_directory(
+                directory=args.dir,
+                include=args.include.split(",") if args.include else None,
+                exclude=args.exclude.split(",") if args.exclude else None,
+                metadata=metadata,
+                extract_faq=not args.no_faq,
+                manifest_path=args.manifest,
+                progress_callback=report_progress
+            )
+            logger.info(
+                f"Processed {result['processed_files']} files ({result['skipped_files']} already ingested), "
+                f"stored {result['stored_chunks']}/{result['total_chunks']} chunks"
+            )
+            if result["failed_files"]:
+                logger.warning(f"Failed files (retried on the next run): {result['failed_files']}")
+            if not args.no_faq:
+                logger.info(f"Extracted {result['extracted_faqs']} FAQs and stored {result['stored_faqs']}")
+            if builder.incremental:
+                logger.info(
+                    f"Removed {result['removed_files']} deleted files; reused {result['reused_chunks']} chunks and "
+                    f"{result['reused_faqs']} FAQs, deleted {result['deleted_chunks']} chunks and "
+                    f"{result['deleted_faqs']} FAQs; saved {result['saved_embeddings']} embeddings and "
+                    f"{result['saved_llm_calls']} LLM calls"
+                )
+            await builder.mcp_client.close()
+            return
+        elif args.file:
             logger.info(f"Building knowledge base from file: {args.file}")
             result = await builder.build_from_file(
                 file_path=args.file,
                 metadata=metadata,
-                extract_faq=not args.no_faq
+                extract_faq=not args.no_faq,
+                progress_callback=report_progress
             )
         elif args.text:
             logger.info("Building knowledge base from provided text")
             result = await builder.build_from_text(
                 text=args.text,
                 metadata=metadata,
-                extract_faq=not args.no_faq
+                extract_faq=not args.no_faq,
+                progress_callback=report_progress
             )
         else:
-            logger.error("Either --file or --text must be provided")
+            logger.error("One of --dir, --file or --text must be provided")
             return
             
         # 打印结果
         logger.info(f"Stored {result['stored_chunks']}/{result['total_chunks']} chunks to knowledge base")
+        if result["failed_chunks"]:
+            logger.warning(f"Failed chunks: {result['failed_chunks']}")
         if not args.no_faq:
-            logger.info(f"Extracted and stored {result['extracted_faqs']} FAQs")
+            logger.info(f"Extracted {result['extracted_faqs']} FAQs and stored {result['stored_faqs']}")
+        if args.file and builder.incremental:
+            logger.info(
+                f"Reused {result['reused_chunks']} chunks and {result['reused_faqs']} FAQs, deleted "
+                f"{result['deleted_chunks']} chunks and {result['deleted_faqs']} FAQs; saved "
+                f"{result['saved_embeddings']} embeddings and {result['saved_llm_calls']} LLM calls"
+            )
             
         # 正确关闭MCP客户端连接
         await builder.mcp_client.close()
@@ -81,19 +131,36 @@ async def query_knowledge_base(args):
         args: 命令行参数，包含问题和最大检索结果数量
     """
     retriever = KnowledgeRetriever(
-        max_search_results=args.max_results
+        max_search_results=args.max_results,
+        semantic_cache=SEMANTIC_CACHE and not args.no_cache
     )
     
     try:
         logger.info(f"Querying knowledge base with question: {args.question}")
-        answer = await retriever.query(args.question)
-        
-        # 打印答案
-        print("\n" + "=" * 80)
-        print("问题:", args.question)
-        print("-" * 80)
-        print("回答:", answer)
-        print("=" * 80)
+        if args.no_stream:
+            answer = await retriever.query(args.question)
+            
+            # 打印答案
+            print("\n" + "=" * 80)
+            print("问题:", args.question)
+            print("-" * 80)
+            print("回答:", answer)
+            print("=" * 80)
+        else:
+            # 流式打印答案：回答的每一段到达后立即输出
+            first = True
+            async for text in retriever.query_stream(args.question):
+                if first:
+                    print("\n" + "=" * 80)
+                    print("问题:", args.question)
+                    print("-" * 80)
+                    print("回答: ", end="", flush=True)
+                    first = False
+                print(text, end="", flush=True)
+            print("\n" + "=" * 80)
+            timings = retriever.last_timings
+            if "ttft" in timings:
+                print(f"首个token耗时: {timings['ttft']:.3f}s，总耗时: {timings['total']:.3f}s")
         
         # 正确关闭MCP客户端连接
         await retriever.mcp_client.close()
@@ -106,6 +173,18 @@ async def query_knowledge_base(args):
         except Exception as close_error:
             logger.error(f"Error closing MCP client: {close_error}")
         sys.exit(1)
+        
+def manage_cache(args):
+    """
+    管理语义答案缓存：查看统计或清空缓存
+    参数：
+        args: 命令行参数
+    """
+    cache = SemanticCache()
+    if args.clear:
+        cache.invalidate()
+        logger.info(f"Cleared semantic cache {cache.path}")
+    print(json.dumps(cache.stats(), ensure_ascii=False, indent=2))
 
 def print_usage_guide():
     """打印应用程序的详细使用指南"""
@@ -125,6 +204,10 @@ def print_usage_guide():
     print("  python -m app.main build --text \"这是要处理的文本内容\" --title \"内容标题\"")
     print("\n不提取FAQ:")
     print("  python -m app.main build --file <文件路径> --no-faq")
+    print("\n导入整个目录（中断后重新运行会跳过已完成的文件）:")
+    print("  python -m app.main build --dir <目录> --include \"*.md,*.txt\" --exclude \"drafts,*.tmp.md\"")
+    print("\n增量导入，重新导入修改过的文件时只存储变化的文本块（已有数据先按README迁移）:")
+    print("  python -m app.main build --file <文件路径> --incremental")
     
     print("\n查询知识库:")
     print("-" * 80)
@@ -132,13 +215,24 @@ def print_usage_guide():
     print("  python -m app.main query --question \"您的问题\"")
     print("\n指定最大结果数:")
     print(f"  python -m app.main query --question \"您的问题\" --max-results {MAX_SEARCH_RESULTS*2}")
+    print("\n等待完整回答后再输出（默认流式输出）:")
+    print("  python -m app.main query --question \"您的问题\" --no-stream")
+    print("\n跳过语义缓存（SEMANTIC_CACHE=true时）:")
+    print("  python -m app.main query --question \"您的问题\" --no-cache")
+    
+    print("\n语义缓存:")
+    print("-" * 80)
+    print("查看命中率等统计:")
+    print("  python -m app.main cache")
+    print("\n清空缓存:")
+    print("  python -m app.main cache --clear")
     
     print("\n" + "=" * 80)
 
 def main():
     """
     应用程序入口点：解析命令行参数并执行相应的命令
-    支持的命令：build(构建知识库)、query(查询知识库)、help(显示帮助)
+    支持的命令：build(构建知识库)、query(查询知识库)、cache(语义缓存统计与清空)、help(显示帮助)
     """
     parser = argparse.ArgumentParser(description="Milvus MCP Client for knowledge base management and querying")
     subparsers = parser.add_subparsers(dest="command", help="Command to execute")
@@ -146,6 +240,7 @@ def main():
     # 构建知识库命令
     build_parser = subparsers.add_parser("build", help="Build knowledge base from file or text")
     build_parser.add_argument("--file", type=str, help="Path to the file to process")
+    build_parser.add_argument("--dir", type=str, help="Directory to ingest recursively")
     build_parser.add_argument("--text", type=str, help="Text content to process")
     build_parser.add_argument("--title", type=str, help="Title of the document")
     build_parser.add_argument("--author", type=str, help="Author of the document")
@@ -153,11 +248,25 @@ def main():
     build_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Size of text chunks")
     build_parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP, help="Overlap between chunks")
     build_parser.add_argument("--no-faq", action="store_true", help="Disable FAQ extraction")
+    build_parser.add_argument("--concurrency", type=int, default=STORE_CONCURRENCY, help="Number of concurrent store calls")
+    build_parser.add_argument("--batch-size", type=int, default=STORE_BATCH_SIZE, help="Items per batch store call (1 stores one by one)")
+    build_parser.add_argument("--include", type=str, help="Comma-separated globs of files to ingest with --dir")
+    build_parser.add_argument("--exclude", type=str, help="Comma-separated globs of files and directories to skip with --dir")
+    build_parser.add_argument("--manifest", type=str, help="Manifest of completed files (default: <dir>/.ingest_manifest.jsonl)")
+    build_parser.add_argument("--read-workers", type=int, default=INGEST_READ_WORKERS, help="Threads reading and chunking files with --dir")
+    build_parser.add_argument("--incremental", action="store_true", help="Store only changed chunks when re-importing files")
+    build_parser.add_argument("--no-incremental", action="store_true", help="Store every chunk again even if INCREMENTAL_INGEST is set")
     
     # 查询知识库命令
     query_parser = subparsers.add_parser("query", help="Query the knowledge base")
     query_parser.add_argument("--question", type=str, required=True, help="Question to ask")
     query_parser.add_argument("--max-results", type=int, default=MAX_SEARCH_RESULTS, help="Maximum number of search results")
+    query_parser.add_argument("--no-cache", action="store_true", help="Bypass the semantic answer cache")
+    query_parser.add_argument("--no-stream", action="store_true", help="Print the answer only when it is complete")
+    
+    # 语义缓存命令
+    cache_parser = subparsers.add_parser("cache", help="Show semantic cache statistics")
+    cache_parser.add_argument("--clear", action="store_true", help="Remove all cached answers")
     
     # 帮助命令
     help_parser = subparsers.add_parser("help", help="Show detailed usage guide")
@@ -170,6 +279,8 @@ def main():
         asyncio.run(build_knowledge_base(args))
     elif args.command == "query":
         asyncio.run(query_knowledge_base(args))
+    elif args.command == "cache":
+        manage_cache(args)
     elif args.command == "help":
         print_usage_guide()
     else:
@@ -12,11 +12,27 @@ import asyncio
 from typing import Dict, List, Any, Optional, Union, Callable
 from loguru import logger
 from mcp.client.sse import sse_client 
-from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+from mcp import ClientSession, types
 from contextlib import AsyncExitStack
 from app.config import MCP_SERVER_URL, TOOLS
+from app.tracing import init_tracing, start_span, trace_carrier
 import json
 
+class MCPToolError(Exception):
+    """MCP工具返回的错误，包括服务器过载时建议的重试等待时间"""
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None, unavailable: bool = False):
+        """
+        参数:
+            message: 错误信息
+            retry_after: 服务器建议的重试等待秒数（过载时返回）
+            unavailable: 服务器没有提供该工具
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.unavailable = unavailable
+
 class MCPClient:
     """MCP服务器交互客户端，负责与Milvus MCP服务器的通信"""
     
@@ -33,8 +49,14 @@ class MCPClient:
         self._connected = False
         self.exit_stack = AsyncExitStack()
         self.session = None
+        init_tracing()
         logger.info(f"Initialized MCP client with server URL: {server_url}")
         
+    @property
+    def streamable_http(self) -> bool:
+        """服务器 URL 以 /mcp 结尾时使用 Streamable HTTP 传输，否则使用 SSE"""
+        return self.server_url.rstrip("/").endswith("/mcp")
+        
     async def __aenter__(self):
         """异步上下文管理器的进入方法"""
         if not self._connected:
@@ -52,11 +74,17 @@ class MCPClient:
         """
         try:
             logger.info(f"Connecting to MCP server at {self.server_url}...")
-            self.client = sse_client(self.server_url)
-            
-            # 使用异步上下文管理器初始化客户端连接
-            stdio_transport = await self.exit_stack.enter_async_context(self.client)
-            read, write = stdio_transport
+            streamable_http = self.streamable_http
+            if streamable_http:
+                # Streamable HTTP：每次工具调用都是一个独立的 HTTP 请求，无需保持 SSE 长连接
+                self.client = streamablehttp_client(self.server_url)
+                read, write, _ = await self.exit_stack.enter_async_context(self.client)
+            else:
+                self.client = sse_client(self.server_url)
+                
+                # 使用异步上下文管理器初始化客户端连接
+                stdio_transport = await self.exit_stack.enter_async_context(self.client)
+                read, write = stdio_transport
             
             # 创建客户端会话
             self.session = await self.exit_stack.enter_async_context(ClientSession(read, write))
@@ -64,25 +92,23 @@ class MCPClient:
             # 初始化会话
             await self.session.initialize()
             
-            # 获取可用工具
-            tools_response = await self.session.list_tools()
-            available_tools = tools_response.tools
+            # 获取可用工具。Streamable HTTP 下工具集由 TOOLS 配置确定，省去一次 list_tools 往返
+            if streamable_http:
+                available_tool_names = set(TOOLS)
+            else:
+                tools_response = await self.session.list_tools()
+                available_tool_names = {tool.name for tool in tools_response.tools}
             
             # 检查我们需要的工具是否可用
             for tool_name in TOOLS:
                 logger.info(f"Checking for tool: {tool_name}")
-                tool_found = False
-                for tool in available_tools:
-                    if tool.name == tool_name:
-                        # 创建一个闭包来捕获工具名称
-                        async def tool_caller(tn=tool_name, **kwargs):
-                            return await self.session.call_tool(tn, kwargs)
-                        self.tools[tool_name] = tool_caller
-                        logger.info(f"Successfully loaded tool: {tool_name}")
-                        tool_found = True
-                        break
-                
-                if not tool_found:
+                if tool_name in available_tool_names:
+                    # 创建一个闭包来捕获工具名称
+                    async def tool_caller(tn=tool_name, **kwargs):
+                        return await self._call_tool(tn, kwargs)
+                    self.tools[tool_name] = tool_caller
+                    logger.info(f"Successfully loaded tool: {tool_name}")
+                else:
                     logger.error(f"Tool not available: {tool_name}")
             
             if not self.tools:
@@ -96,16 +122,70 @@ class MCPClient:
             logger.error(f"Failed to connect to MCP server: {str(e)}")
             raise Exception(f"Failed to connect to MCP server: {str(e)}")
             
-    async def store_knowledge(self, content: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def _call_tool(self, name: str, arguments: Dict[str, Any]) -> types.CallToolResult:
+        """
+        调用MCP工具，启用链路追踪时在请求的 _meta 中携带 traceparent
+        
+        参数:
+            name: 工具名称
+            arguments: 工具参数
+            
+        返回:
+            工具调用结果
+        """
+        with start_span(f"mcp {name}", attributes={"mcp.tool": name}, client=True):
+            carrier = trace_carrier()
+            if not carrier:
+                return await self.session.call_tool(name, arguments)
+            request = types.ClientRequest(
+                types.CallToolRequest(
+                    method="tools/call",
+                    params=types.CallToolRequestParams(
+                        name=name, arguments=arguments, _meta=types.RequestParams.Meta(**carrier)
+                    )
+                )
+            )
+            return await self.session.send_request(request, types.CallToolResult)
+            
+    def has_tool(self, name: str) -> bool:
+        """服务器是否提供指定工具"""
+        return name in self.tools
+        
+    def _check_response(self, name: str, response: types.CallToolResult) -> Dict[str, Any]:
+        """
+        检查工具调用结果，失败时抛出MCPToolError
+        
+        参数:
+            name: 工具名称
+            response: 工具调用结果
+            
+        返回:
+            解析后的JSON响应，无法解析时为空字典
+        """
+        text = "".join(part.text for part in response.content if getattr(part, "text", None))
+        if response.isError:
+            raise MCPToolError(text or f"{name} failed", unavailable=text.startswith("Unknown tool"))
+        try:
+            data = json.loads(text) if text else {}
+        except json.JSONDecodeError:
+            return {}
+        if isinstance(data, dict) and data.get("status") == "error":
+            raise MCPToolError(data.get("message") or data.get("error") or f"{name} failed", retry_after=data.get("retry_after"))
+        return data if isinstance(data, dict) else {}
+        
+    async def store_knowledge(
+        self, content: str, metadata: Optional[Dict[str, Any]] = None, id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         存储知识内容到MCP服务器
         
         参数:
             content: 要存储的文本内容
             metadata: 与内容关联的可选元数据
+            id: 可选的文档ID，服务器用同一ID覆盖之前写入的文档，重试不会重复写入
             
         返回:
-            服务器的响应结果
+            服务器的响应，包含新文档的id
         """
         if not self._connected:
             await self.connect()
@@ -116,20 +196,32 @@ class MCPClient:
             
         try:
             metadata = metadata or {}
-            response = await tool(content=content, metadata=metadata)
+            arguments = {"id": id} if id else {}
+            response = await tool(content=content, metadata=metadata, **arguments)
+            result = self._check_response("storeKnowledge", response)
             logger.info(f"Successfully stored knowledge content")
-            return response
+            return result
+        except MCPToolError:
+            raise
         except Exception as e:
             logger.error(f"Failed to store knowledge: {str(e)}")
             raise Exception(f"Failed to store knowledge: {str(e)}")
             
-    async def search_knowledge(self, query: str, size: int = 5) -> List[Dict[str, Any]]:
+    async def search_knowledge(
+        self,
+        query: str,
+        size: int = 5,
+        rerank: bool = False,
+        include_vectors: bool = False
+    ) -> List[Dict[str, Any]]:
         """
-        在MCP服务器中搜索知识内容
+        在MCP服务器中搜索知识内容，服务器返回错误或过载时抛出MCPToolError（含retry_after）
         
         参数:
             query: 搜索查询
             size: 返回结果的最大数量
+            rerank: 是否由服务器用交叉编码器重排序，结果按score从高到低排列
+            include_vectors: 是否在每条结果的vector字段中返回存储的向量
             
         返回:
             匹配的知识内容列表
@@ -142,7 +234,14 @@ class MCPClient:
             raise Exception("searchKnowledge tool not available")
             
         try:
-            response = await tool(query=query, size=size)
+            arguments = {"query": query, "size": size}
+            if rerank:
+                arguments["rerank"] = True
+            if include_vectors:
+                arguments["include_vectors"] = True
+            response = await tool(**arguments)
+            # 服务器错误或过载（带retry_after）时抛出MCPToolError，而不是当作没有结果
+            self._check_response("searchKnowledge", response)
             
             # 处理CallToolResult对象
             # 从响应内容中提取结果
@@ -163,11 +262,15 @@ class MCPClient:
             
             logger.info(f"Found {len(results)} knowledge results for query: {query}")
             return results
+        except MCPToolError:
+            raise
         except Exception as e:
             logger.error(f"Failed to search knowledge: {str(e)}")
             raise Exception(f"Failed to search knowledge: {str(e)}")
             
-    async def store_faq(self, question: str, answer: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def store_faq(
+        self, question: str, answer: str, metadata: Optional[Dict[str, Any]] = None, id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         存储FAQ内容到MCP服务器
         
@@ -175,9 +278,10 @@ class MCPClient:
             question: FAQ问题
             answer: FAQ答案
             metadata: 与FAQ关联的可选元数据
+            id: 可选的FAQ ID，服务器用同一ID覆盖之前写入的FAQ，重试不会重复写入
             
         返回:
-            服务器的响应结果
+            服务器的响应，包含新FAQ的id
         """
         if not self._connected:
             await self.connect()
@@ -188,20 +292,132 @@ class MCPClient:
             
         try:
             metadata = metadata or {}
-            response = await tool(question=question, answer=answer, metadata=metadata)
+            arguments = {"id": id} if id else {}
+            response = await tool(question=question, answer=answer, metadata=metadata, **arguments)
+            result = self._check_response("storeFAQ", response)
             logger.info(f"Successfully stored FAQ content")
-            return response
+            return result
+        except MCPToolError:
+            raise
         except Exception as e:
             logger.error(f"Failed to store FAQ: {str(e)}")
             raise Exception(f"Failed to store FAQ: {str(e)}")
             
-    async def search_faq(self, query: str, size: int = 5) -> List[Dict[str, Any]]:
+    async def store_knowledge_batch(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        通过一次storeKnowledgeBatch调用存储多条知识内容，整批要么全部写入要么全部失败
+        
+        参数:
+            documents: 文档列表，每项包含content、可选的metadata和可选的id
+            
+        返回:
+            服务器的响应，包含stored和ids
+        """
+        if not self._connected:
+            await self.connect()
+            
+        tool = self.tools.get("storeKnowledgeBatch")
+        if not tool:
+            raise MCPToolError("storeKnowledgeBatch tool not available", unavailable=True)
+            
+        try:
+            response = await tool(documents=documents)
+            result = self._check_response("storeKnowledgeBatch", response)
+            logger.info(f"Successfully stored {result.get('stored', len(documents))} knowledge contents")
+            return result
+        except MCPToolError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to store knowledge batch: {str(e)}")
+            raise Exception(f"Failed to store knowledge batch: {str(e)}")
+            
+    async def store_faq_batch(self, faqs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        通过一次storeFAQBatch调用存储多条FAQ，整批要么全部写入要么全部失败
+        
+        参数:
+            faqs: FAQ列表，每项包含question、answer和可选的id
+            
+        返回:
+            服务器的响应，包含stored和ids
+        """
+        if not self._connected:
+            await self.connect()
+            
+        tool = self.tools.get("storeFAQBatch")
+        if not tool:
+            raise MCPToolError("storeFAQBatch tool not available", unavailable=True)
+            
+        try:
+            response = await tool(faqs=faqs)
+            result = self._check_response("storeFAQBatch", response)
+            logger.info(f"Successfully stored {result.get('stored', len(faqs))} FAQ contents")
+            return result
+        except MCPToolError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to store FAQ batch: {str(e)}")
+            raise Exception(f"Failed to store FAQ batch: {str(e)}")
+            
+    async def delete_knowledge(self, ids: List[str]) -> Dict[str, Any]:
+        """
+        通过一次deleteKnowledge调用按ID删除知识内容
+        
+        参数:
+            ids: 存储时返回的文档ID
+            
+        返回:
+            服务器的响应，包含deleted
+        """
+        return await self._delete("deleteKnowledge", ids)
+        
+    async def delete_faq(self, ids: List[str]) -> Dict[str, Any]:
+        """
+        通过一次deleteFAQ调用按ID删除FAQ
+        
+        参数:
+            ids: 存储时返回的FAQ ID
+            
+        返回:
+            服务器的响应，包含deleted
+        """
+        return await self._delete("deleteFAQ", ids)
+        
+    async def _delete(self, name: str, ids: List[str]) -> Dict[str, Any]:
+        """调用删除工具，服务器不支持时抛出unavailable的MCPToolError"""
+        if not self._connected:
+            await self.connect()
+            
+        tool = self.tools.get(name)
+        if not tool:
+            raise MCPToolError(f"{name} tool not available", unavailable=True)
+            
+        try:
+            response = await tool(ids=ids)
+            result = self._check_response(name, response)
+            logger.info(f"Successfully deleted {result.get('deleted', len(ids))} items with {name}")
+            return result
+        except MCPToolError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to call {name}: {str(e)}")
+            raise Exception(f"Failed to call {name}: {str(e)}")
+            
+    async def search_faq(
+        self,
+        query: str,
+        size: int = 5,
+        rerank: bool = False,
+        include_vectors: bool = False
+    ) -> List[Dict[str, Any]]:
         """
-        在MCP服务器中搜索FAQ内容
+        在MCP服务器中搜索FAQ内容，服务器返回错误或过载时抛出MCPToolError（含retry_after）
         
         参数:
             query: 搜索查询
             size: 返回结果的最大数量
+            rerank: 是否由服务器用交叉编码器重排序，结果按score从高到低排列
+            include_vectors: 是否在每条结果的vector字段中返回问题的向量
             
         返回:
             匹配的FAQ内容列表
@@ -214,7 +430,14 @@ class MCPClient:
             raise Exception("searchFAQ tool not available")
             
         try:
-            response = await tool(query=query, size=size)
+            arguments = {"query": query, "size": size}
+            if rerank:
+                arguments["rerank"] = True
+            if include_vectors:
+                arguments["include_vectors"] = True
+            response = await tool(**arguments)
+            # 服务器错误或过载（带retry_after）时抛出MCPToolError，而不是当作没有结果
+            self._check_response("searchFAQ", response)
             
             # 处理CallToolResult对象
             # 从响应内容中提取结果
@@ -235,6 +458,8 @@ class MCPClient:
             
             logger.info(f"Found {len(results)} FAQ results for query: {query}")
             return results
+        except MCPToolError:
+            raise
         except Exception as e:
             logger.error(f"Failed to search FAQ: {str(e)}")
             raise Exception(f"Failed to search FAQ: {str(e)}")
@@ -0,0 +1,235 @@
+"""
+语义答案缓存模块
+功能：缓存问题的最终回答，语义相近的问题直接返回缓存的回答
+作用：同一问题的不同问法不再重复执行问题拆解、检索和回答生成（三次LLM调用和多次检索）
+主要功能：
+1. 使用本地 sentence-transformers 模型将问题向量化，在内存向量索引中查找相似度超过阈值、检索参数相同的历史问题
+2. 条目按 TTL 过期，知识库写入后整体失效，超出容量时淘汰最久未使用的条目
+3. 统计命中率，并将条目与统计数据持久化到 SEMANTIC_CACHE_FILE，多次命令行运行之间共享
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+from app.config import (
+    SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_FILE
+)
+
+try:
+    import numpy as np
+except ImportError:  # 语义缓存为可选功能
+    np = None
+
+# 同一进程内的各个缓存实例共享向量化模型
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+
+def _load_model(name: str):
+    """加载（并缓存）sentence-transformers 模型"""
+    with _models_lock:
+        if name not in _models:
+            from sentence_transformers import SentenceTransformer
+            logger.info(f"Loading semantic cache embedding model: {name}")
+            _models[name] = SentenceTransformer(name)
+        return _models[name]
+
+
+class SemanticCache:
+    """基于问题向量相似度的回答缓存"""
+
+    def __init__(
+        self,
+        path: str = SEMANTIC_CACHE_FILE,
+        model_name: str = SEMANTIC_CACHE_MODEL,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_size: int = SEMANTIC_CACHE_SIZE
+    ):
+        """
+        初始化语义缓存，缓存文件和向量化模型在第一次使用时才加载
+
+        参数:
+            path: 缓存文件路径
+            model_name: 问题向量化使用的 sentence-transformers 模型
+            threshold: 命中所需的最低余弦相似度
+            ttl: 条目的有效秒数，0表示不过期
+            max_size: 最多保存的条目数
+        """
+        self.path = path
+        self.model_name = model_name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Optional[List[Dict[str, Any]]] = None
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidations": 0}
+        self._matrix = None
+
+    @staticmethod
+    def available() -> bool:
+        """是否安装了语义缓存所需的 numpy 和 sentence-transformers"""
+        if np is None:
+            return False
+        try:
+            import sentence_transformers  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    async def embed(self, question: str):
+        """
+        在线程池中将问题向量化，不阻塞事件循环
+
+        参数:
+            question: 问题
+
+        返回:
+            归一化的问题向量
+        """
+        def encode():
+            model = _load_model(self.model_name)
+            return np.asarray(model.encode(question, normalize_embeddings=True), dtype=np.float32)
+        return await asyncio.to_thread(encode)
+
+    def lookup(self, embedding, scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        查找与问题向量最相似、未过期且scope相同的条目
+
+        参数:
+            embedding: embed返回的问题向量
+            scope: 影响回答的检索参数，只有以相同scope缓存的条目可以命中
+
+        返回:
+            命中的条目（包含question、answer、similarity），未命中时返回None
+        """
+        self._load()
+        self._expire()
+        hit = None
+        if self._entries:
+            if self._matrix is None:
+                self._matrix = np.stack([entry["embedding"] for entry in self._entries])
+            similarities = self._matrix @ embedding
+            similarities[[entry.get("scope", "") != scope for entry in self._entries]] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                entry = self._entries[best]
+                entry["last_used"] = time.time()
+                hit = {"question": entry["question"], "answer": entry["answer"], "similarity": float(similarities[best])}
+
+        self._stats["hits" if hit else "misses"] += 1
+        if hit:
+            logger.info(
+                f"Semantic cache hit (similarity={hit['similarity']:.3f}, hit ratio={self.hit_ratio():.2%}): {hit['question']}"
+            )
+        else:
+            logger.info(f"Semantic cache miss (hit ratio={self.hit_ratio():.2%})")
+        self._save()
+        return hit
+
+    def store(self, question: str, embedding, answer: str, scope: str = "") -> None:
+        """
+        缓存问题的回答，超出容量时淘汰最久未使用的条目
+
+        参数:
+            question: 问题
+            embedding: embed返回的问题向量
+            answer: 回答
+            scope: 生成回答时的检索参数，见lookup
+        """
+        self._load()
+        self._expire()
+        now = time.time()
+        self._entries.append({
+            "question": question,
+            "answer": answer,
+            "embedding": embedding,
+            "scope": scope,
+            "created": now,
+            "last_used": now
+        })
+        if len(self._entries) > self.max_size:
+            self._entries.sort(key=lambda entry: entry["last_used"], reverse=True)
+            self._stats["evicted"] += len(self._entries) - self.max_size
+            del self._entries[self.max_size:]
+        self._matrix = None
+        self._save()
+
+    def invalidate(self) -> None:
+        """知识库发生变化时清空所有条目，保留统计数据"""
+        self._load()
+        if self._entries:
+            logger.info(f"Knowledge base changed, invalidating {len(self._entries)} semantic cache entries")
+        self._entries = []
+        self._matrix = None
+        self._stats["invalidations"] += 1
+        self._save()
+
+    def hit_ratio(self) -> float:
+        """命中次数占查找次数的比例"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return self._stats["hits"] / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回缓存统计
+
+        返回:
+            包含条目数、命中、未命中、过期、淘汰、失效次数和命中率的字典
+        """
+        self._load()
+        return {"entries": len(self._entries), **self._stats, "hit_ratio": round(self.hit_ratio(), 4)}
+
+    def _expire(self) -> None:
+        """删除超过TTL的条目"""
+        if not self.ttl:
+            return
+        cutoff = time.time() - self.ttl
+        kept = [entry for entry in self._entries if entry["created"] >= cutoff]
+        if len(kept) != len(self._entries):
+            self._stats["expired"] += len(self._entries) - len(kept)
+            self._entries = kept
+            self._matrix = None
+
+    def _load(self) -> None:
+        """第一次使用时从缓存文件加载条目和统计数据"""
+        if self._entries is not None:
+            return
+        self._entries = []
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._stats.update(data.get("stats", {}))
+            if data.get("model") != self.model_name or np is None:
+                # 向量化模型变化后旧向量不可比较
+                return
+            for entry in data.get("entries", []):
+                entry["embedding"] = np.frombuffer(base64.b64decode(entry["embedding"]), dtype=np.float32)
+                self._entries.append(entry)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable semantic cache file {self.path}: {e}")
+            self._entries = []
+
+    def _save(self) -> None:
+        """将条目和统计数据写入缓存文件，先写临时文件再替换，避免留下不完整的文件"""
+        data = {
+            "model": self.model_name,
+            "stats": self._stats,
+            "entries": [
+                {**entry, "embedding": base64.b64encode(entry["embedding"].tobytes()).decode("ascii")}
+                for entry in self._entries
+            ]
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write semantic cache file {self.path}: {e}")
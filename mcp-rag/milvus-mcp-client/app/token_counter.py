@@ -0,0 +1,84 @@
+"""
+Token 计数模块
+功能：计算文本的 token 数，用于按 token 预算挑选回答生成的上下文
+作用：使用 tiktoken 的 BPE 编码（CONTEXT_TOKENIZER，默认 cl100k_base）计数；
+      未安装 tiktoken 或编码文件无法加载（如离线且没有缓存）时，按字符数估算
+"""
+import re
+import threading
+from typing import Optional
+from loguru import logger
+
+from app.config import CONTEXT_TOKENIZER
+
+try:
+    import tiktoken
+except ImportError:  # 未安装时退化为估算
+    tiktoken = None
+
+# 估算时每个汉字（及全角标点）计1个token，其余字符每4个计1个token
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+class TokenCounter:
+    """文本 token 计数器，编码在第一次使用时加载"""
+
+    def __init__(self, encoding_name: str = CONTEXT_TOKENIZER):
+        """
+        参数:
+            encoding_name: tiktoken 编码名称，如 cl100k_base、o200k_base
+        """
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def exact(self) -> bool:
+        """是否使用真实的分词器计数"""
+        self._load()
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        """
+        计算文本的 token 数
+
+        参数:
+            text: 文本
+
+        返回:
+            token 数
+        """
+        if not text:
+            return 0
+        self._load()
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        cjk = len(_CJK_PATTERN.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if tiktoken is None:
+                logger.warning("tiktoken is not installed, estimating token counts from characters")
+            else:
+                try:
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+                except Exception as e:
+                    logger.warning(f"Failed to load tokenizer {self.encoding_name}, estimating token counts: {e}")
+            self._loaded = True
+
+
+_default_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """返回进程内共享的 token 计数器"""
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = TokenCounter()
+    return _default_counter
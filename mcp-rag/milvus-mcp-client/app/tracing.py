@@ -0,0 +1,124 @@
+"""
+链路追踪模块
+功能：基于 OpenTelemetry 记录 RAG 查询各环节的 span
+作用：客户端在 MCP tools/call 请求的 _meta 中携带 W3C traceparent，
+      使服务器端的排队、向量化、Milvus 检索等 span 与客户端处于同一条链路
+配置：
+1. TRACING_EXPORTER=file：span 以 JSON Lines 格式追加到 TRACING_FILE
+2. TRACING_EXPORTER=otlp：通过 OTLP/HTTP 发送到 OTEL_EXPORTER_OTLP_ENDPOINT（默认 http://localhost:4318）
+未设置 TRACING_EXPORTER 或未安装 opentelemetry 时，本模块的函数均为空操作
+
+客户端和服务器分别部署，无法共用模块，exporter 的初始化与 milvus-mcp-server/app/utils/tracing.py 重复。
+两边的配置项和 JSON Lines 格式必须一致，两边的追踪文件才能合并查看，修改时需同时修改两个文件。
+"""
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from loguru import logger
+
+from app.config import TRACING_EXPORTER, TRACING_FILE
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+except ImportError:  # 链路追踪为可选功能
+    trace = None
+
+_tracer = None
+_propagator = TraceContextTextMapPropagator() if trace is not None else None
+
+
+class _JSONLinesSpanExporter:
+    """将结束的 span 逐行以 JSON 格式追加到文件"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> Any:
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        with self._lock:
+            for span in spans:
+                self._file.write(span.to_json(indent=None) + "\n")
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def init_tracing(service_name: str = "milvus-mcp-client") -> bool:
+    """
+    根据配置初始化 TracerProvider 和 exporter，重复调用只初始化一次
+    
+    参数:
+        service_name: span 的 service.name 资源属性
+        
+    返回:
+        是否启用了链路追踪
+    """
+    global _tracer
+    if _tracer is not None:
+        return True
+    if not TRACING_EXPORTER:
+        return False
+    if trace is None:
+        logger.warning("TRACING_EXPORTER is set but opentelemetry is not installed, tracing disabled")
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    if TRACING_EXPORTER == "file":
+        exporter = _JSONLinesSpanExporter(TRACING_FILE)
+    elif TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {TRACING_EXPORTER}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("milvus-mcp-client")
+    logger.info(f"Tracing enabled, exporting spans via {TRACING_EXPORTER}")
+    return True
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, client: bool = False) -> Iterator[Any]:
+    """
+    在一个 span 中执行代码块，span 为当前 span 的子 span
+    
+    参数:
+        name: span 名称
+        attributes: 可选的 span 属性
+        client: 是否为远程调用的客户端一侧
+        
+    返回:
+        span 对象，未启用链路追踪时为 None
+    """
+    if _tracer is None:
+        yield None
+        return
+    kind = trace.SpanKind.CLIENT if client else trace.SpanKind.INTERNAL
+    with _tracer.start_as_current_span(name, kind=kind, attributes=attributes) as span:
+        yield span
+
+
+def trace_carrier() -> Dict[str, str]:
+    """
+    导出当前 span 的 W3C 链路上下文
+    
+    返回:
+        包含 traceparent（及 tracestate）的字典，未启用链路追踪时为空字典
+    """
+    carrier: Dict[str, str] = {}
+    if _tracer is not None:
+        _propagator.inject(carrier)
+    return carrier
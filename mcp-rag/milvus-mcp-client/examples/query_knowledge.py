@@ -30,15 +30,18 @@ async def main():
     print("Please wait, processing your query...")
     
     try:
-        # Query knowledge base
-        answer = await retriever.query(question)
-        
-        # Print answer
+        # Query knowledge base and print the answer as it is generated
         print("\n" + "=" * 80)
         print("问题:", question)
         print("-" * 80)
-        print("回答:", answer)
-        print("=" * 80)
+        print("回答: ", end="", flush=True)
+        async for text in retriever.query_stream(question):
+            print(text, end="", flush=True)
+        print("\n" + "=" * 80)
+        
+        timings = retriever.last_timings
+        if "ttft" in timings:
+            print(f"Time to first token: {timings['ttft']:.3f}s, total: {timings['total']:.3f}s")
         
     except Exception as e:
         print(f"Error querying knowledge base: {e}")
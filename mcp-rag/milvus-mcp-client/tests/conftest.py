@@ -0,0 +1,91 @@
+"""
+测试的公共配置
+测试不访问MCP服务器和LLM：LLMClient只需要一个非空的API key即可初始化，
+MCP调用由各测试中的FakeMCPClient记录和应答
+"""
+import os
+import sys
+from typing import Any, Dict, List, Optional, Set
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.knowledge_builder import KnowledgeBuilder  # noqa: E402
+
+
+class FakeMCPClient:
+    """按脚本应答MCP调用的客户端，记录每次调用，并像服务器一样按ID保存已存储的内容"""
+
+    def __init__(self, tools=("storeKnowledgeBatch", "storeFAQBatch")):
+        self.tools = {name: None for name in tools}
+        self.calls: List[Any] = []
+        # 每次存储调用依次取出的错误，None表示成功
+        self.failures: List[Optional[Exception]] = []
+        # 总是存储失败的内容，包含它们的批量调用也失败
+        self.rejected: Set[str] = set()
+        self.knowledge: Dict[str, str] = {}
+        self.faqs: Dict[str, str] = {}
+        self._connected = True
+
+    def has_tool(self, name: str) -> bool:
+        return name in self.tools
+
+    def _respond(self, call: Any, contents: List[str]):
+        self.calls.append(call)
+        error = self.failures.pop(0) if self.failures else None
+        if error is not None:
+            raise error
+        if self.rejected.intersection(contents):
+            raise RuntimeError("rejected")
+
+    async def store_knowledge(self, content: str, metadata: Optional[Dict[str, Any]] = None, id: Optional[str] = None):
+        self._respond(("one", id), [content])
+        self.knowledge[id] = content
+        return {"id": id}
+
+    async def store_knowledge_batch(self, documents: List[Dict[str, Any]]):
+        self._respond(("batch", [document["id"] for document in documents]), [document["content"] for document in documents])
+        self.knowledge.update((document["id"], document["content"]) for document in documents)
+        return {"ids": [document["id"] for document in documents]}
+
+    async def store_faq(self, question: str, answer: str, metadata: Optional[Dict[str, Any]] = None, id: Optional[str] = None):
+        self._respond(("faq", id), [question])
+        self.faqs[id] = question
+        return {"id": id}
+
+    async def store_faq_batch(self, faqs: List[Dict[str, Any]]):
+        self._respond(("faq_batch", [faq["id"] for faq in faqs]), [faq["question"] for faq in faqs])
+        self.faqs.update((faq["id"], faq["question"]) for faq in faqs)
+        return {"ids": [faq["id"] for faq in faqs]}
+
+    async def delete_knowledge(self, ids: List[str]) -> int:
+        self.calls.append(("delete", list(ids)))
+        return sum(self.knowledge.pop(item_id, None) is not None for item_id in ids)
+
+    async def delete_faq(self, ids: List[str]) -> int:
+        self.calls.append(("delete_faq", list(ids)))
+        return sum(self.faqs.pop(item_id, None) is not None for item_id in ids)
+
+
+@pytest.fixture
+def fake_client() -> FakeMCPClient:
+    return FakeMCPClient()
+
+
+@pytest.fixture
+def builder(tmp_path, fake_client) -> KnowledgeBuilder:
+    """小块、快速重试的增量构建器，索引写入临时目录"""
+    builder = KnowledgeBuilder(
+        chunk_size=200,
+        chunk_overlap=40,
+        concurrency=2,
+        batch_size=4,
+        max_retries=3,
+        incremental=True,
+        index_path=str(tmp_path / "chunk_index.jsonl")
+    )
+    builder.mcp_client = fake_client
+    return builder
+
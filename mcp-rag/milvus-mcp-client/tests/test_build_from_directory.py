@@ -0,0 +1,136 @@
+"""KnowledgeBuilder.build_from_directory 的并发FAQ提取、清单和中断后继续"""
+import asyncio
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """5个各有数个文本块的Markdown文件，以及一个被排除的隐藏文件"""
+    directory = tmp_path / "docs"
+    (directory / "sub").mkdir(parents=True)
+    for i in range(5):
+        sentences = " ".join(f"File {i} sentence {j} explains topic {i * j}." for j in range(20))
+        (directory / ("sub" if i % 2 else "") / f"f{i}.md").write_text(sentences, encoding="utf-8")
+    (directory / ".hidden.md").write_text("skipped", encoding="utf-8")
+    return str(directory)
+
+
+def faq_answers(builder, gate=None):
+    """替换LLM调用：每次返回一条FAQ，给定gate时等到gate返回True"""
+    calls = []
+
+    async def generate(prompt, system_prompt=None, temperature=0.7, max_tokens=None):
+        calls.append(prompt)
+        while gate is not None and not gate():
+            await asyncio.sleep(0.01)
+        return json.dumps([{"question": f"question {len(calls)}?", "answer": "answer"}])
+
+    builder.llm_client.async_generate = generate
+    return calls
+
+
+def test_slow_faq_extraction_does_not_hold_back_chunk_stores(builder, fake_client, tree):
+    builder.llm_concurrency = 1
+    expected = sum(
+        len(builder._chunk_text(open(os.path.join(root, name), encoding="utf-8").read(), True))
+        for root, _, names in os.walk(tree) for name in names if not name.startswith(".")
+    )
+    # 所有文本块写入之前LLM不返回，读取和写入若等待FAQ名额就会卡住
+    faq_answers(builder, gate=lambda: len(fake_client.knowledge) == expected)
+
+    report = asyncio.run(asyncio.wait_for(builder.build_from_directory(tree), timeout=10))
+
+    assert report["processed_files"] == 5
+    assert report["stored_chunks"] == report["total_chunks"] == expected
+    assert report["stored_faqs"] == 5
+    assert report["failed_files"] == []
+
+
+def test_completed_files_are_skipped_and_failed_files_retried(builder, fake_client, tree):
+    faq_answers(builder)
+    fake_client.rejected = {"question 1?"}
+    builder.max_retries = 1
+
+    first = asyncio.run(builder.build_from_directory(tree))
+
+    assert first["processed_files"] == 5
+    assert len(first["failed_files"]) == 1
+
+    fake_client.rejected = set()
+    second = asyncio.run(builder.build_from_directory(tree))
+
+    assert second["skipped_files"] == 4
+    assert second["processed_files"] == 1
+    assert second["failed_files"] == []
+    # 增量导入时失败文件已写入的文本块不再写入
+    assert second["reused_chunks"] == second["total_chunks"]
+    assert len(fake_client.faqs) == 5
+
+
+def test_removed_files_are_deleted_from_the_knowledge_base(builder, fake_client, tree):
+    faq_answers(builder)
+    asyncio.run(builder.build_from_directory(tree))
+    stored = len(fake_client.knowledge)
+    os.remove(os.path.join(tree, "f0.md"))
+
+    report = asyncio.run(builder.build_from_directory(tree))
+
+    assert report["removed_files"] == 1
+    assert report["deleted_chunks"] > 0
+    assert len(fake_client.knowledge) == stored - report["deleted_chunks"]
+    assert len(fake_client.faqs) == 4
+
+
+def test_files_waiting_for_faqs_are_bounded(builder, fake_client, tmp_path):
+    directory = tmp_path / "many"
+    directory.mkdir()
+    for i in range(20):
+        (directory / f"f{i:02}.md").write_text(f"File {i} has a single short chunk.", encoding="utf-8")
+    builder.llm_concurrency = 1
+    builder.read_workers = 1
+    opened = []
+    faq_answers(builder, gate=lambda: bool(opened))
+
+    async def main():
+        build = asyncio.ensure_future(builder.build_from_directory(str(directory)))
+        await asyncio.sleep(0.3)
+        opened.append(len(fake_client.knowledge))
+        return await asyncio.wait_for(build, timeout=10)
+
+    report = asyncio.run(main())
+
+    # 一个文件在提取FAQ，队列中read_workers * 2个，写入方手中一个，其余文件等待读取
+    assert opened[0] <= 1 + 2 + 1
+    assert report["processed_files"] == 20
+    assert report["stored_chunks"] == report["total_chunks"] == 20
+
+
+def test_chunks_stored_before_an_interruption_are_reused(builder, fake_client, tree):
+    total = sum(
+        len(builder._chunk_text(open(os.path.join(root, name), encoding="utf-8").read(), True))
+        for root, _, names in os.walk(tree) for name in names if not name.startswith(".")
+    )
+    # LLM一直不返回，所有文本块写入后中断导入
+    faq_answers(builder, gate=lambda: False)
+
+    async def interrupted():
+        build = asyncio.ensure_future(builder.build_from_directory(tree))
+        while len(fake_client.knowledge) < total:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        build.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await build
+
+    asyncio.run(interrupted())
+    faq_answers(builder)
+    report = asyncio.run(builder.build_from_directory(tree))
+
+    assert report["processed_files"] == 5
+    assert report["stored_chunks"] == 0
+    assert report["reused_chunks"] == total
+    assert len(fake_client.knowledge) == total
+    assert report["stored_faqs"] == 5
@@ -0,0 +1,129 @@
+"""KnowledgeRetriever._filter_context 的去重、排序（包括MMR）和按token预算装入上下文"""
+import asyncio
+
+import pytest
+
+from app.knowledge_retriever import KnowledgeRetriever
+
+
+class WordCounter:
+    """按空白分词计数，使预算的计算与是否安装tiktoken无关"""
+
+    def count(self, text):
+        return len(text.split())
+
+
+def knowledge(text, score=None, search=0, vector=None):
+    return {"type": "knowledge", "content": {"content": text, "metadata": {}, "score": score, "vector": vector}, "search": search}
+
+
+def faq(question, answer, vector=None):
+    return {"type": "faq", "content": {"question": question, "answer": answer, "vector": vector}, "search": 1}
+
+
+@pytest.fixture
+def retriever():
+    retriever = KnowledgeRetriever(rerank=False, semantic_cache=False, mmr=False)
+    retriever.token_counter = WordCounter()
+    retriever.context_token_budget = 100
+    retriever.context_max_item_tokens = 40
+    return retriever
+
+
+def texts(items):
+    return [item["content"].get("content") or item["content"]["question"] for item in items]
+
+
+def test_items_are_packed_by_relevance_until_the_budget_is_used(retriever):
+    retriever.context_token_budget = 20
+    items = [
+        knowledge("Unrelated text about cooking pasta."),
+        faq("What index types exist", "HNSW and IVF"),
+        knowledge("Milvus supports many index types."),
+    ]
+
+    packed = asyncio.run(retriever._filter_context("milvus index types", items))
+
+    # 最相关的文本块占用9个token后FAQ（13个token）放不下被跳过，较短的文本块仍可放入
+    assert texts(packed) == ["Milvus supports many index types.", "Unrelated text about cooking pasta."]
+
+
+def test_duplicates_are_removed(retriever):
+    items = [
+        faq("What is Milvus", "A vector database"),
+        knowledge("Milvus is a vector database."),
+        faq("What is Milvus", "A vector database."),
+        knowledge("Milvus is a vector database."),
+    ]
+
+    packed = asyncio.run(retriever._filter_context("what is milvus", items))
+
+    assert texts(packed) == ["What is Milvus", "Milvus is a vector database."]
+
+
+def test_long_chunks_keep_the_relevant_sentences_in_order(retriever):
+    filler = " ".join(f"Cooking pasta takes step {i}." for i in range(10))
+    text = f"Milvus stores vectors. {filler} Milvus builds an index."
+
+    packed = asyncio.run(retriever._filter_context("milvus", [knowledge(text)]))
+
+    assert texts(packed) == ["Milvus stores vectors. Milvus builds an index."]
+
+
+def test_faqs_that_do_not_fit_are_skipped(retriever):
+    retriever.context_max_item_tokens = 8
+
+    packed = asyncio.run(retriever._filter_context("milvus", [faq("What is Milvus", "A database for vectors")]))
+
+    assert packed == []
+
+
+def test_rerank_scores_are_compared_within_each_search(retriever):
+    retriever.rerank = True
+    items = [
+        knowledge("a1", 9.0, search=0), knowledge("a2", 8.5, search=0), knowledge("a3", 8.0, search=0),
+        knowledge("b1", -2.0, search=2), knowledge("b2", -6.0, search=2),
+    ]
+
+    packed = asyncio.run(retriever._filter_context("q", items))
+
+    # 每次检索的最佳结果排在其他检索的次优结果之前
+    assert texts(packed)[:2] == ["a1", "b1"]
+    assert texts(packed)[-1] in ("a3", "b2")
+
+
+def test_mmr_prefers_diverse_items_and_drops_near_duplicates(retriever):
+    retriever.mmr_lambda = 0.5
+    retriever.mmr_duplicate_threshold = 0.95
+    items = [
+        knowledge("a", vector=[1.0, 0.0, 0.0]),
+        knowledge("a'", vector=[0.9, 0.1, 0.0]),
+        knowledge("near a", vector=[0.8, 0.6, 0.0]),
+        knowledge("other", vector=[0.0, 1.0, 0.0]),
+    ]
+
+    ordered = retriever._mmr_order(items, [1.0, 0.95, 0.9, 0.8])
+
+    # a'与a的余弦相似度约0.99被丢弃；near a相关性更高，但与a相似，排在other之后
+    assert texts(ordered) == ["a", "other", "near a"]
+
+
+def test_mmr_ignores_vector_scale(retriever):
+    items = [knowledge("a", vector=[10.0, 0.0]), knowledge("b", vector=[0.1, 0.0])]
+
+    assert texts(retriever._mmr_order(items, [1.0, 0.5])) == ["a"]
+
+
+def test_mmr_needs_vectors_on_every_item(retriever):
+    items = [knowledge("a", vector=[1.0, 0.0]), knowledge("b")]
+
+    assert retriever._mmr_order(items, [1.0, 0.5]) is None
+
+
+def test_filter_context_falls_back_to_relevance_without_vectors(retriever):
+    retriever.mmr = True
+    items = [knowledge("Cooking pasta.", vector=[1.0, 0.0]), knowledge("Milvus index.")]
+
+    packed = asyncio.run(retriever._filter_context("milvus", items))
+
+    assert texts(packed) == ["Milvus index.", "Cooking pasta."]
@@ -0,0 +1,166 @@
+"""内容定义的切分、文本块的键和增量导入"""
+import asyncio
+import json
+import os
+
+import pytest
+
+
+def paragraphs(count, prefix="Paragraph"):
+    return [
+        " ".join(f"{prefix} {p} sentence {j} describes topic {p * j}." for j in range(6))
+        for p in range(count)
+    ]
+
+
+def documents(*contents, **metadata):
+    return [{"content": content, "metadata": {**metadata, "chunk_index": i}} for i, content in enumerate(contents)]
+
+
+def test_content_defined_chunks_respect_the_size_limit(builder):
+    text = "\n".join(paragraphs(20))
+
+    chunks = builder._chunk_text_content_defined(text)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= builder.chunk_size for chunk in chunks)
+    assert chunks[0].startswith("Paragraph 0") and text.endswith(chunks[-1])
+    assert builder._chunk_text_content_defined("short text") == ["short text"]
+
+
+def test_content_defined_chunks_without_overlap_reassemble_the_text(builder):
+    builder.chunk_overlap = 0
+    text = "\n".join(paragraphs(20)) + " " + "x" * 500
+
+    chunks = builder._chunk_text_content_defined(text)
+
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= builder.chunk_size for chunk in chunks)
+
+
+def test_an_insertion_only_changes_nearby_chunks(builder):
+    builder.chunk_size, builder.chunk_overlap = 600, 100
+    original = "\n".join(paragraphs(30))
+    edited = "A new opening sentence. " + original
+
+    before = builder._chunk_text_content_defined(original)
+    after = builder._chunk_text_content_defined(edited)
+    fixed_before = builder._chunk_text_fixed(original)
+    fixed_after = builder._chunk_text_fixed(edited)
+
+    # 固定长度切分时插入点之后的块全部移位，内容定义的边界不受影响
+    assert len(set(after) - set(before)) <= 2
+    assert len(set(fixed_after) - set(fixed_before)) == len(fixed_after)
+
+
+def test_content_defined_chunking_only_applies_to_indexed_ingest(builder):
+    text = "\n".join(paragraphs(20))
+
+    assert builder._chunk_text(text) == builder._chunk_text_fixed(text)
+    assert builder._chunk_text(text, indexed=True) == builder._chunk_text_content_defined(text)
+    builder.content_defined_chunking = False
+    assert builder._chunk_text(text, indexed=True) == builder._chunk_text_fixed(text)
+
+
+def test_chunk_keys_ignore_volatile_metadata(builder):
+    first = {"content": "same", "metadata": {"file_name": "a.md", "chunk_index": 0, "total_chunks": 3, "file_size": 10}}
+    moved = {"content": "same", "metadata": {"file_name": "a.md", "chunk_index": 2, "total_chunks": 5, "file_size": 99}}
+    renamed = {"content": "same", "metadata": {"file_name": "b.md", "chunk_index": 0}}
+
+    assert builder._chunk_key(first) == builder._chunk_key(moved)
+    assert builder._chunk_key(first) != builder._chunk_key(renamed)
+
+
+def test_repeated_chunks_get_one_key_per_occurrence(builder):
+    keys, to_store, chunk_ids, stale = builder._diff_chunks(documents("a", "b", "a", "a"), None)
+
+    assert len(set(keys)) == 4
+    assert keys[2] == f"{keys[0]}#1" and keys[3] == f"{keys[0]}#2"
+    assert to_store == [0, 1, 2, 3]
+    assert chunk_ids == {} and stale == []
+
+
+def test_diff_reuses_known_chunks_and_deletes_vanished_ones(builder):
+    keys, _, _, _ = builder._diff_chunks(documents("a", "b", "a"), None)
+    previous = {
+        "chunk_ids": {keys[0]: "id-a", keys[1]: "id-b", keys[2]: "id-a2", "gone": "id-gone", "untracked": None},
+        "stale_ids": {"knowledge": ["id-retry"]}
+    }
+
+    keys, to_store, chunk_ids, stale = builder._diff_chunks(documents("a", "c", "a"), previous)
+
+    assert to_store == [1]
+    assert chunk_ids == {keys[0]: "id-a", keys[2]: "id-a2"}
+    assert sorted(stale) == ["id-b", "id-gone", "id-retry"]
+
+
+@pytest.fixture
+def document(tmp_path, builder):
+    builder.llm_client.async_generate = None
+    path = tmp_path / "doc.md"
+    path.write_text("\n".join(paragraphs(12)), encoding="utf-8")
+    return path
+
+
+def build(builder, path):
+    return asyncio.run(builder.build_from_file(str(path), extract_faq=False))
+
+
+def test_reimporting_stores_only_changed_chunks(builder, fake_client, document):
+    first = build(builder, document)
+    assert first["stored_chunks"] == first["total_chunks"] == len(fake_client.knowledge)
+
+    unchanged = build(builder, document)
+    assert unchanged["stored_chunks"] == 0
+    assert unchanged["reused_chunks"] == first["total_chunks"]
+
+    text = document.read_text(encoding="utf-8").replace("Paragraph 6 sentence 2", "Paragraph six, second sentence")
+    document.write_text(text, encoding="utf-8")
+    edited = build(builder, document)
+
+    assert 0 < edited["stored_chunks"] <= 3
+    assert edited["deleted_chunks"] > 0
+    assert sorted(fake_client.knowledge.values()) == sorted(builder._chunk_text(text, indexed=True))
+
+
+def test_duplicate_chunks_are_stored_and_tracked_separately(builder, fake_client, tmp_path):
+    block = "The same notice repeats here. " * 6
+    path = tmp_path / "dup.md"
+    path.write_text("\n".join([block, "Unique middle part. " * 8, block, "Another unique part. " * 8, block]), encoding="utf-8")
+    chunks = builder._chunk_text(path.read_text(encoding="utf-8"), indexed=True)
+    assert len(chunks) > len(set(chunks))
+
+    first = build(builder, path)
+    second = build(builder, path)
+
+    assert first["stored_chunks"] == len(chunks) == len(fake_client.knowledge)
+    assert second["stored_chunks"] == 0 and second["reused_chunks"] == len(chunks)
+
+
+def test_items_stored_without_an_id_are_not_indexed(builder, fake_client, document):
+    async def store_without_ids(documents):
+        return {"ids": [None] * len(documents)}
+
+    fake_client.store_knowledge_batch = store_without_ids
+
+    build(builder, document)
+
+    with open(builder.index_path, encoding="utf-8") as f:
+        entry = json.loads(f.readline())
+    assert entry["chunk_ids"] == {}
+
+
+def test_incremental_ingest_is_opt_in_and_indexed_next_to_the_client(tmp_path, fake_client, document, monkeypatch):
+    from app.knowledge_builder import KnowledgeBuilder
+
+    monkeypatch.chdir(tmp_path)
+    builder = KnowledgeBuilder(chunk_size=200, chunk_overlap=40)
+    builder.mcp_client = fake_client
+
+    build(builder, document)
+
+    # 默认按固定长度切分，不写索引
+    assert not builder.incremental
+    assert os.path.isabs(builder.index_path)
+    assert sorted(fake_client.knowledge.values()) == sorted(builder._chunk_text_fixed(document.read_text(encoding="utf-8")))
+    assert list(tmp_path.glob("*.jsonl")) == []
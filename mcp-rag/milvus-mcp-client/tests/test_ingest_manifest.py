@@ -0,0 +1,79 @@
+"""IngestManifest 的记录、删除、中断后的读取和压缩"""
+import json
+
+import pytest
+
+from app import ingest_manifest
+from app.ingest_manifest import IngestManifest
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / ".ingest_manifest.jsonl")
+
+
+def lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_recorded_files_are_complete_until_they_change(path):
+    manifest = IngestManifest(path)
+    manifest.record("a.md", 10, 1.5, chunks=3)
+    manifest.record("b.md", 20, 2.5, complete=False)
+
+    reloaded = IngestManifest(path)
+
+    assert reloaded.is_complete("a.md", 10, 1.5)
+    assert not reloaded.is_complete("a.md", 11, 1.5)
+    assert not reloaded.is_complete("a.md", 10, 2.0)
+    assert not reloaded.is_complete("b.md", 20, 2.5)
+    assert reloaded.get("a.md")["chunks"] == 3
+    assert sorted(reloaded.paths()) == ["a.md", "b.md"]
+
+
+def test_the_last_line_of_a_path_wins(path):
+    manifest = IngestManifest(path)
+    manifest.record("a.md", 10, 1.0)
+    manifest.record("a.md", 12, 2.0)
+
+    assert IngestManifest(path).get("a.md")["size"] == 12
+    assert len(lines(path)) == 2
+
+
+def test_removed_files_stay_removed(path):
+    manifest = IngestManifest(path)
+    manifest.record("a.md", 10, 1.0)
+    manifest.remove("a.md")
+    manifest.remove("missing.md")
+
+    assert IngestManifest(path).get("a.md") is None
+    assert lines(path)[-1] == {"path": "a.md", "removed": True}
+    assert len(lines(path)) == 2
+
+
+def test_a_line_cut_off_by_an_interruption_is_skipped(path):
+    IngestManifest(path).record("a.md", 10, 1.0)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"path": "b.md", "si')
+
+    manifest = IngestManifest(path)
+    assert len(manifest) == 1
+    manifest.record("c.md", 30, 3.0)
+
+    assert sorted(IngestManifest(path).paths()) == ["a.md", "c.md"]
+
+
+def test_stale_lines_are_compacted_on_load(path, monkeypatch):
+    monkeypatch.setattr(ingest_manifest, "COMPACT_MIN_LINES", 5)
+    manifest = IngestManifest(path)
+    for i in range(10):
+        manifest.record("a.md", i, float(i))
+    manifest.record("b.md", 1, 1.0)
+    manifest.remove("b.md")
+
+    reloaded = IngestManifest(path)
+
+    assert len(reloaded) == 1
+    assert [entry["path"] for entry in lines(path)] == ["a.md"]
+    assert reloaded.get("a.md")["size"] == 9
@@ -0,0 +1,66 @@
+"""MCPClient的检索方法对服务器错误的处理，以及检索失败时KnowledgeRetriever按部分结果继续"""
+import asyncio
+import json
+
+import pytest
+from mcp import types
+
+from app.knowledge_retriever import KnowledgeRetriever
+from app.mcp_client import MCPClient, MCPToolError
+
+
+def response(data, is_error=False):
+    text = data if isinstance(data, str) else json.dumps(data)
+    return types.CallToolResult(content=[types.TextContent(type="text", text=text)], isError=is_error)
+
+
+def client(**responses):
+    """按工具名返回固定响应的MCPClient"""
+    mcp_client = MCPClient()
+    mcp_client._connected = True
+    for name, result in responses.items():
+        async def tool(result=result, **kwargs):
+            return result
+        mcp_client.tools[name] = tool
+    return mcp_client
+
+
+OVERLOADED = {"status": "error", "error": "overloaded", "message": "searchKnowledge is overloaded", "retry_after": 3}
+
+
+@pytest.mark.parametrize("method, tool", [("search_knowledge", "searchKnowledge"), ("search_faq", "searchFAQ")])
+def test_results_are_returned(method, tool):
+    mcp_client = client(**{tool: response({"results": [{"content": "a"}]})})
+
+    assert asyncio.run(getattr(mcp_client, method)("q")) == [{"content": "a"}]
+
+
+@pytest.mark.parametrize("method, tool", [("search_knowledge", "searchKnowledge"), ("search_faq", "searchFAQ")])
+def test_overload_raises_with_retry_after(method, tool):
+    mcp_client = client(**{tool: response(OVERLOADED)})
+
+    with pytest.raises(MCPToolError) as error:
+        asyncio.run(getattr(mcp_client, method)("q"))
+
+    assert error.value.retry_after == 3
+
+
+def test_tool_errors_raise():
+    mcp_client = client(searchFAQ=response("Milvus is unavailable", is_error=True))
+
+    with pytest.raises(MCPToolError, match="Milvus is unavailable"):
+        asyncio.run(mcp_client.search_faq("q"))
+
+
+def test_overloaded_searches_count_as_failed():
+    retriever = KnowledgeRetriever(rerank=False, semantic_cache=False, mmr=False)
+    retriever.mcp_client = client(
+        searchKnowledge=response({"results": [{"content": "a"}]}),
+        searchFAQ=response(OVERLOADED)
+    )
+
+    # 失败的检索返回None（计入部分失败的日志），而不是没有结果的[]
+    assert asyncio.run(retriever._search("faq", retriever.mcp_client.search_faq, "q")) is None
+    context = asyncio.run(retriever._retrieve(["q"]))
+
+    assert context == [{"type": "knowledge", "content": {"content": "a"}, "search": 0}]
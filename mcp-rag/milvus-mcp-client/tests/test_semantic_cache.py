@@ -0,0 +1,92 @@
+"""SemanticCache 的命中、未命中、作用域和统计数据的持久化"""
+import json
+
+import numpy as np
+import pytest
+
+from app.semantic_cache import SemanticCache
+
+
+def vector(*values):
+    embedding = np.asarray(values, dtype=np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "semantic_cache.json")
+
+
+def cache(path, **kwargs):
+    return SemanticCache(path=path, model_name="test-model", threshold=0.9, ttl=0, **kwargs)
+
+
+def test_similar_question_hits_and_dissimilar_misses(path):
+    semantic_cache = cache(path)
+    semantic_cache.store("what is milvus", vector(1, 0, 0), "a vector database")
+
+    hit = semantic_cache.lookup(vector(1, 0.1, 0))
+
+    assert hit["answer"] == "a vector database"
+    assert hit["similarity"] > 0.9
+    assert semantic_cache.lookup(vector(0, 1, 0)) is None
+    assert semantic_cache.stats()["hits"] == 1
+    assert semantic_cache.stats()["misses"] == 1
+
+
+def test_entries_only_match_their_scope(path):
+    semantic_cache = cache(path)
+    semantic_cache.store("q", vector(1, 0), "top 5", scope="max_results=5")
+
+    assert semantic_cache.lookup(vector(1, 0), scope="max_results=10") is None
+    assert semantic_cache.lookup(vector(1, 0), scope="max_results=5")["answer"] == "top 5"
+
+
+def test_misses_and_hits_are_persisted(path):
+    semantic_cache = cache(path)
+    semantic_cache.lookup(vector(1, 0))
+    semantic_cache.store("q", vector(1, 0), "answer")
+    semantic_cache.lookup(vector(1, 0))
+
+    reloaded = cache(path)
+    stats = reloaded.stats()
+
+    assert stats["entries"] == 1
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_ratio"] == 0.5
+    assert reloaded.lookup(vector(1, 0))["answer"] == "answer"
+
+
+def test_entries_of_another_model_are_dropped_but_stats_kept(path):
+    semantic_cache = cache(path)
+    semantic_cache.store("q", vector(1, 0), "answer")
+    semantic_cache.lookup(vector(1, 0))
+
+    other = SemanticCache(path=path, model_name="other-model", threshold=0.9, ttl=0)
+
+    assert other.stats()["entries"] == 0
+    assert other.stats()["hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(path):
+    semantic_cache = cache(path, max_size=2)
+    semantic_cache.store("a", vector(1, 0, 0), "A")
+    semantic_cache.store("b", vector(0, 1, 0), "B")
+    semantic_cache.lookup(vector(1, 0, 0))
+    semantic_cache.store("c", vector(0, 0, 1), "C")
+
+    assert semantic_cache.lookup(vector(0, 1, 0)) is None
+    assert semantic_cache.lookup(vector(1, 0, 0))["answer"] == "A"
+    assert semantic_cache.stats()["evicted"] == 1
+
+
+def test_invalidate_clears_entries(path):
+    semantic_cache = cache(path)
+    semantic_cache.store("q", vector(1, 0), "answer")
+
+    semantic_cache.invalidate()
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["entries"] == []
+    assert data["stats"]["invalidations"] == 1
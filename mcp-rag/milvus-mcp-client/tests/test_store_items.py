@@ -0,0 +1,102 @@
+"""KnowledgeBuilder._store_items 的批量存储、重试和逐条存储回退"""
+import asyncio
+
+import pytest
+
+from app import knowledge_builder
+from app.mcp_client import MCPToolError
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录重试前的等待秒数，不真正等待"""
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    return delays
+
+
+def documents(count):
+    return [{"content": f"chunk {i}", "metadata": {"chunk_index": i}} for i in range(count)]
+
+
+def store(builder, items):
+    client = builder.mcp_client
+    return asyncio.run(builder._store_items(
+        "chunks",
+        items,
+        lambda document: client.store_knowledge(**document),
+        "storeKnowledgeBatch",
+        client.store_knowledge_batch
+    ))
+
+
+def test_batches_assign_ids_before_the_first_attempt(builder, fake_client):
+    results = store(builder, documents(6))
+
+    assert [call[0] for call in fake_client.calls] == ["batch", "batch"]
+    assert [result["status"] for result in results] == ["stored"] * 6
+    sent = [item_id for _, ids in fake_client.calls for item_id in ids]
+    assert [result["id"] for result in results] == sent
+    assert len(set(sent)) == 6
+
+
+def test_existing_ids_are_kept(builder, fake_client):
+    items = documents(2)
+    items[0]["id"] = "kept"
+
+    results = store(builder, items)
+
+    assert results[0]["id"] == "kept"
+    assert results[1]["id"] not in (None, "kept")
+
+
+def test_failed_batch_is_retried_with_the_same_ids(builder, fake_client, sleeps):
+    fake_client.failures = [RuntimeError("timeout")]
+
+    results = store(builder, documents(4))
+
+    assert len(fake_client.calls) == 2
+    assert fake_client.calls[0] == fake_client.calls[1]
+    assert sleeps == [knowledge_builder.RETRY_BACKOFF]
+    assert all(result["status"] == "stored" and result["attempts"] == 2 for result in results)
+
+
+def test_backoff_doubles_and_honours_retry_after(builder, fake_client, sleeps):
+    fake_client.failures = [MCPToolError("overloaded", retry_after=3), RuntimeError("timeout")]
+
+    results = store(builder, documents(4))
+
+    assert sleeps == [3, knowledge_builder.RETRY_BACKOFF * 2]
+    assert all(result["status"] == "stored" for result in results)
+
+
+def test_exhausted_batch_falls_back_to_single_stores(builder, fake_client, sleeps):
+    fake_client.rejected = {"chunk 1"}
+
+    results = store(builder, documents(3))
+
+    batch_ids = fake_client.calls[0][1]
+    singles = [item_id for kind, item_id in fake_client.calls if kind == "one"]
+    assert [kind for kind, _ in fake_client.calls[:3]] == ["batch"] * 3
+    assert sorted(singles) == sorted(batch_ids + [batch_ids[1]] * 2)
+    assert [result["status"] for result in results] == ["stored", "failed", "stored"]
+    assert [result["id"] for result in results] == [batch_ids[0], None, batch_ids[2]]
+    assert results[1]["attempts"] == 3 + 3
+    assert results[1]["error"] == "rejected"
+
+
+def test_missing_batch_tool_stores_one_by_one_without_retrying(builder, fake_client, sleeps):
+    fake_client.failures = [MCPToolError("Unknown tool: storeKnowledgeBatch", unavailable=True)]
+
+    results = store(builder, documents(3))
+
+    assert not fake_client.has_tool("storeKnowledgeBatch")
+    assert [kind for kind, _ in fake_client.calls] == ["batch", "one", "one", "one"]
+    assert sleeps == []
+    assert all(result["status"] == "stored" for result in results)
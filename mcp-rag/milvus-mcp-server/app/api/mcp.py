@@ -1,17 +1,21 @@
 from fastapi import APIRouter, Depends
-from typing import List
+from typing import Any, Dict, List
 from pydantic import json_schema
 
 from app.models.models import (
     KnowledgeContent, 
+    KnowledgeBatch,
     SearchKnowledgeQuery, 
     FAQContent, 
+    FAQBatch,
     SearchFAQQuery,
+    DeleteRequest,
     MCPTools,
     MCPTool
 )
 from app.services.milvus_service import MilvusService
-from app.dependencies import get_milvus_service_dependency
+from app.services.tool_executor import ToolExecutor
+from app.dependencies import get_milvus_service_dependency, get_tool_executor
 
 # 创建API路由，前缀为"/api/v1"
 router = APIRouter(prefix="/api/v1")
@@ -48,6 +52,26 @@ def get_tools() -> MCPTools:
             name="searchFAQ",
             description="Search for similar documents on natural language descriptions from FAQ store.",
             input_schema=json_schema.model_json_schema(SearchFAQQuery)
+        ),
+        MCPTool(
+            name="storeKnowledgeBatch",
+            description="Store several documents into knowledge store with one embedding batch and one insert.",
+            input_schema=json_schema.model_json_schema(KnowledgeBatch)
+        ),
+        MCPTool(
+            name="storeFAQBatch",
+            description="Store several FAQs into FAQ store with one embedding batch and one insert.",
+            input_schema=json_schema.model_json_schema(FAQBatch)
+        ),
+        MCPTool(
+            name="deleteKnowledge",
+            description="Delete documents from knowledge store by the IDs returned when they were stored.",
+            input_schema=json_schema.model_json_schema(DeleteRequest)
+        ),
+        MCPTool(
+            name="deleteFAQ",
+            description="Delete FAQs from FAQ store by the IDs returned when they were stored.",
+            input_schema=json_schema.model_json_schema(DeleteRequest)
         )
     ]
     return MCPTools(tools=tools)
@@ -68,36 +92,116 @@ async def tools() -> MCPTools:
     return get_tools()
 
 
+@router.get("/stats")
+async def stats(executor: ToolExecutor = Depends(get_tool_executor)) -> Dict[str, Any]:
+    """Get the running and queued call counts per tool.
+    
+    Returns:
+        The tool executor statistics
+        
+    获取每个工具正在执行和排队中的调用数量。
+    
+    返回:
+        工具执行器统计信息
+    """
+    return executor.stats()
+
+
 @router.post("/storeKnowledge", status_code=201)
 async def store_knowledge(
     content: KnowledgeContent,
-    milvus_service: MilvusService = Depends(get_milvus_service_dependency)
+    milvus_service: MilvusService = Depends(get_milvus_service_dependency),
+    executor: ToolExecutor = Depends(get_tool_executor)
 ) -> None:
     """Store a document in the knowledge store.
     
     Args:
         content: The knowledge content to store
         milvus_service: The Milvus service
+        executor: The tool executor running the blocking work
         
     在知识库中存储文档。
     
     参数:
         content: 要存储的知识内容
         milvus_service: Milvus服务对象
+        executor: 执行阻塞操作的工具执行器
+    """
+    await executor.run("storeKnowledge", milvus_service.store_knowledge, content)
+
+
+@router.post("/storeKnowledgeBatch", status_code=201)
+async def store_knowledge_batch(
+    batch: KnowledgeBatch,
+    milvus_service: MilvusService = Depends(get_milvus_service_dependency),
+    executor: ToolExecutor = Depends(get_tool_executor)
+) -> Dict[str, Any]:
+    """Store several documents in the knowledge store with one insert.
+    
+    Args:
+        batch: The documents to store
+        milvus_service: The Milvus service
+        executor: The tool executor running the blocking work
+        
+    Returns:
+        The number and IDs of the stored documents
+        
+    批量存储文档到知识库，只进行一次批量向量化和一次插入。
+    
+    参数:
+        batch: 要存储的文档
+        milvus_service: Milvus服务对象
+        executor: 执行阻塞操作的工具执行器
+        
+    返回:
+        存储的文档数量和ID
+    """
+    ids = await executor.run("storeKnowledgeBatch", milvus_service.store_knowledge_batch, batch.documents)
+    return {"stored": len(ids), "ids": ids}
+
+
+@router.post("/deleteKnowledge")
+async def delete_knowledge(
+    request: DeleteRequest,
+    milvus_service: MilvusService = Depends(get_milvus_service_dependency),
+    executor: ToolExecutor = Depends(get_tool_executor)
+) -> Dict[str, Any]:
+    """Delete documents from the knowledge store by ID.
+    
+    Args:
+        request: The IDs of the documents to delete
+        milvus_service: The Milvus service
+        executor: The tool executor running the blocking work
+        
+    Returns:
+        The number of deleted documents
+        
+    按ID删除知识库中的文档。
+    
+    参数:
+        request: 要删除的文档ID
+        milvus_service: Milvus服务对象
+        executor: 执行阻塞操作的工具执行器
+        
+    返回:
+        删除的文档数量
     """
-    milvus_service.store_knowledge(content)
+    deleted = await executor.run("deleteKnowledge", milvus_service.delete_knowledge, request.ids)
+    return {"deleted": deleted}
 
 
 @router.post("/searchKnowledge")
 async def search_knowledge(
     query: SearchKnowledgeQuery,
-    milvus_service: MilvusService = Depends(get_milvus_service_dependency)
+    milvus_service: MilvusService = Depends(get_milvus_service_dependency),
+    executor: ToolExecutor = Depends(get_tool_executor)
 ) -> List[KnowledgeContent]:
     """Search for documents in the knowledge store.
     
     Args:
         query: The search query
         milvus_service: The Milvus service
+        executor: The tool executor running the blocking work
         
     Returns:
         List of matching documents
@@ -107,43 +211,119 @@ async def search_knowledge(
     参数:
         query: 搜索查询
         milvus_service: Milvus服务对象
+        executor: 执行阻塞操作的工具执行器
         
     返回:
         匹配文档的列表
     """
-    return milvus_service.search_knowledge(query.query, query.size)
+    return await executor.run(
+        "searchKnowledge",
+        milvus_service.search_knowledge,
+        query.query,
+        query.size,
+        hybrid=query.hybrid,
+        sparse_weight=query.sparse_weight,
+        rrf_k=query.rrf_k,
+        rerank=query.rerank,
+        include_vectors=query.include_vectors
+    )
 
 
 @router.post("/storeFAQ", status_code=201)
 async def store_faq(
     content: FAQContent,
-    milvus_service: MilvusService = Depends(get_milvus_service_dependency)
+    milvus_service: MilvusService = Depends(get_milvus_service_dependency),
+    executor: ToolExecutor = Depends(get_tool_executor)
 ) -> None:
     """Store an FAQ in the FAQ store.
     
     Args:
         content: The FAQ content to store
         milvus_service: The Milvus service
+        executor: The tool executor running the blocking work
         
     在FAQ库中存储常见问题。
     
     参数:
         content: 要存储的FAQ内容
         milvus_service: Milvus服务对象
+        executor: 执行阻塞操作的工具执行器
+    """
+    await executor.run("storeFAQ", milvus_service.store_faq, content)
+
+
+@router.post("/storeFAQBatch", status_code=201)
+async def store_faq_batch(
+    batch: FAQBatch,
+    milvus_service: MilvusService = Depends(get_milvus_service_dependency),
+    executor: ToolExecutor = Depends(get_tool_executor)
+) -> Dict[str, Any]:
+    """Store several FAQs in the FAQ store with one insert.
+    
+    Args:
+        batch: The FAQs to store
+        milvus_service: The Milvus service
+        executor: The tool executor running the blocking work
+        
+    Returns:
+        The number and IDs of the stored FAQs
+        
+    批量存储常见问题到FAQ库，只进行一次批量向量化和一次插入。
+    
+    参数:
+        batch: 要存储的FAQ
+        milvus_service: Milvus服务对象
+        executor: 执行阻塞操作的工具执行器
+        
+    返回:
+        存储的FAQ数量和ID
+    """
+    ids = await executor.run("storeFAQBatch", milvus_service.store_faq_batch, batch.faqs)
+    return {"stored": len(ids), "ids": ids}
+
+
+@router.post("/deleteFAQ")
+async def delete_faq(
+    request: DeleteRequest,
+    milvus_service: MilvusService = Depends(get_milvus_service_dependency),
+    executor: ToolExecutor = Depends(get_tool_executor)
+) -> Dict[str, Any]:
+    """Delete FAQs from the FAQ store by ID.
+    
+    Args:
+        request: The IDs of the FAQs to delete
+        milvus_service: The Milvus service
+        executor: The tool executor running the blocking work
+        
+    Returns:
+        The number of deleted FAQs
+        
+    按ID删除FAQ库中的常见问题。
+    
+    参数:
+        request: 要删除的FAQ ID
+        milvus_service: Milvus服务对象
+        executor: 执行阻塞操作的工具执行器
+        
+    返回:
+        删除的FAQ数量
     """
-    milvus_service.store_faq(content)
+    deleted = await executor.run("deleteFAQ", milvus_service.delete_faq, request.ids)
+    return {"deleted": deleted}
 
 
 @router.post("/searchFAQ")
 async def search_faq(
     query: SearchFAQQuery,
-    milvus_service: MilvusService = Depends(get_milvus_service_dependency)
+    milvus_service: MilvusService = Depends(get_milvus_service_dependency),
+    executor: ToolExecutor = Depends(get_tool_executor)
 ) -> List[FAQContent]:
     """Search for FAQs in the FAQ store.
     
     Args:
         query: The search query
         milvus_service: The Milvus service
+        executor: The tool executor running the blocking work
         
     Returns:
         List of matching FAQs
@@ -153,8 +333,16 @@ async def search_faq(
     参数:
         query: 搜索查询
         milvus_service: Milvus服务对象
+        executor: 执行阻塞操作的工具执行器
         
     返回:
         匹配FAQ的列表
     """
-    return milvus_service.search_faq(query.query, query.size) 
\ No newline at end of file
+    return await executor.run(
+        "searchFAQ",
+        milvus_service.search_faq,
+        query.query,
+        query.size,
+        rerank=query.rerank,
+        include_vectors=query.include_vectors
+    ) 
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+ASGI application serving both MCP and the REST API.
+
+The MCP SSE endpoints (/sse, /messages/), the MCP streamable HTTP endpoint
+(/mcp) and the REST router under /api/v1 share one process, one MilvusService
+and one ToolExecutor, so internal services can do high-volume lookups over
+plain HTTP without an MCP session. REST responses are rendered with orjson and
+gzip-compressed when large.
+
+In stateless mode (MCP_STATELESS_HTTP) a tool can be called with a single
+POST to /mcp, without the initialize and tools/list round trips:
+
+    curl -X POST http://localhost:8080/mcp \\
+        -H "Content-Type: application/json" \\
+        -H "Accept: application/json, text/event-stream" \\
+        -d '{"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+             "params": {"name": "searchKnowledge", "arguments": {"query": "milvus"}}}'
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response
+from starlette.routing import Route
+from starlette.types import Receive, Scope, Send
+
+from app.api.mcp import router
+from app.config.settings import HTTP_KEEP_ALIVE_TIMEOUT, HTTP_BACKLOG
+from app.mcp_server import MilvusMCPServer
+from app.middleware import RESTGZipMiddleware, RequestSizeLimitMiddleware
+from app.services.tool_executor import OverloadedError
+from app.utils.metrics import render_metrics
+
+
+class StreamableHTTPEndpoint:
+    """Hand requests on the streamable HTTP path to the MCP session manager.
+
+    FastMCP mounts the endpoint, which only matches "/mcp/..." and answers a
+    POST to "/mcp" with a redirect. Routing the exact path saves that round
+    trip on every call.
+    """
+
+    def __init__(self, mcp_server: MilvusMCPServer):
+        self.mcp_server = mcp_server
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.mcp_server.session_manager.handle_request(scope, receive, send)
+
+
+def add_exception_handlers(app: FastAPI):
+    """Map service errors raised by REST endpoints to status codes.
+
+    ValueError is what MilvusService raises for requests it cannot serve, such
+    as an empty or oversized batch or reranking on a server without a rerank
+    model, so it is the client's error and answered with 400.
+
+    Args:
+        app: The application to register the handlers on
+    """
+    @app.exception_handler(OverloadedError)
+    async def overloaded_handler(request: Request, exc: OverloadedError) -> ORJSONResponse:
+        return ORJSONResponse(
+            {"status": "error", "error": "overloaded", "message": str(exc), "retry_after": exc.retry_after},
+            status_code=503,
+            headers={"Retry-After": str(exc.retry_after)}
+        )
+
+    @app.exception_handler(asyncio.TimeoutError)
+    async def timeout_handler(request: Request, exc: asyncio.TimeoutError) -> ORJSONResponse:
+        return ORJSONResponse({"status": "error", "error": "timeout", "message": str(exc) or "Request timed out"}, status_code=504)
+
+    @app.exception_handler(ValueError)
+    async def invalid_request_handler(request: Request, exc: ValueError) -> ORJSONResponse:
+        return ORJSONResponse({"status": "error", "error": "invalid_request", "message": str(exc)}, status_code=400)
+
+
+def create_app(mcp_server: MilvusMCPServer) -> FastAPI:
+    """Create the combined MCP + REST application.
+
+    Args:
+        mcp_server: The initialized MCP server
+
+    Returns:
+        The ASGI application
+    """
+    # Creates the streamable HTTP session manager, which must run for the app's lifetime
+    streamable_http_app = mcp_server.streamable_http_app()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with mcp_server.session_manager.run():
+            yield
+
+    app = FastAPI(title="Milvus MCP Server", default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.add_middleware(RESTGZipMiddleware)
+    # Outermost, so oversized bodies are rejected before anything reads them
+    app.add_middleware(RequestSizeLimitMiddleware)
+    app.include_router(router)
+    add_exception_handlers(app)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        body, content_type = render_metrics()
+        return Response(body, media_type=content_type)
+
+    # Serve the MCP transport routes from the same app
+    app.router.routes.extend(mcp_server.sse_app().routes)
+    app.router.routes.append(Route(mcp_server.settings.streamable_http_path, StreamableHTTPEndpoint(mcp_server)))
+    app.router.routes.extend(streamable_http_app.routes)
+    return app
+
+
+def serve(mcp_server: MilvusMCPServer, host: str, port: int):
+    """Run the combined application with keep-alive tuned for internal clients.
+
+    Args:
+        mcp_server: The initialized MCP server
+        host: The host to bind to
+        port: The port to bind to
+    """
+    config = uvicorn.Config(
+        create_app(mcp_server),
+        host=host,
+        port=port,
+        timeout_keep_alive=HTTP_KEEP_ALIVE_TIMEOUT,
+        backlog=HTTP_BACKLOG,
+        log_level=mcp_server.settings.log_level.lower()
+    )
+    uvicorn.Server(config).run()
@@ -7,10 +7,20 @@ load_dotenv()
 # Milvus configuration
 MILVUS_HOST = os.getenv("MILVUS_HOST", "localhost")
 MILVUS_PORT = int(os.getenv("MILVUS_PORT", "19530"))
+# Run Milvus Lite inside the process on this local file (e.g. ./milvus.db) instead
+# of connecting to MILVUS_HOST:MILVUS_PORT; single worker only. Not named MILVUS_URI
+# because pymilvus reads that variable itself and only accepts server URIs.
+MILVUS_LITE_PATH = os.getenv("MILVUS_LITE_PATH", "")
 
 # Embedding model configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")  # Default to all-MiniLM-L6-v2
 VECTOR_DIMENSION = int(os.getenv("VECTOR_DIMENSION", "384"))  # Default to 384 for all-MiniLM-L6-v2
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))  # query embeddings kept in memory, 0 disables
+
+# Cross-encoder reranking, used when a search asks for rerank=true; empty disables it
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2
+RERANK_OVERSAMPLE = int(os.getenv("RERANK_OVERSAMPLE", "4"))  # candidates fetched per requested result
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "512"))  # tokens per (query, passage) pair
 
 # Collection names
 KNOWLEDGE_COLLECTION = os.getenv("KNOWLEDGE_COLLECTION", "knowledge_store")
@@ -21,4 +31,105 @@ TEXT_FIELD = "text"
 VECTOR_FIELD = "embedding"
 FAQ_QUESTION_FIELD = "question"
 FAQ_ANSWER_FIELD = "answer"
-METADATA_FIELD = "metadata" 
\ No newline at end of file
+METADATA_FIELD = "metadata" 
+
+# Collection lifecycle configuration
+# Collections are loaded into memory on first query and released again after
+# being idle for COLLECTION_IDLE_TIMEOUT seconds (0 keeps them loaded forever).
+COLLECTION_IDLE_TIMEOUT = int(os.getenv("COLLECTION_IDLE_TIMEOUT", "1800"))
+COLLECTION_RELEASE_CHECK_INTERVAL = int(os.getenv("COLLECTION_RELEASE_CHECK_INTERVAL", "60"))
+
+# Binary quantization configuration
+# When enabled, the knowledge collection also stores a sign-binarized copy of
+# each embedding. Searches run a Hamming ANN over the binary vectors to fetch
+# size * BINARY_OVERSAMPLE candidates and rescore them with the float vectors;
+# results carry the rescored cosine similarity as their score.
+KNOWLEDGE_BINARY_QUANTIZATION = os.getenv("KNOWLEDGE_BINARY_QUANTIZATION", "false").lower() == "true"
+BINARY_VECTOR_FIELD = "embedding_binary"
+BINARY_OVERSAMPLE = int(os.getenv("BINARY_OVERSAMPLE", "4"))
+
+# Hybrid search configuration
+# When enabled, the knowledge collection gets a BM25 sparse vector computed by
+# Milvus from the text field at insert time, and searches fuse dense and sparse
+# results in a single hybrid search call.
+KNOWLEDGE_HYBRID_SEARCH = os.getenv("KNOWLEDGE_HYBRID_SEARCH", "false").lower() == "true"
+SPARSE_VECTOR_FIELD = "sparse_embedding"
+BM25_ANALYZER = os.getenv("BM25_ANALYZER", "standard")  # Use "chinese" for Chinese documents
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# Request handling configuration
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "300"))  # seconds, including time spent queued
+# Request bodies above this size are rejected with 413 before being parsed
+MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", str(10 * 1024 * 1024)))  # bytes
+# New calls of a tool are shed while its smoothed queue wait exceeds this
+# many seconds and calls are still queued (0 disables shedding)
+LOAD_SHED_QUEUE_WAIT = float(os.getenv("LOAD_SHED_QUEUE_WAIT", "5"))
+# Threads running blocking embedding and Milvus work for tool calls
+TOOL_EXECUTOR_WORKERS = int(os.getenv("TOOL_EXECUTOR_WORKERS", "8"))
+# Maximum concurrent calls per tool, as "tool=limit" pairs
+TOOL_CONCURRENCY_LIMITS = {
+    name.strip(): int(limit)
+    for name, limit in (
+        item.split("=") for item in os.getenv(
+            "TOOL_CONCURRENCY_LIMITS",
+            "searchKnowledge=8,searchFAQ=8,storeKnowledge=4,storeFAQ=4,storeKnowledgeBatch=2,storeFAQBatch=2,"
+            "deleteKnowledge=2,deleteFAQ=2"
+        ).split(",") if item.strip()
+    )
+}
+
+# Scheduling configuration
+# Tools are split into read and write classes that share the executor workers
+# with weighted fair queuing, so bulk ingestion cannot starve interactive search.
+TOOL_CLASSES = {
+    "searchKnowledge": "read",
+    "searchFAQ": "read",
+    "storeKnowledge": "write",
+    "storeFAQ": "write",
+    "storeKnowledgeBatch": "write",
+    "storeFAQBatch": "write",
+    "deleteKnowledge": "write",
+    "deleteFAQ": "write"
+}
+# Maximum documents per storeKnowledgeBatch / storeFAQBatch / delete call
+STORE_BATCH_MAX_SIZE = int(os.getenv("STORE_BATCH_MAX_SIZE", "256"))
+SCHEDULER_WEIGHTS = {
+    name.strip(): float(weight)
+    for name, weight in (
+        item.split("=") for item in os.getenv("SCHEDULER_WEIGHTS", "read=4,write=1").split(",") if item.strip()
+    )
+}
+# Maximum concurrent calls per MCP session, 0 disables the quota
+SESSION_CONCURRENCY_QUOTA = int(os.getenv("SESSION_CONCURRENCY_QUOTA", "0"))
+
+# HTTP configuration
+HTTP_KEEP_ALIVE_TIMEOUT = int(os.getenv("HTTP_KEEP_ALIVE_TIMEOUT", "75"))  # seconds, above typical client pool idle times
+HTTP_BACKLOG = int(os.getenv("HTTP_BACKLOG", "2048"))
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))  # bytes, smaller REST responses are sent uncompressed
+
+# MCP transport configuration
+# "http" serves SSE (/sse) and streamable HTTP (/mcp) next to the REST API,
+# "stdio" serves a single client over stdin/stdout.
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "http")
+# Stateless streamable HTTP: every POST to /mcp is handled on its own, so a tool
+# can be called with a single request and no initialize handshake.
+MCP_STATELESS_HTTP = os.getenv("MCP_STATELESS_HTTP", "true").lower() == "true"
+# Answer /mcp POSTs with a plain JSON body instead of an SSE stream
+MCP_JSON_RESPONSE = os.getenv("MCP_JSON_RESPONSE", "true").lower() == "true"
+
+# Tracing configuration
+# "file" appends spans as JSON lines to TRACING_FILE, "otlp" sends them to
+# OTEL_EXPORTER_OTLP_ENDPOINT; empty disables tracing.
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "milvus-mcp-server")
+
+# Logging configuration
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json" (one JSON object per line)
+# Write console logs from a background thread so the event loop never blocks on stderr
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "true").lower() == "true"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # lines buffered before new ones are dropped
+# Hot-path logs (one per search) are sampled, then optionally limited per message
+# type to LOG_RATE_LIMIT lines per second; 0 (the default) disables the limit.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "0"))
\ No newline at end of file
@@ -9,10 +9,13 @@ implementing singleton pattern and dependency management.
 """
 
 from functools import lru_cache
-from typing import Generator
+from typing import Generator, Optional
 
 from app.services.embedding_service import EmbeddingService
 from app.services.milvus_service import MilvusService
+from app.services.rerank_service import RerankService
+from app.config.settings import RERANK_MODEL
+from app.services.tool_executor import ToolExecutor
 
 
 @lru_cache(maxsize=1)
@@ -27,18 +30,46 @@ def get_embedding_service() -> EmbeddingService:
     return EmbeddingService()
 
 
+@lru_cache(maxsize=1)
+def get_rerank_service() -> Optional[RerankService]:
+    """获取重排序服务的单例实例。
+    
+    未设置RERANK_MODEL时不加载交叉编码器模型，返回None。
+    
+    Returns:
+        Optional[RerankService]: 重排序服务实例
+    """
+    if not RERANK_MODEL:
+        return None
+    return RerankService(RERANK_MODEL)
+
+
 @lru_cache(maxsize=1)
 def get_milvus_service() -> MilvusService:
     """获取Milvus向量数据库服务的单例实例。
     
     使用lru_cache装饰器确保只创建一个MilvusService实例，实现单例模式。
-    该服务依赖于EmbeddingService，通过get_embedding_service()获取依赖。
+    该服务依赖于EmbeddingService，通过get_embedding_service()获取依赖；
+    设置了RERANK_MODEL时还会注入RerankService。
     
     Returns:
         MilvusService: Milvus向量数据库服务实例
     """
     embedding_service = get_embedding_service()
-    return MilvusService(embedding_service)
+    return MilvusService(embedding_service, get_rerank_service())
+
+
+@lru_cache(maxsize=1)
+def get_tool_executor() -> ToolExecutor:
+    """获取工具执行器的单例实例。
+    
+    MCP工具和REST接口共享同一个有界线程池，阻塞的向量化和Milvus调用在其中执行，
+    避免阻塞事件循环。
+    
+    Returns:
+        ToolExecutor: 工具执行器实例
+    """
+    return ToolExecutor()
 
 
 def get_milvus_service_dependency() -> MilvusService:
@@ -6,6 +6,8 @@ from loguru import logger
 import uvicorn
 from app.utils.logging import get_logger
 from app.mcp_server import MilvusMCPServer
+from app.asgi import serve
+from app.config.settings import MCP_TRANSPORT
 
 # Configure logging
 logger = get_logger()
@@ -46,6 +48,20 @@ def handle_shutdown(sig, frame):
 
 def start_server():
     """Start the MCP server with proper initialization"""
+    # Multi-worker mode: one shared model, WORKERS forked MCP servers behind a dispatcher
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1 and MCP_TRANSPORT != "stdio":
+        from app import multiworker
+        port = int(os.getenv("PORT", "8080"))
+        host = os.getenv("HOST", "0.0.0.0")
+        worker_base_port = int(os.getenv("WORKER_BASE_PORT", str(port + 1)))
+        try:
+            multiworker.run(workers, host, port, worker_base_port)
+        except ValueError as e:
+            logger.error(f"Error starting server: {e}")
+            sys.exit(1)
+        return
+    
     # Register signal handlers for graceful shutdown
     signal.signal(signal.SIGINT, handle_shutdown)
     signal.signal(signal.SIGTERM, handle_shutdown)
@@ -58,11 +74,17 @@ def start_server():
         # Initialize server
         mcp_server, host, port = loop.run_until_complete(initialize_server())
         
+        if MCP_TRANSPORT == "stdio":
+            # Serve a single client over stdin/stdout (logs go to stderr)
+            logger.info("Starting Milvus MCP Server on stdio")
+            mcp_server.run(transport="stdio")
+            return
+        
         # Log startup
         logger.info(f"Starting Milvus MCP Server on {host}:{port}")
         
-        # Run server with SSE transport
-        mcp_server.run(transport='sse')
+        # Serve MCP over SSE and streamable HTTP together with the REST API
+        serve(mcp_server, host, port)
     except Exception as e:
         logger.error(f"Error starting server: {e}")
         sys.exit(1)
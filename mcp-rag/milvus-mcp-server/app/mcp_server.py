@@ -1,17 +1,26 @@
 from mcp.server import FastMCP
-from typing import Any, Dict, List
+from mcp.server.fastmcp import Context
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from loguru import logger
+import functools
+import orjson
 from app.services.milvus_service import MilvusService
 from app.models.models import KnowledgeContent, FAQContent
-from app.dependencies import get_milvus_service_dependency
+from app.dependencies import get_milvus_service_dependency, get_tool_executor
+from app.services.tool_executor import OverloadedError
+from app.config.settings import MCP_STATELESS_HTTP, MCP_JSON_RESPONSE
+from app.utils.metrics import observe_stage
+from app.utils.tracing import init_tracing, start_span
 import asyncio
 
 class MilvusMCPServer(FastMCP):
     """MCP server implementation for Milvus vector database."""
     
     def __init__(self):
-        super().__init__()
+        super().__init__(stateless_http=MCP_STATELESS_HTTP, json_response=MCP_JSON_RESPONSE)
+        init_tracing()
         self.milvus_service = get_milvus_service_dependency()
+        self.executor = get_tool_executor()
         self.is_ready = False
         
         # Register tools - Call directly in __init__ after service initialization
@@ -35,13 +44,33 @@ class MilvusMCPServer(FastMCP):
                 "name": "searchFAQ",
                 "fn": self.search_faq,
                 "description": "Search for similar documents on natural language descriptions from FAQ store.",
+            },
+            {
+                "name": "storeKnowledgeBatch",
+                "fn": self.store_knowledge_batch,
+                "description": "Store several documents into knowledge store with one embedding batch and one insert.",
+            },
+            {
+                "name": "storeFAQBatch",
+                "fn": self.store_faq_batch,
+                "description": "Store several FAQs into FAQ store with one embedding batch and one insert.",
+            },
+            {
+                "name": "deleteKnowledge",
+                "fn": self.delete_knowledge,
+                "description": "Delete documents from knowledge store by the IDs returned when they were stored.",
+            },
+            {
+                "name": "deleteFAQ",
+                "fn": self.delete_faq,
+                "description": "Delete FAQs from FAQ store by the IDs returned when they were stored.",
             }
         ]
         
         # Register each tool directly with the server
         for config in tool_configs:
             self.add_tool(
-                fn=config["fn"],
+                fn=self._serialized(config["name"], config["fn"]),
                 name=config["name"],
                 description=config["description"]
             )
@@ -72,65 +101,296 @@ class MilvusMCPServer(FastMCP):
                     break
         return self.is_ready
             
-    async def store_knowledge(self, content: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Store knowledge content in Milvus."""
-        # Ensure server is ready before processing
-        await self.ready_for_connections()
+    @staticmethod
+    def _session_id(ctx: Context) -> Optional[str]:
+        """Identify the MCP session a tool call belongs to, for per-session quotas."""
+        try:
+            return str(id(ctx.session)) if ctx is not None else None
+        except ValueError:
+            return None
+            
+    @staticmethod
+    def _trace_carrier(ctx: Optional[Context]) -> Dict[str, str]:
+        """Read the client's W3C trace context from the tools/call _meta."""
+        try:
+            meta = ctx.request_context.meta if ctx is not None else None
+        except ValueError:
+            return {}
+        if meta is None or not meta.model_extra:
+            return {}
+        return {key: value for key, value in meta.model_extra.items() if key in ("traceparent", "tracestate")}
+        
+    @staticmethod
+    def _serialized(name: str, fn: Callable[..., Awaitable[Dict[str, Any]]]) -> Callable[..., Awaitable[str]]:
+        """Wrap a tool so its result dict is returned as compact orjson text.
+        
+        FastMCP would otherwise pretty-print the dict with pydantic; serializing
+        here is faster and lets the serialize stage be measured. The text is the
+        same JSON object without indentation, which clients see as a format
+        change only if they compare or display the raw text. The call runs in
+        a server span that continues the client's trace. The wrapper keeps fn's
+        signature, from which FastMCP builds the input schema.
+        """
+        @functools.wraps(fn)
+        async def tool(*args, **kwargs) -> str:
+            carrier = MilvusMCPServer._trace_carrier(kwargs.get("ctx"))
+            with start_span(f"tools/call {name}", carrier=carrier, attributes={"mcp.tool": name}, server=True):
+                result = await fn(*args, **kwargs)
+                with observe_stage(name, "serialize"):
+                    return orjson.dumps(result).decode()
+        return tool
+        
+    @staticmethod
+    def _overloaded(e: OverloadedError) -> Dict[str, Any]:
+        """Structured error for a shed call, telling the client when to retry."""
+        logger.warning(str(e))
+        return {"status": "error", "error": "overloaded", "message": str(e), "retry_after": e.retry_after}
+            
+    async def store_knowledge(
+        self, content: str, metadata: Dict[str, Any] = None, id: Optional[str] = None, ctx: Context = None
+    ) -> Dict[str, Any]:
+        """Store knowledge content in Milvus.
+        
+        With an id chosen by the client, storing again replaces the earlier
+        document, so a retried call never stores a duplicate.
+        """
+        # Only wait if the server is still starting up
+        if not self.is_ready:
+            await self.ready_for_connections()
         
         try:
             knowledge_content = KnowledgeContent(
+                id=id,
                 content=content,
-                metadata=metadata or {}
+                meta_data=metadata or {}
             )
-            self.milvus_service.store_knowledge(knowledge_content)
-            return {"status": "success", "message": "Knowledge stored successfully"}
+            doc_id = await self.executor.run(
+                "storeKnowledge",
+                self.milvus_service.store_knowledge,
+                knowledge_content,
+                session_id=self._session_id(ctx)
+            )
+            return {"status": "success", "message": "Knowledge stored successfully", "id": doc_id}
+        except OverloadedError as e:
+            return self._overloaded(e)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out storing knowledge after {self.executor.timeout}s")
+            return {"status": "error", "error": "timeout", "message": f"Request timed out after {self.executor.timeout}s"}
         except Exception as e:
             logger.error(f"Error storing knowledge: {e}")
             return {"status": "error", "message": str(e)}
             
-    async def search_knowledge(self, query: str, size: int = 5) -> Dict[str, Any]:
-        """Search knowledge content in Milvus."""
-        # Ensure server is ready before processing
-        await self.ready_for_connections()
+    async def store_knowledge_batch(self, documents: List[Dict[str, Any]], ctx: Context = None) -> Dict[str, Any]:
+        """Store several documents in Milvus with one embedding batch and one insert.
+        
+        Each document is an object with a "content" string, an optional
+        "metadata" object and an optional client-chosen "id" (see storeKnowledge).
+        The batch is stored as a whole or not at all.
+        """
+        # Only wait if the server is still starting up
+        if not self.is_ready:
+            await self.ready_for_connections()
+        
+        try:
+            contents = [
+                KnowledgeContent(id=document.get("id"), content=document["content"], meta_data=document.get("metadata") or {})
+                for document in documents
+            ]
+            ids = await self.executor.run(
+                "storeKnowledgeBatch",
+                self.milvus_service.store_knowledge_batch,
+                contents,
+                session_id=self._session_id(ctx)
+            )
+            return {"status": "success", "stored": len(ids), "ids": ids}
+        except OverloadedError as e:
+            return self._overloaded(e)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out storing knowledge batch after {self.executor.timeout}s")
+            return {"status": "error", "error": "timeout", "message": f"Request timed out after {self.executor.timeout}s"}
+        except Exception as e:
+            logger.error(f"Error storing knowledge batch: {e}")
+            return {"status": "error", "message": str(e)}
+            
+    async def delete_knowledge(self, ids: List[str], ctx: Context = None) -> Dict[str, Any]:
+        """Delete documents from Milvus by the IDs returned when they were stored.
+        
+        Deleting an ID that does not exist is not an error, so a retried delete is safe.
+        """
+        return await self._delete("deleteKnowledge", self.milvus_service.delete_knowledge, ids, ctx)
+        
+    async def _delete(self, name: str, delete: Callable[[List[str]], int], ids: List[str], ctx: Context) -> Dict[str, Any]:
+        """Run a delete tool call on the executor."""
+        # Only wait if the server is still starting up
+        if not self.is_ready:
+            await self.ready_for_connections()
+        
+        try:
+            deleted = await self.executor.run(name, delete, ids, session_id=self._session_id(ctx))
+            return {"status": "success", "deleted": deleted}
+        except OverloadedError as e:
+            return self._overloaded(e)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out running {name} after {self.executor.timeout}s")
+            return {"status": "error", "error": "timeout", "message": f"Request timed out after {self.executor.timeout}s"}
+        except Exception as e:
+            logger.error(f"Error running {name}: {e}")
+            return {"status": "error", "message": str(e)}
+            
+    async def search_knowledge(
+        self,
+        query: str,
+        size: int = 5,
+        hybrid: Optional[bool] = None,
+        sparse_weight: Optional[float] = None,
+        rrf_k: Optional[int] = None,
+        rerank: bool = False,
+        include_vectors: bool = False,
+        ctx: Context = None
+    ) -> Dict[str, Any]:
+        """Search knowledge content in Milvus.
+        
+        When the knowledge store carries BM25 vectors, dense and keyword results are
+        fused with reciprocal rank fusion (rrf_k), or with a weighted sum if
+        sparse_weight (0-1) is given. Set hybrid to false for dense-only search.
+        Set rerank to true to reorder oversampled candidates with a cross-encoder;
+        each result then carries its relevance score. Set include_vectors to true
+        to return the stored embedding of each result, e.g. for diversity selection.
+        """
+        # Only wait if the server is still starting up
+        if not self.is_ready:
+            await self.ready_for_connections()
         
         try:
-            results = self.milvus_service.search_knowledge(query, size)
+            results = await self.executor.run(
+                "searchKnowledge",
+                self.milvus_service.search_knowledge,
+                query,
+                size,
+                hybrid=hybrid,
+                sparse_weight=sparse_weight,
+                rrf_k=rrf_k,
+                rerank=rerank,
+                include_vectors=include_vectors,
+                session_id=self._session_id(ctx)
+            )
             return {
                 "status": "success",
                 "results": [result.dict() for result in results]
             }
+        except OverloadedError as e:
+            return self._overloaded(e)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out searching knowledge after {self.executor.timeout}s")
+            return {"status": "error", "error": "timeout", "message": f"Request timed out after {self.executor.timeout}s"}
         except Exception as e:
             logger.error(f"Error searching knowledge: {e}")
             return {"status": "error", "message": str(e)}
             
-    async def store_faq(self, question: str, answer: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Store FAQ content in Milvus."""
-        # Ensure server is ready before processing
-        await self.ready_for_connections()
+    async def store_faq(
+        self, question: str, answer: str, metadata: Dict[str, Any] = None, id: Optional[str] = None, ctx: Context = None
+    ) -> Dict[str, Any]:
+        """Store FAQ content in Milvus.
+        
+        With an id chosen by the client, storing again replaces the earlier
+        FAQ, so a retried call never stores a duplicate.
+        """
+        # Only wait if the server is still starting up
+        if not self.is_ready:
+            await self.ready_for_connections()
         
         try:
             content = FAQContent(
+                id=id,
                 question=question,
                 answer=answer,
                 metadata=metadata or {}
             )
-            self.milvus_service.store_faq(content)
-            return {"status": "success", "message": "FAQ stored successfully"}
+            doc_id = await self.executor.run(
+                "storeFAQ",
+                self.milvus_service.store_faq,
+                content,
+                session_id=self._session_id(ctx)
+            )
+            return {"status": "success", "message": "FAQ stored successfully", "id": doc_id}
+        except OverloadedError as e:
+            return self._overloaded(e)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out storing FAQ after {self.executor.timeout}s")
+            return {"status": "error", "error": "timeout", "message": f"Request timed out after {self.executor.timeout}s"}
         except Exception as e:
             logger.error(f"Error storing FAQ: {e}")
             return {"status": "error", "message": str(e)}
             
-    async def search_faq(self, query: str, size: int = 5) -> Dict[str, Any]:
-        """Search FAQ content in Milvus."""
-        # Ensure server is ready before processing
-        await self.ready_for_connections()
+    async def store_faq_batch(self, faqs: List[Dict[str, Any]], ctx: Context = None) -> Dict[str, Any]:
+        """Store several FAQs in Milvus with one embedding batch and one insert.
+        
+        Each FAQ is an object with "question" and "answer" strings and an optional
+        client-chosen "id" (see storeFAQ). The batch is stored as a whole or not at all.
+        """
+        # Only wait if the server is still starting up
+        if not self.is_ready:
+            await self.ready_for_connections()
         
         try:
-            results = self.milvus_service.search_faq(query, size)
+            contents = [FAQContent(id=faq.get("id"), question=faq["question"], answer=faq["answer"]) for faq in faqs]
+            ids = await self.executor.run(
+                "storeFAQBatch",
+                self.milvus_service.store_faq_batch,
+                contents,
+                session_id=self._session_id(ctx)
+            )
+            return {"status": "success", "stored": len(ids), "ids": ids}
+        except OverloadedError as e:
+            return self._overloaded(e)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out storing FAQ batch after {self.executor.timeout}s")
+            return {"status": "error", "error": "timeout", "message": f"Request timed out after {self.executor.timeout}s"}
+        except Exception as e:
+            logger.error(f"Error storing FAQ batch: {e}")
+            return {"status": "error", "message": str(e)}
+            
+    async def delete_faq(self, ids: List[str], ctx: Context = None) -> Dict[str, Any]:
+        """Delete FAQs from Milvus by the IDs returned when they were stored."""
+        return await self._delete("deleteFAQ", self.milvus_service.delete_faq, ids, ctx)
+        
+    async def search_faq(
+        self,
+        query: str,
+        size: int = 5,
+        rerank: bool = False,
+        include_vectors: bool = False,
+        ctx: Context = None
+    ) -> Dict[str, Any]:
+        """Search FAQ content in Milvus.
+        
+        Set rerank to true to reorder oversampled candidates with a cross-encoder;
+        each result then carries its relevance score. Set include_vectors to true
+        to return the stored embedding of each result's question.
+        """
+        # Only wait if the server is still starting up
+        if not self.is_ready:
+            await self.ready_for_connections()
+        
+        try:
+            results = await self.executor.run(
+                "searchFAQ",
+                self.milvus_service.search_faq,
+                query,
+                size,
+                rerank=rerank,
+                include_vectors=include_vectors,
+                session_id=self._session_id(ctx)
+            )
             return {
                 "status": "success",
                 "results": [result.dict() for result in results]
             }
+        except OverloadedError as e:
+            return self._overloaded(e)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out searching FAQ after {self.executor.timeout}s")
+            return {"status": "error", "error": "timeout", "message": f"Request timed out after {self.executor.timeout}s"}
         except Exception as e:
             logger.error(f"Error searching FAQ: {e}")
-            return {"status": "error", "message": str(e)} 
\ No newline at end of file
+            return {"status": "error", "message": str(e)}
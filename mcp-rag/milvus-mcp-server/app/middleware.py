@@ -0,0 +1,89 @@
+"""
+ASGI middleware shared by the server and the multi-worker dispatcher.
+
+Kept free of service imports so the dispatcher can use it without loading
+Milvus or the embedding model in the parent process.
+"""
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.settings import GZIP_MINIMUM_SIZE, MAX_REQUEST_SIZE
+
+
+class RESTGZipMiddleware:
+    """Gzip REST responses only, so MCP's SSE streams are never buffered."""
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api/", minimum_size: int = GZIP_MINIMUM_SIZE):
+        self.app = app
+        self.prefix = prefix
+        self.gzip_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"].startswith(self.prefix):
+            await self.gzip_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+class RequestSizeLimitMiddleware:
+    """Reject request bodies larger than max_size with 413 before they are parsed.
+
+    A declared Content-Length above the limit is rejected without reading the
+    body. Bodies without one (chunked uploads) are counted as they stream in;
+    once the limit is crossed the client gets the 413 and the application sees
+    a disconnect, so it stops reading and its own response is discarded.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int = MAX_REQUEST_SIZE):
+        self.app = app
+        self.max_size = max_size
+
+    def _response(self) -> JSONResponse:
+        return JSONResponse(
+            {"status": "error", "error": "request_too_large", "max_size": self.max_size},
+            status_code=413
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.max_size:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    too_large = int(value) > self.max_size
+                except ValueError:
+                    too_large = False
+                if too_large:
+                    await self._response()(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+        rejected = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size and not response_started:
+                    rejected = True
+                    await self._response()(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message):
+            nonlocal response_started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
@@ -3,26 +3,54 @@ from pydantic import BaseModel, Field
 
 class KnowledgeContent(BaseModel):
     """The document stored in knowledge store for later retrieval."""
+    id: Optional[str] = Field(default=None, max_length=36, description="the document ID; when set on store, storing again with the same ID replaces the earlier document, so retries are safe")
     content: str = Field(..., description="a natural language document content")
     meta_data: Dict[str, Any] = Field(default_factory=dict, description="a dictionary with strings as keys, which can store some meta data related to this document")
+    score: Optional[float] = Field(default=None, description="the relevance score: the cross-encoder score on reranked search results, otherwise the cosine similarity on binary-quantized searches")
+    vector: Optional[List[float]] = Field(default=None, description="the stored embedding, set on search results when include_vectors is requested")
+
+
+class KnowledgeBatch(BaseModel):
+    """Several documents stored in knowledge store with one request."""
+    documents: List[KnowledgeContent] = Field(..., description="the documents to store")
 
 
 class SearchKnowledgeQuery(BaseModel):
     """The query request to search similar documents from knowledge store"""
     query: str = Field(..., description="describe what you're looking for, and the tool will return the most relevant documents")
     size: int = Field(default=20, description="the number of similar documents to be returned")
+    hybrid: Optional[bool] = Field(default=None, description="fuse dense and BM25 keyword results, defaults to on when the store supports it")
+    sparse_weight: Optional[float] = Field(default=None, ge=0, le=1, description="weight of the BM25 keyword results; when omitted, reciprocal rank fusion is used")
+    rrf_k: Optional[int] = Field(default=None, gt=0, description="the reciprocal rank fusion constant")
+    rerank: bool = Field(default=False, description="rerank oversampled candidates with the server's cross-encoder")
+    include_vectors: bool = Field(default=False, description="return the stored embedding of each result")
 
 
 class FAQContent(BaseModel):
     """The document stored in FAQ store for later retrieval."""
+    id: Optional[str] = Field(default=None, max_length=36, description="the FAQ ID; when set on store, storing again with the same ID replaces the earlier FAQ, so retries are safe")
     question: str = Field(..., description="a natural language document content")
     answer: str = Field(..., description="a natural language document content")
+    score: Optional[float] = Field(default=None, description="the cross-encoder relevance score, set on reranked search results")
+    vector: Optional[List[float]] = Field(default=None, description="the stored embedding of the question, set on search results when include_vectors is requested")
+
+
+class FAQBatch(BaseModel):
+    """Several FAQs stored in FAQ store with one request."""
+    faqs: List[FAQContent] = Field(..., description="the FAQs to store")
+
+
+class DeleteRequest(BaseModel):
+    """The IDs of stored documents or FAQs to delete."""
+    ids: List[str] = Field(..., description="the IDs returned when the items were stored")
 
 
 class SearchFAQQuery(BaseModel):
     """The query request to search similar documents from faq store"""
     query: str = Field(..., description="describe what you're looking for, and the tool will return the most relevant documents")
     size: int = Field(default=20, description="the number of similar documents to be returned")
+    rerank: bool = Field(default=False, description="rerank oversampled candidates with the server's cross-encoder")
+    include_vectors: bool = Field(default=False, description="return the stored embedding of each result")
 
 
 class MCPTool(BaseModel):
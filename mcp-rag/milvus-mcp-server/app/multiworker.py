@@ -0,0 +1,459 @@
+"""
+Multi-worker deployment for the MCP server.
+
+The parent process loads the embedding model once and then forks WORKERS
+worker processes, which share the model weights copy-on-write. Each worker
+runs its own MCP server and REST API (and Milvus connection) on a private
+port, and the parent runs a small dispatcher on the public port.
+
+SSE sessions are stateful: the POSTs to /messages/?session_id=... must reach
+the worker that holds the matching /sse stream. The dispatcher therefore sends
+each new /sse stream to the worker with the fewest open streams, learns the
+session id from the stream's first "endpoint" event and routes that session's
+messages to the same worker. Other requests are distributed round-robin,
+including /mcp, so streamable HTTP must be stateless (MCP_STATELESS_HTTP):
+a stateful session's follow-up requests would reach workers that never saw
+it, and run() refuses to start in that configuration.
+
+The dispatcher supervises the workers: when one exits (SIGCHLD), it is taken
+out of routing, its SSE sessions are dropped and a replacement is forked on
+the same port. Requests go only to workers whose port accepts connections.
+
+Each worker runs inference with OMP_NUM_THREADS threads, so set it so that
+WORKERS * OMP_NUM_THREADS matches the available cores.
+"""
+import os
+import gc
+import re
+import sys
+import stat
+import time
+import signal
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app.utils.logging import get_logger
+from app.config.settings import MCP_STATELESS_HTTP
+from app.dependencies import get_embedding_service, get_rerank_service
+from app.middleware import RequestSizeLimitMiddleware
+from app.utils.metrics import render_metrics
+
+logger = get_logger()
+
+SESSION_ID_PATTERN = re.compile(rb"session_id=([0-9a-fA-F-]+)")
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host", "content-length"}
+
+# A worker that exits sooner than this after starting is restarted with exponential backoff
+WORKER_MIN_UPTIME = 10.0
+WORKER_RESTART_MAX_DELAY = 30.0
+# How often a starting worker's port is probed
+WORKER_READY_POLL = 0.2
+
+
+def memory_usage(pid: str = "self") -> Dict[str, float]:
+    """Return RSS, PSS and shared memory of a process in MB.
+
+    PSS splits shared pages between the processes mapping them, so the sum of
+    the workers' PSS is the real memory cost of the deployment.
+    """
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty"):
+                    usage[key] = int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        return {"rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    return {
+        "rss_mb": round(usage.get("Rss", 0.0), 1),
+        "pss_mb": round(usage.get("Pss", 0.0), 1),
+        "shared_mb": round(usage.get("Shared_Clean", 0.0) + usage.get("Shared_Dirty", 0.0), 1)
+    }
+
+
+class Worker:
+    """A forked worker process serving MCP on a private port."""
+
+    def __init__(self, index: int, pid: int, port: int, restarts: int = 0):
+        self.index = index
+        self.pid = pid
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.streams = 0
+        self.restarts = restarts
+        self.started = time.monotonic()
+        # Ready once its port accepts connections; exited once reaped
+        self.ready = False
+        self.exited = False
+
+
+def _fork_worker(index: int, port: int, restarts: int = 0, from_dispatcher: bool = False) -> Worker:
+    """Fork a worker process.
+
+    Args:
+        index: The worker index
+        port: The worker's private port
+        restarts: How many workers with this index were started before
+        from_dispatcher: Whether the running dispatcher forks the worker (from a helper thread)
+
+    Returns:
+        The new worker
+    """
+    pid = os.fork()
+    if pid == 0:
+        try:
+            if from_dispatcher:
+                _detach_from_dispatcher()
+            _run_worker(index, port)
+        finally:
+            os._exit(0)
+    return Worker(index, pid, port, restarts)
+
+
+def _detach_from_dispatcher():
+    """Drop the dispatcher state inherited by a worker forked to replace another.
+
+    The dispatcher forks from a helper thread that never ran an event loop, so
+    the worker starts its own loop with no running loop inherited; only the
+    dispatcher's signal wakeup fd and SIGCHLD handler, which are process-wide,
+    are reset. Inherited sockets (the public listener, client and
+    upstream connections) are pointed at /dev/null: otherwise connections the
+    dispatcher closes would stay open in the worker. The descriptors are kept
+    occupied rather than closed, so that inherited socket objects closing them
+    later cannot close an unrelated descriptor that reused the number.
+    """
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    try:
+        fds = [int(name) for name in os.listdir("/proc/self/fd")]
+    except OSError:
+        return
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in fds:
+        if fd > 2 and fd != devnull:
+            try:
+                if stat.S_ISSOCK(os.fstat(fd).st_mode):
+                    os.dup2(devnull, fd)
+            except OSError:
+                pass
+    os.close(devnull)
+
+
+def _stop_workers(workers: List[Worker]):
+    """Terminate the workers and wait for them to exit."""
+    for worker in workers:
+        if worker.exited:
+            continue
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for worker in workers:
+        if worker.exited:
+            continue
+        try:
+            os.waitpid(worker.pid, 0)
+        except ChildProcessError:
+            pass
+        worker.exited = True
+
+
+def _exit_reason(status: int) -> str:
+    """Describe a waitpid status."""
+    if os.WIFSIGNALED(status):
+        return f"signal {signal.Signals(os.WTERMSIG(status)).name}"
+    return f"exit code {os.WEXITSTATUS(status)}"
+
+
+def _run_worker(index: int, port: int):
+    """Entry point of a forked worker process."""
+    from app.mcp_server import MilvusMCPServer
+    from app.asgi import serve
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    start = time.monotonic()
+    mcp_server = MilvusMCPServer()
+    logger.info(f"Worker {index} (pid {os.getpid()}) ready on port {port} in {time.monotonic() - start:.1f}s, memory: {memory_usage()}")
+    serve(mcp_server, "127.0.0.1", port)
+
+
+def create_dispatcher_app(
+    workers: List[Worker],
+    respawn: Optional[Callable[[Worker], Worker]] = None
+) -> Starlette:
+    """Create the parent's dispatcher application.
+
+    Args:
+        workers: The worker processes to dispatch to; exited workers are replaced in place
+        respawn: Starts a replacement for an exited worker. When set, the dispatcher
+            supervises the workers and stops them on shutdown; None leaves them to the caller
+
+    Returns:
+        The dispatcher ASGI application
+    """
+    client = httpx.AsyncClient(timeout=httpx.Timeout(None), limits=httpx.Limits(max_keepalive_connections=64))
+    sessions: Dict[str, Worker] = {}
+    next_worker = 0
+    tasks = set()
+    stopping = False
+
+    def forward_headers(request: Request) -> Dict[str, str]:
+        return {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+    def unavailable() -> Response:
+        return JSONResponse(
+            {"status": "error", "error": "unavailable", "message": "No worker is ready", "retry_after": 1},
+            status_code=503,
+            headers={"Retry-After": "1"}
+        )
+
+    def round_robin() -> Optional[Worker]:
+        nonlocal next_worker
+        ready = [w for w in workers if w.ready]
+        if not ready:
+            return None
+        next_worker += 1
+        return ready[next_worker % len(ready)]
+
+    def spawn(coro):
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def wait_ready(worker: Worker):
+        """Probe a starting worker's port until it accepts connections."""
+        while not worker.exited:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", worker.port)
+                writer.close()
+                await writer.wait_closed()
+            except OSError:
+                await asyncio.sleep(WORKER_READY_POLL)
+                continue
+            worker.ready = True
+            logger.info(f"Worker {worker.index} (pid {worker.pid}) is accepting requests on port {worker.port}")
+            return
+
+    async def restart(position: int, worker: Worker, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        if stopping:
+            return
+        # Fork on a helper thread: the child must not start out inside the dispatcher's running loop
+        replacement = await asyncio.to_thread(respawn, worker)
+        workers[position] = replacement
+        # It may have exited while the fork ran, before reap could see it
+        reap()
+        logger.info(f"Started worker {replacement.index} (pid {replacement.pid}), restart {replacement.restarts}")
+        await wait_ready(replacement)
+
+    def reap():
+        """Take exited workers out of routing and start their replacements."""
+        for position, worker in enumerate(workers):
+            if worker.exited:
+                continue
+            try:
+                pid, status = os.waitpid(worker.pid, os.WNOHANG)
+            except ChildProcessError:
+                pid, status = worker.pid, 0
+            if pid == 0:
+                continue
+            worker.exited = True
+            worker.ready = False
+            for session_id in [s for s, w in sessions.items() if w is worker]:
+                del sessions[session_id]
+            uptime = time.monotonic() - worker.started
+            delay = 0.0 if uptime >= WORKER_MIN_UPTIME else min(WORKER_RESTART_MAX_DELAY, 2.0 ** min(worker.restarts, 5))
+            logger.error(
+                f"Worker {worker.index} (pid {worker.pid}) exited with {_exit_reason(status)} after {uptime:.1f}s"
+                + (f", restarting in {delay:.0f}s" if respawn and not stopping else "")
+            )
+            if respawn and not stopping:
+                spawn(restart(position, worker, delay))
+
+    async def sse(request: Request) -> Response:
+        ready = [w for w in workers if w.ready]
+        if not ready:
+            return unavailable()
+        worker = min(ready, key=lambda w: w.streams)
+        # Count the stream before connecting so concurrent opens spread out
+        worker.streams += 1
+        upstream_request = client.build_request(
+            "GET", f"{worker.url}{request.url.path}", params=request.query_params, headers=forward_headers(request)
+        )
+        try:
+            upstream = await client.send(upstream_request, stream=True)
+        except Exception:
+            worker.streams -= 1
+            raise
+
+        async def relay():
+            session_id = None
+            try:
+                async for chunk in upstream.aiter_raw():
+                    if session_id is None:
+                        match = SESSION_ID_PATTERN.search(chunk)
+                        if match:
+                            session_id = match.group(1).decode()
+                            sessions[session_id] = worker
+                    yield chunk
+            finally:
+                worker.streams -= 1
+                if session_id is not None:
+                    sessions.pop(session_id, None)
+                await upstream.aclose()
+
+        return StreamingResponse(
+            relay(),
+            status_code=upstream.status_code,
+            headers={k: v for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        )
+
+    async def proxy(request: Request) -> Response:
+        session_id = request.query_params.get("session_id")
+        worker = sessions.get(session_id) if session_id else None
+        if worker is None:
+            worker = round_robin()
+            if worker is None:
+                return unavailable()
+        upstream = await client.request(
+            request.method,
+            f"{worker.url}{request.url.path}",
+            params=request.query_params,
+            headers=forward_headers(request),
+            content=await request.body()
+        )
+        return Response(
+            content=upstream.content,
+            status_code=upstream.status_code,
+            headers={k: v for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        )
+
+    async def metrics(request: Request) -> Response:
+        # Aggregated over all workers through PROMETHEUS_MULTIPROC_DIR
+        body, content_type = render_metrics()
+        return Response(body, media_type=content_type)
+
+    async def worker_status(request: Request) -> Response:
+        return JSONResponse({
+            "dispatcher": {"pid": os.getpid(), "memory": memory_usage()},
+            "workers": [
+                {
+                    "index": w.index,
+                    "pid": w.pid,
+                    "port": w.port,
+                    "ready": w.ready,
+                    "restarts": w.restarts,
+                    "streams": w.streams,
+                    "memory": memory_usage(str(w.pid))
+                }
+                for w in workers
+            ]
+        })
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        nonlocal stopping
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGCHLD, reap)
+        # Workers that exited before the handler was installed
+        reap()
+        for worker in workers:
+            if not worker.exited:
+                spawn(wait_ready(worker))
+        try:
+            yield
+        finally:
+            stopping = True
+            loop.remove_signal_handler(signal.SIGCHLD)
+            for task in list(tasks):
+                task.cancel()
+            await client.aclose()
+            # Stop the workers here: uvicorn re-raises SIGTERM after shutdown,
+            # so code after uvicorn.run may never run
+            if respawn:
+                _stop_workers(workers)
+
+    methods = ["GET", "POST", "PUT", "DELETE", "PATCH"]
+    routes = [
+        Route("/sse", sse, methods=["GET"]),
+        Route("/workers", worker_status, methods=["GET"])
+    ]
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        routes.append(Route("/metrics", metrics, methods=["GET"]))
+    routes.append(Route("/{path:path}", proxy, methods=methods))
+    return Starlette(
+        routes=routes,
+        # Reject oversized bodies here instead of buffering them for a worker
+        middleware=[Middleware(RequestSizeLimitMiddleware)],
+        lifespan=lifespan
+    )
+
+
+def run(workers: int, host: str, port: int, worker_base_port: Optional[int] = None):
+    """Load the model, fork the workers and serve the dispatcher.
+
+    Args:
+        workers: Number of worker processes
+        host: Public host to bind the dispatcher to
+        port: Public port to bind the dispatcher to
+        worker_base_port: First private worker port, defaults to port + 1
+
+    Raises:
+        ValueError: If streamable HTTP is stateful, which the round-robin dispatch cannot serve
+    """
+    if not MCP_STATELESS_HTTP:
+        raise ValueError(
+            "WORKERS>1 requires MCP_STATELESS_HTTP=true: the dispatcher does not pin streamable HTTP "
+            "sessions to a worker, set MCP_STATELESS_HTTP=true or run a single worker"
+        )
+    start = time.monotonic()
+    worker_base_port = worker_base_port or port + 1
+
+    # Metric files left by a previous run would be summed into this one
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+
+    # Load the models before forking so their weights are shared copy-on-write
+    get_embedding_service()
+    get_rerank_service()
+    model_loaded = time.monotonic()
+    # Move everything allocated so far out of the collector's reach, otherwise
+    # the first GC pass in each worker touches (and copies) every shared page
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Embedding model loaded in parent in {model_loaded - start:.1f}s, memory: {memory_usage()}")
+
+    children = [_fork_worker(index, worker_base_port + index) for index in range(workers)]
+    logger.info(f"Forked {workers} workers on ports {worker_base_port}-{worker_base_port + workers - 1} in {time.monotonic() - start:.1f}s")
+
+    try:
+        logger.info(f"Starting dispatcher on {host}:{port}, worker status at /workers")
+        uvicorn.run(
+            create_dispatcher_app(
+                children,
+                lambda worker: _fork_worker(worker.index, worker.port, worker.restarts + 1, from_dispatcher=True)
+            ),
+            host=host,
+            port=port,
+            log_level="warning"
+        )
+    finally:
+        _stop_workers(children)
+        sys.exit(0)
@@ -1,15 +1,22 @@
+import threading
+from collections import OrderedDict
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from loguru import logger
 
-from app.config.settings import EMBEDDING_MODEL, VECTOR_DIMENSION
+from app.config.settings import EMBEDDING_MODEL, VECTOR_DIMENSION, EMBEDDING_CACHE_SIZE
+from app.utils.metrics import EMBEDDING_QUEUE_DEPTH, CACHE_REQUESTS, CACHE_HIT_RATIO
 
 
 class EmbeddingService:
     """Service for creating embeddings from text."""
     
-    def __init__(self):
-        """Initialize the embedding service."""
+    def __init__(self, cache_size: int = EMBEDDING_CACHE_SIZE):
+        """Initialize the embedding service.
+        
+        Args:
+            cache_size: Number of query embeddings to keep in the LRU cache, 0 to disable
+        """
         logger.info(f"Loading embedding model: {EMBEDDING_MODEL}")
         self.model = SentenceTransformer(EMBEDDING_MODEL)
         self.dimension = VECTOR_DIMENSION
@@ -21,12 +28,41 @@ class EmbeddingService:
             self.dimension = model_dimension
         
         logger.info(f"Embedding model loaded with dimension: {self.dimension}")
+        
+        # LRU cache of query embeddings, repeated searches skip the model
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_lookups = 0
     
-    def embed(self, text: str) -> np.ndarray:
+    def _cache_get(self, text: str):
+        """Look up a cached embedding and record the hit or miss."""
+        with self._cache_lock:
+            embedding = self._cache.get(text)
+            if embedding is not None:
+                self._cache.move_to_end(text)
+                self._cache_hits += 1
+            self._cache_lookups += 1
+            hit_ratio = self._cache_hits / self._cache_lookups
+        CACHE_REQUESTS.labels("embedding", "hit" if embedding is not None else "miss").inc()
+        CACHE_HIT_RATIO.labels("embedding").set(hit_ratio)
+        return embedding
+    
+    def _cache_put(self, text: str, embedding: np.ndarray):
+        """Add an embedding to the cache, evicting the least recently used one."""
+        with self._cache_lock:
+            self._cache[text] = embedding
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def embed(self, text: str, use_cache: bool = True) -> np.ndarray:
         """Create an embedding vector from the given text.
         
         Args:
             text: The text to embed
+            use_cache: Whether to use the query embedding cache, off for documents being stored
             
         Returns:
             The embedding vector as a numpy array
@@ -35,9 +71,23 @@ class EmbeddingService:
             # Return a zero vector for empty text
             return np.zeros(self.dimension, dtype=np.float32)
         
+        use_cache = use_cache and self.cache_size > 0
+        if use_cache:
+            embedding = self._cache_get(text)
+            if embedding is not None:
+                return embedding
+        
         # Create embedding
-        embedding = self.model.encode(text, normalize_embeddings=True)
-        return embedding.astype(np.float32)
+        EMBEDDING_QUEUE_DEPTH.inc()
+        try:
+            embedding = self.model.encode(text, normalize_embeddings=True).astype(np.float32)
+        finally:
+            EMBEDDING_QUEUE_DEPTH.dec()
+        if use_cache:
+            # Cached arrays are shared between callers and must not be modified
+            embedding.flags.writeable = False
+            self._cache_put(text, embedding)
+        return embedding
     
     def batch_embed(self, texts: list[str]) -> list[np.ndarray]:
         """Create embedding vectors for a batch of texts.
@@ -57,7 +107,11 @@ class EmbeddingService:
         
         # Create embeddings for non-empty texts
         if non_empty_texts:
-            embeddings = self.model.encode(non_empty_texts, normalize_embeddings=True)
+            EMBEDDING_QUEUE_DEPTH.inc(len(non_empty_texts))
+            try:
+                embeddings = self.model.encode(non_empty_texts, normalize_embeddings=True)
+            finally:
+                EMBEDDING_QUEUE_DEPTH.dec(len(non_empty_texts))
             embeddings = embeddings.astype(np.float32)
         else:
             embeddings = []
@@ -68,4 +122,19 @@ class EmbeddingService:
             if idx < len(embeddings):
                 result[embedding_idx] = embeddings[idx]
         
-        return result 
\ No newline at end of file
+        return result
+
+    @staticmethod
+    def binarize(embedding: np.ndarray) -> bytes:
+        """Sign-binarize an embedding vector for Hamming search.
+
+        Each dimension becomes one bit (1 if the value is positive), packed
+        into bytes as expected by Milvus BINARY_VECTOR fields.
+
+        Args:
+            embedding: The float embedding vector
+
+        Returns:
+            The packed binary vector
+        """
+        return np.packbits(np.asarray(embedding) > 0).tobytes() 
\ No newline at end of file
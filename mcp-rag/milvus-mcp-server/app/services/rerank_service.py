@@ -0,0 +1,40 @@
+from typing import List
+
+import numpy as np
+from sentence_transformers import CrossEncoder
+from loguru import logger
+
+from app.config.settings import RERANK_MODEL, RERANK_MAX_LENGTH
+
+
+class RerankService:
+    """Service for scoring (query, passage) pairs with a cross-encoder."""
+    
+    def __init__(self, model_name: str = RERANK_MODEL):
+        """Initialize the rerank service.
+        
+        Args:
+            model_name: The cross-encoder model, loaded from the local cache if present
+        """
+        logger.info(f"Loading rerank model: {model_name}")
+        self.model = CrossEncoder(model_name, max_length=RERANK_MAX_LENGTH)
+        logger.info(f"Rerank model loaded: {model_name}")
+    
+    def score(self, query: str, passages: List[str]) -> np.ndarray:
+        """Score the relevance of each passage to the query.
+        
+        All pairs go through the model in a single batch, so the cost is one
+        forward pass rather than one per candidate.
+        
+        Args:
+            query: The query text
+            passages: The candidate passages
+            
+        Returns:
+            One relevance score per passage, higher is more relevant
+        """
+        if not passages:
+            return np.zeros(0, dtype=np.float32)
+        pairs = [(query, passage) for passage in passages]
+        scores = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        return np.asarray(scores, dtype=np.float32)
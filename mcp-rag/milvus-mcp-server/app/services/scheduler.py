@@ -0,0 +1,183 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config.settings import SCHEDULER_WEIGHTS, SESSION_CONCURRENCY_QUOTA
+
+
+class _Waiter:
+    """A queued request for a worker slot."""
+
+    __slots__ = ("future", "session_id", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, session_id: Optional[str]):
+        self.future = future
+        self.session_id = session_id
+        self.enqueued_at = time.monotonic()
+
+
+class ToolScheduler:
+    """Weighted fair scheduler for executor worker slots.
+
+    Every request class (e.g. "read" and "write") has its own FIFO queue. When a
+    slot frees up, the non-empty class with the lowest virtual time is served
+    and its virtual time advances by 1 / weight, so with weights read=4 and
+    write=1 searches get four slots for every store while both are backlogged.
+    An optional per-session quota caps how many slots a single session holds.
+    """
+
+    WAIT_SAMPLES = 1024
+
+    def __init__(
+        self,
+        slots: int,
+        weights: Optional[Dict[str, float]] = None,
+        session_quota: int = SESSION_CONCURRENCY_QUOTA
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            slots: Number of requests that may run at the same time
+            weights: Share of the slots per class under contention
+            session_quota: Maximum running requests per session, 0 for no limit
+        """
+        self.slots = slots
+        self.weights = dict(SCHEDULER_WEIGHTS if weights is None else weights)
+        self.session_quota = session_quota
+        self._running = 0
+        self._running_by_class: Dict[str, int] = {}
+        self._running_by_session: Dict[str, int] = {}
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._virtual_time: Dict[str, float] = {}
+        self._wait_samples: Dict[str, Deque[float]] = {}
+        self._wait_totals: Dict[str, List[float]] = {}
+
+    def _queue(self, request_class: str) -> Deque[_Waiter]:
+        """Return the queue for a class, creating it on first use."""
+        queue = self._queues.get(request_class)
+        if queue is None:
+            queue = self._queues[request_class] = deque()
+            self._virtual_time[request_class] = 0.0
+            self._wait_samples[request_class] = deque(maxlen=self.WAIT_SAMPLES)
+            self._wait_totals[request_class] = [0, 0.0, 0.0]  # count, sum, max
+        return queue
+
+    def _under_quota(self, session_id: Optional[str]) -> bool:
+        """Check whether a session may take another slot."""
+        if not self.session_quota or session_id is None:
+            return True
+        return self._running_by_session.get(session_id, 0) < self.session_quota
+
+    def _grant(self, request_class: str, session_id: Optional[str], enqueued_at: float):
+        """Account for a request taking a slot."""
+        self._running += 1
+        self._running_by_class[request_class] = self._running_by_class.get(request_class, 0) + 1
+        if session_id is not None:
+            self._running_by_session[session_id] = self._running_by_session.get(session_id, 0) + 1
+
+        wait = time.monotonic() - enqueued_at
+        self._wait_samples[request_class].append(wait)
+        totals = self._wait_totals[request_class]
+        totals[0] += 1
+        totals[1] += wait
+        totals[2] = max(totals[2], wait)
+
+    def _activate(self, request_class: str):
+        """Bring an idle class's virtual time up to the active classes' so it cannot bank credit."""
+        active = [self._virtual_time[c] for c, q in self._queues.items() if q and c != request_class]
+        if active:
+            self._virtual_time[request_class] = max(self._virtual_time[request_class], min(active))
+
+    async def acquire(self, request_class: str, session_id: Optional[str] = None) -> float:
+        """Wait for a worker slot.
+
+        Args:
+            request_class: The scheduling class of the request
+            session_id: Optional session identifier for the per-session quota
+
+        Returns:
+            The time spent waiting, in seconds
+        """
+        queue = self._queue(request_class)
+        enqueued_at = time.monotonic()
+        if self._running < self.slots and not queue and self._under_quota(session_id):
+            self._grant(request_class, session_id, enqueued_at)
+            self._virtual_time[request_class] += 1.0 / self.weights.get(request_class, 1.0)
+            return 0.0
+
+        if not queue:
+            self._activate(request_class)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), session_id)
+        queue.append(waiter)
+        # Waiters held back by their session quota must not keep free slots from this one
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted right before being cancelled, hand the slot back
+                self.release(request_class, session_id)
+            else:
+                try:
+                    queue.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+        return time.monotonic() - waiter.enqueued_at
+
+    def release(self, request_class: str, session_id: Optional[str] = None):
+        """Return a slot and hand it to the next eligible waiter.
+
+        Args:
+            request_class: The scheduling class the slot was acquired for
+            session_id: The session the slot was acquired for
+        """
+        self._running -= 1
+        self._running_by_class[request_class] -= 1
+        if session_id is not None:
+            self._running_by_session[session_id] -= 1
+            if not self._running_by_session[session_id]:
+                del self._running_by_session[session_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to waiters in weighted fair order."""
+        while self._running < self.slots:
+            candidates = sorted(
+                (self._virtual_time[c], c) for c, q in self._queues.items() if q
+            )
+            granted = False
+            for _, request_class in candidates:
+                queue = self._queues[request_class]
+                for waiter in queue:
+                    if waiter.future.cancelled() or not self._under_quota(waiter.session_id):
+                        continue
+                    queue.remove(waiter)
+                    self._grant(request_class, waiter.session_id, waiter.enqueued_at)
+                    self._virtual_time[request_class] += 1.0 / self.weights.get(request_class, 1.0)
+                    waiter.future.set_result(None)
+                    granted = True
+                    break
+                if granted:
+                    break
+            if not granted:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue lengths, running counts and queue wait times per class."""
+        classes = {}
+        for request_class, queue in self._queues.items():
+            samples = sorted(self._wait_samples[request_class])
+            count, total, maximum = self._wait_totals[request_class]
+            classes[request_class] = {
+                "queued": len(queue),
+                "running": self._running_by_class.get(request_class, 0),
+                "weight": self.weights.get(request_class, 1.0),
+                "wait_count": count,
+                "wait_avg_ms": total / count * 1000 if count else 0.0,
+                "wait_max_ms": maximum * 1000,
+                "wait_p50_ms": samples[len(samples) // 2] * 1000 if samples else 0.0,
+                "wait_p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000 if samples else 0.0
+            }
+        return {"slots": self.slots, "running": self._running, "classes": classes}
@@ -0,0 +1,224 @@
+import math
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+
+from app.config.settings import (
+    REQUEST_TIMEOUT,
+    LOAD_SHED_QUEUE_WAIT,
+    TOOL_EXECUTOR_WORKERS,
+    TOOL_CONCURRENCY_LIMITS,
+    TOOL_CLASSES
+)
+from app.services.scheduler import ToolScheduler
+from app.utils.deadline import set_deadline, remaining_time
+from app.utils.tracing import set_span_attribute
+from app.utils.metrics import (
+    TOOL_REQUESTS, TOOL_ERRORS, TOOL_LATENCY, STAGE_LATENCY, TOOL_IN_FLIGHT, TOOL_QUEUED
+)
+
+
+class OverloadedError(Exception):
+    """Raised when a call is shed because its tool's queue is too slow."""
+
+    def __init__(self, tool: str, retry_after: int):
+        super().__init__(f"{tool} is overloaded, retry after {retry_after}s")
+        self.tool = tool
+        self.retry_after = retry_after
+
+
+class ToolExecutor:
+    """Runs blocking tool work on a bounded thread pool.
+
+    Each tool has its own concurrency cap, so a burst of one tool cannot take
+    every worker thread, and every call is bounded by a deadline that covers
+    both queueing and execution. Worker slots are handed out by a ToolScheduler
+    that shares them between read and write tools by weight.
+
+    The deadline is visible to the worker thread through app.utils.deadline,
+    so embedding and Milvus calls can give up early. When the smoothed queue
+    wait of a tool exceeds shed_queue_wait while calls are still queued, new
+    calls are rejected immediately with OverloadedError instead of queueing
+    up behind work that would miss its deadline anyway.
+    """
+
+    WAIT_EWMA_ALPHA = 0.2
+
+    def __init__(
+        self,
+        max_workers: int = TOOL_EXECUTOR_WORKERS,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+        timeout: float = REQUEST_TIMEOUT,
+        shed_queue_wait: float = LOAD_SHED_QUEUE_WAIT
+    ):
+        """Initialize the tool executor.
+
+        Args:
+            max_workers: Number of worker threads
+            concurrency_limits: Maximum concurrent calls per tool name
+            timeout: Deadline in seconds for a single call
+            shed_queue_wait: Smoothed queue wait in seconds above which calls are shed, 0 to never shed
+        """
+        self.max_workers = max_workers
+        self.concurrency_limits = dict(TOOL_CONCURRENCY_LIMITS if concurrency_limits is None else concurrency_limits)
+        self.timeout = timeout
+        self.shed_queue_wait = shed_queue_wait
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-worker")
+        self.scheduler = ToolScheduler(slots=max_workers)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._queued: Dict[str, int] = {}
+        self._wait_ewma: Dict[str, float] = {}
+        self._shed: Dict[str, int] = {}
+        logger.info(f"Initialized tool executor with {max_workers} workers, limits: {self.concurrency_limits}")
+
+    def _semaphore(self, tool: str) -> asyncio.Semaphore:
+        """Return the concurrency semaphore for a tool, creating it on first use."""
+        semaphore = self._semaphores.get(tool)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency_limits.get(tool, self.max_workers))
+            self._semaphores[tool] = semaphore
+        return semaphore
+
+    def _record_wait(self, tool: str, wait: float):
+        """Fold a queue wait into the tool's moving average."""
+        previous = self._wait_ewma.get(tool)
+        self._wait_ewma[tool] = wait if previous is None else (
+            self.WAIT_EWMA_ALPHA * wait + (1 - self.WAIT_EWMA_ALPHA) * previous
+        )
+
+    def _check_overload(self, tool: str):
+        """Shed a new call while the tool's queue is backed up."""
+        if not self.shed_queue_wait or not self._queued.get(tool):
+            return
+        wait = self._wait_ewma.get(tool, 0.0)
+        if wait >= self.shed_queue_wait:
+            self._shed[tool] = self._shed.get(tool, 0) + 1
+            raise OverloadedError(tool, max(1, math.ceil(wait)))
+
+    async def run(
+        self,
+        tool: str,
+        fn: Callable[..., Any],
+        *args,
+        session_id: Optional[str] = None,
+        **kwargs
+    ) -> Any:
+        """Run a blocking function for a tool on the worker pool.
+
+        Args:
+            tool: The tool name used for concurrency limits, scheduling and stats
+            fn: The blocking function to call
+            *args: Positional arguments for fn
+            session_id: Optional client session, subject to the per-session quota
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The return value of fn
+
+        Raises:
+            OverloadedError: If the call is shed because the tool's queue is backed up
+            asyncio.TimeoutError: If the call does not finish before the deadline
+        """
+        TOOL_REQUESTS.labels(tool).inc()
+        enqueued_at = time.monotonic()
+        try:
+            result = await self._run(tool, fn, args, kwargs, session_id, enqueued_at)
+        except OverloadedError:
+            TOOL_ERRORS.labels(tool, "overloaded").inc()
+            raise
+        except asyncio.TimeoutError:
+            TOOL_ERRORS.labels(tool, "timeout").inc()
+            TOOL_LATENCY.labels(tool).observe(time.monotonic() - enqueued_at)
+            raise
+        except Exception:
+            TOOL_ERRORS.labels(tool, "error").inc()
+            TOOL_LATENCY.labels(tool).observe(time.monotonic() - enqueued_at)
+            raise
+        TOOL_LATENCY.labels(tool).observe(time.monotonic() - enqueued_at)
+        return result
+
+    async def _run(
+        self,
+        tool: str,
+        fn: Callable[..., Any],
+        args: tuple,
+        kwargs: Dict[str, Any],
+        session_id: Optional[str],
+        enqueued_at: float
+    ) -> Any:
+        """Queue, schedule and execute a call, see run()."""
+        loop = asyncio.get_running_loop()
+        deadline = enqueued_at + self.timeout
+        semaphore = self._semaphore(tool)
+
+        request_class = TOOL_CLASSES.get(tool, "read")
+
+        self._check_overload(tool)
+        self._queued[tool] = self._queued.get(tool, 0) + 1
+        TOOL_QUEUED.labels(tool).inc()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.timeout)
+            try:
+                await asyncio.wait_for(
+                    self.scheduler.acquire(request_class, session_id),
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except BaseException:
+                semaphore.release()
+                raise
+        except asyncio.TimeoutError:
+            self._record_wait(tool, time.monotonic() - enqueued_at)
+            raise
+        finally:
+            self._queued[tool] -= 1
+            TOOL_QUEUED.labels(tool).dec()
+        queue_wait = time.monotonic() - enqueued_at
+        self._record_wait(tool, queue_wait)
+        STAGE_LATENCY.labels(tool, "queue").observe(queue_wait)
+        set_span_attribute("mcp.queue_wait_ms", queue_wait * 1000)
+
+        self._in_flight[tool] = self._in_flight.get(tool, 0) + 1
+        TOOL_IN_FLIGHT.labels(tool).inc()
+
+        def finish(_=None):
+            self._in_flight[tool] -= 1
+            TOOL_IN_FLIGHT.labels(tool).dec()
+            self.scheduler.release(request_class, session_id)
+            semaphore.release()
+
+        # Run in a copy of the caller's context carrying the deadline
+        context = contextvars.copy_context()
+        context.run(set_deadline, deadline)
+
+        def call():
+            remaining_time(tool)
+            return fn(*args, **kwargs)
+
+        future = loop.run_in_executor(self._pool, context.run, call)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=max(deadline - time.monotonic(), 0))
+        finally:
+            if future.done():
+                finish()
+            else:
+                # The worker thread cannot be interrupted, keep its slot until it returns
+                future.add_done_callback(finish)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current number of running, queued and shed calls per tool."""
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": dict(self._in_flight),
+            "queued": dict(self._queued),
+            "queue_wait_ewma_ms": {tool: wait * 1000 for tool, wait in self._wait_ewma.items()},
+            "shed": dict(self._shed),
+            "scheduler": self.scheduler.stats()
+        }
+
+    def shutdown(self):
+        """Stop the worker pool without waiting for running calls."""
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,54 @@
+"""
+Collection snapshot commands.
+
+Export a collection's ids, text, metadata and raw vectors to a local snapshot
+(Parquet for scalars, memory-mapped .npy for vectors), or restore one without
+running the embedding model:
+
+    python -m app.snapshot export --collection knowledge_store --output snapshots/knowledge
+    python -m app.snapshot import --collection knowledge_store --input snapshots/knowledge
+"""
+import sys
+import argparse
+
+from app.utils.logging import get_logger
+from app.services.milvus_service import MilvusService
+
+logger = get_logger()
+
+
+def main():
+    """Parse command line arguments and run the snapshot command."""
+    parser = argparse.ArgumentParser(description="Export or import Milvus collection snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export a collection to a snapshot directory")
+    export_parser.add_argument("--collection", type=str, required=True, help="Collection to export")
+    export_parser.add_argument("--output", type=str, required=True, help="Snapshot directory to write")
+    export_parser.add_argument("--batch-size", type=int, default=1000, help="Rows per Milvus round trip")
+
+    import_parser = subparsers.add_parser("import", help="Import a snapshot directory into a collection")
+    import_parser.add_argument("--collection", type=str, required=True, help="Collection to import into")
+    import_parser.add_argument("--input", type=str, required=True, help="Snapshot directory to read")
+    import_parser.add_argument("--batch-size", type=int, default=1000, help="Rows per insert")
+
+    args = parser.parse_args()
+
+    # No embedding service is needed, snapshots carry their vectors
+    milvus_service = MilvusService(embedding_service=None)
+    try:
+        if args.command == "export":
+            manifest = milvus_service.export_collection(args.collection, args.output, args.batch_size)
+            logger.info(f"Snapshot of {manifest['count']} rows written to {args.output}")
+        else:
+            count = milvus_service.import_collection(args.collection, args.input, args.batch_size)
+            logger.info(f"Restored {count} rows into {args.collection}")
+    except Exception as e:
+        logger.error(f"Snapshot {args.command} failed: {e}")
+        sys.exit(1)
+    finally:
+        milvus_service.close()
+
+
+if __name__ == "__main__":
+    main()
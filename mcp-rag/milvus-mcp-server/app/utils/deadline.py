@@ -0,0 +1,40 @@
+import time
+import asyncio
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute time.monotonic() deadline of the request being served, if any.
+# ToolExecutor sets it in a copied context that the worker thread runs in.
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def set_deadline(deadline: Optional[float]):
+    """Set the deadline of the current request.
+
+    Args:
+        deadline: Absolute time.monotonic() deadline, None for no deadline
+    """
+    _deadline.set(deadline)
+
+
+def remaining_time(stage: str = "request") -> Optional[float]:
+    """Return the seconds left before the current request's deadline.
+
+    Meant to be passed as the timeout of blocking calls, e.g. to Milvus.
+
+    Args:
+        stage: Name of the upcoming stage, used in the error message
+
+    Returns:
+        The remaining time in seconds, or None if the request has no deadline
+
+    Raises:
+        asyncio.TimeoutError: If the deadline has already passed
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise asyncio.TimeoutError(f"Deadline exceeded before {stage}")
+    return remaining
@@ -1,36 +1,234 @@
 import os
 import sys
+import time
+import queue
+import random
+import threading
+import traceback
+from typing import Any, Dict, Optional, TextIO
+
+import orjson
 from loguru import logger
 
+from app.config.settings import (
+    LOG_FORMAT, LOG_ENQUEUE, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE, LOG_RATE_LIMIT
+)
+from app.utils.metrics import LOG_RECORDS_SUPPRESSED, LOG_RECORDS_DROPPED
+
 # Configure loguru logger
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE")
 
-# Remove default logger
-logger.remove()
+TEXT_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
 
-# Add new logger with custom format
-logger.add(
-    sys.stderr,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level=LOG_LEVEL,
-    colorize=True
-)
 
-# Add file logger if LOG_FILE is set
-LOG_FILE = os.getenv("LOG_FILE")
-if LOG_FILE:
+def _json_format(record: Dict[str, Any]) -> str:
+    """Format a record as one compact JSON object per line."""
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"]
+    }
+    extra = {key: value for key, value in record["extra"].items() if key != "_json"}
+    if extra:
+        entry["extra"] = extra
+    if record["exception"] is not None:
+        # Keep the traceback inside the object so that every line stays valid JSON
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    record["extra"]["_json"] = orjson.dumps(entry, default=str).decode()
+    return "{extra[_json]}\n"
+
+
+class QueuedSink:
+    """A sink that hands formatted lines to a writer thread.
+
+    Writing to stderr can block when the reader of the pipe (a terminal, docker
+    or systemd) falls behind, and that write would otherwise run on the event
+    loop thread. Here the caller only enqueues; when the queue is full the line
+    is dropped and counted instead of stalling the caller. loguru's own
+    enqueue=True pickles every record through a multiprocessing pipe, which
+    costs the caller more than the write it saves.
+    """
+
+    def __init__(self, stream: TextIO, maxsize: int = LOG_QUEUE_SIZE):
+        self._stream = stream
+        self._maxsize = maxsize
+        self._stopped = False
+        self._start()
+
+    def _start(self):
+        if self._stopped:
+            return
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=self._maxsize)
+        self._thread = threading.Thread(target=self._drain, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message: str):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def _drain(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            try:
+                self._stream.write(message)
+                if self._queue.empty():
+                    self._stream.flush()
+            except (OSError, ValueError):
+                # A closed or broken stream must not kill the writer, later lines would pile up unwritten
+                LOG_RECORDS_DROPPED.inc()
+        try:
+            self._stream.flush()
+        except (OSError, ValueError):
+            pass
+
+    def stop(self):
+        """Write out the queued lines and stop the writer thread (called by logger.remove)."""
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class HotPathLimiter:
+    """Sampling and per-message-type rate limiting for hot-path log lines.
+
+    Each message type has a token bucket refilled at rate lines per second, so a
+    burst of searches produces at most about rate lines per second per type.
+    """
+
+    def __init__(self, sample_rate: float = LOG_SAMPLE_RATE, rate: float = LOG_RATE_LIMIT):
+        self.sample_rate = sample_rate
+        self.rate = rate
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        """Decide whether to emit a line of the given message type.
+
+        Args:
+            key: The message type, e.g. "search_knowledge"
+
+        Returns:
+            Whether the line should be logged
+        """
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            LOG_RECORDS_SUPPRESSED.labels(key).inc()
+            return False
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.rate, now]
+            tokens = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                allowed = False
+            else:
+                bucket[0] = tokens - 1.0
+                allowed = True
+        if not allowed:
+            LOG_RECORDS_SUPPRESSED.labels(key).inc()
+        return allowed
+
+
+_hot_path_limiter = HotPathLimiter()
+
+# The QueuedSink installed by the last configure_logging call, if any
+_queued_sink: Optional[QueuedSink] = None
+
+
+def _restart_queued_sink():
+    """Forked workers (WORKERS>1) do not inherit the writer thread, start a new one."""
+    if _queued_sink is not None:
+        _queued_sink._start()
+
+
+os.register_at_fork(after_in_child=_restart_queued_sink)
+
+
+def should_log(key: str) -> bool:
+    """Check the hot-path limiter before building a per-request log line.
+
+    Checking first skips the f-string and loguru's record creation for the lines
+    that are dropped, which is most of them under load.
+
+    Args:
+        key: The message type
+
+    Returns:
+        Whether the line should be logged
+    """
+    return _hot_path_limiter.allow(key)
+
+
+def configure_logging(
+    level: str = LOG_LEVEL,
+    fmt: str = LOG_FORMAT,
+    enqueue: bool = LOG_ENQUEUE,
+    log_file: Optional[str] = LOG_FILE,
+    sample_rate: float = LOG_SAMPLE_RATE,
+    rate_limit: float = LOG_RATE_LIMIT,
+    stream: TextIO = sys.stderr
+):
+    """(Re)configure the loguru sinks and the hot-path limiter.
+
+    Args:
+        level: Minimum log level
+        fmt: "text" or "json"
+        enqueue: Whether console lines are written from a background thread
+        log_file: Optional rotating log file, written synchronously
+        sample_rate: Fraction of hot-path lines kept
+        rate_limit: Hot-path lines per second per message type, 0 for no limit
+        stream: The console stream
+    """
+    global _queued_sink
+    if fmt not in ("text", "json"):
+        raise ValueError(f"Unknown LOG_FORMAT: {fmt}")
+    format_ = _json_format if fmt == "json" else TEXT_FORMAT
+    colorize = fmt == "text"
+
+    # Remove default logger (and stop the writer thread of a previous QueuedSink)
+    logger.remove()
+
+    _queued_sink = QueuedSink(stream) if enqueue else None
     logger.add(
-        LOG_FILE,
-        rotation="10 MB",
-        retention="1 week",
-        level=LOG_LEVEL
+        _queued_sink or stream,
+        format=format_,
+        level=level,
+        colorize=colorize
     )
 
+    # Add file logger if LOG_FILE is set
+    if log_file:
+        logger.add(
+            log_file,
+            format=format_,
+            rotation="10 MB",
+            retention="1 week",
+            level=level
+        )
+
+    _hot_path_limiter.sample_rate = sample_rate
+    _hot_path_limiter.rate = rate_limit
+
+
+configure_logging()
+
 
 def get_logger():
     """Get the configured logger.
-    
+
     Returns:
         The logger instance
     """
-    return logger 
\ No newline at end of file
+    return logger
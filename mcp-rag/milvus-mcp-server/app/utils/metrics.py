@@ -0,0 +1,90 @@
+"""
+Prometheus metrics for the MCP server.
+
+Served at /metrics. In multi-worker mode, set PROMETHEUS_MULTIPROC_DIR to an
+empty directory so that the dispatcher reports the sum over all workers.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+
+from app.utils.tracing import start_span
+
+# Latency buckets from 1ms to 30s, covering a cached embedding up to a cold collection load
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+TOOL_REQUESTS = Counter(
+    "mcp_tool_requests_total", "Tool calls received", ["tool"]
+)
+TOOL_ERRORS = Counter(
+    "mcp_tool_errors_total", "Tool calls that failed, by error kind", ["tool", "error"]
+)
+TOOL_LATENCY = Histogram(
+    "mcp_tool_duration_seconds", "End-to-end tool call latency including queueing", ["tool"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "mcp_stage_duration_seconds",
+    "Latency of a tool call stage (queue, embed, milvus, convert, rescore, rerank, serialize)",
+    ["tool", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+TOOL_IN_FLIGHT = Gauge(
+    "mcp_tool_in_flight", "Tool calls running on the worker pool", ["tool"], multiprocess_mode="livesum"
+)
+TOOL_QUEUED = Gauge(
+    "mcp_tool_queued", "Tool calls waiting for a worker slot", ["tool"], multiprocess_mode="livesum"
+)
+EMBEDDING_QUEUE_DEPTH = Gauge(
+    "embedding_queue_depth", "Texts being embedded or waiting for the model", multiprocess_mode="livesum"
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by result", ["cache", "result"]
+)
+CACHE_HIT_RATIO = Gauge(
+    "cache_hit_ratio", "Cache hits over lookups since start", ["cache"], multiprocess_mode="liveall"
+)
+LOG_RECORDS_SUPPRESSED = Counter(
+    "log_records_suppressed_total", "Hot-path log lines skipped by sampling or rate limiting", ["key"]
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log lines dropped because the log queue was full"
+)
+
+
+@contextmanager
+def observe_stage(tool: str, stage: str) -> Iterator[None]:
+    """Record the duration of a block as one stage of a tool call.
+
+    The stage is also traced as a span named "<tool>.<stage>".
+
+    Args:
+        tool: The tool (or service operation) the stage belongs to
+        stage: The stage name
+    """
+    start = time.perf_counter()
+    try:
+        with start_span(f"{tool}.{stage}", child_only=True):
+            yield
+    finally:
+        STAGE_LATENCY.labels(tool, stage).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format.
+
+    Returns:
+        The response body and its content type
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
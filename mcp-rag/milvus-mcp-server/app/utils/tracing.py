@@ -0,0 +1,128 @@
+"""
+OpenTelemetry tracing for the MCP server.
+
+Tracing is off unless TRACING_EXPORTER is set:
+- "file": spans are appended as JSON lines to TRACING_FILE
+- "otlp": spans are sent over OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT
+  (default http://localhost:4318)
+
+Clients pass their trace context as a W3C "traceparent" entry in the _meta
+of a tools/call request, so the server's spans join the client's trace.
+When tracing is off every helper here is a no-op.
+
+The client and server are deployed separately and cannot share a module, so
+milvus-mcp-client/app/tracing.py repeats the exporter setup. The settings
+and the JSON lines format must stay the same in both files so that their
+trace files can be read together; change them together.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from loguru import logger
+
+from app.config.settings import TRACING_EXPORTER, TRACING_FILE, TRACING_SERVICE_NAME
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+except ImportError:  # tracing is optional
+    trace = None
+
+_tracer = None
+_propagator = TraceContextTextMapPropagator() if trace is not None else None
+
+
+class _JSONLinesSpanExporter:
+    """Append finished spans to a file, one JSON document per line."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> Any:
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        with self._lock:
+            for span in spans:
+                self._file.write(span.to_json(indent=None) + "\n")
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def init_tracing(service_name: str = TRACING_SERVICE_NAME) -> bool:
+    """Configure the tracer provider and exporter from the settings.
+
+    Args:
+        service_name: The service.name resource attribute of the spans
+
+    Returns:
+        Whether tracing is enabled
+    """
+    global _tracer
+    if not TRACING_EXPORTER:
+        return False
+    if trace is None:
+        logger.warning("TRACING_EXPORTER is set but opentelemetry is not installed, tracing disabled")
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    if TRACING_EXPORTER == "file":
+        exporter = _JSONLinesSpanExporter(TRACING_FILE)
+    elif TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {TRACING_EXPORTER}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("milvus-mcp-server")
+    logger.info(f"Tracing enabled, exporting spans via {TRACING_EXPORTER}")
+    return True
+
+
+@contextmanager
+def start_span(
+    name: str,
+    carrier: Optional[Dict[str, str]] = None,
+    attributes: Optional[Dict[str, Any]] = None,
+    server: bool = False,
+    child_only: bool = False
+) -> Iterator[Any]:
+    """Run a block inside a span, a child of the current span or of carrier's.
+
+    Args:
+        name: The span name
+        carrier: Optional W3C trace context (e.g. {"traceparent": ...}) to continue
+        attributes: Optional span attributes
+        server: Whether the span is the server side of a remote call
+        child_only: Skip the span unless it has a parent, so untraced
+            requests do not produce one root span per stage
+
+    Yields:
+        The span, or None when no span was started
+    """
+    if _tracer is None or (child_only and not carrier and not trace.get_current_span().is_recording()):
+        yield None
+        return
+    parent = _propagator.extract(carrier) if carrier else None
+    kind = trace.SpanKind.SERVER if server else trace.SpanKind.INTERNAL
+    with _tracer.start_as_current_span(name, context=parent, kind=kind, attributes=attributes) as span:
+        yield span
+
+
+def set_span_attribute(key: str, value: Any):
+    """Set an attribute on the current span, if any."""
+    if _tracer is not None:
+        trace.get_current_span().set_attribute(key, value)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Upper-bound recall of binary-quantized search against plain HNSW, with a memory estimate.
+
+The binary pipeline follows the two stages of
+MilvusService._search_knowledge_binary, k * oversample Hamming candidates over
+sign-binarized vectors followed by exact cosine rescoring with the float
+vectors, but its first stage is an exhaustive Hamming scan. The server searches
+a BIN_IVF_FLAT index (nlist=128) with nprobe=16, which only visits part of the
+collection and can miss candidates the scan finds, so the binary_exhaustive_x*
+recalls are an upper bound on what the server achieves with the same
+oversample, not a measurement of it. Recall@k is measured against exact float
+search. If hnswlib is installed, an HNSW index with the server's parameters
+(M=8, efConstruction=64, ef=64) is measured as well.
+
+Memory is not measured: memory_bytes_estimate is computed from the vector count
+and dimension (float and binary vector sizes plus layer-0 HNSW links) and
+ignores Milvus segment, index and process overheads. Compare the server's RSS
+(see /workers) for real numbers.
+
+Usage:
+    python benchmarks/binary_quantization.py --texts corpus.txt
+    python benchmarks/binary_quantization.py --num-vectors 100000
+"""
+import sys
+import time
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to the path to import the app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+HNSW_M = 8
+HNSW_EF_CONSTRUCTION = 64
+HNSW_EF = 64
+
+
+def load_vectors(args):
+    """Embed the corpus with the server's model or generate clustered synthetic vectors."""
+    if args.texts:
+        from app.services.embedding_service import EmbeddingService
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        service = EmbeddingService()
+        vectors = np.asarray(service.batch_embed(texts), dtype=np.float32)
+        rng = np.random.default_rng(args.seed)
+        query_idx = rng.choice(len(vectors), size=min(args.num_queries, len(vectors)), replace=False)
+        # Perturb corpus vectors so queries are near, but not identical to, stored documents
+        queries = vectors[query_idx] + rng.normal(scale=0.05, size=(len(query_idx), vectors.shape[1])).astype(np.float32)
+    else:
+        rng = np.random.default_rng(args.seed)
+        centers = rng.normal(size=(args.num_clusters, args.dimension)).astype(np.float32)
+        labels = rng.integers(0, args.num_clusters, size=args.num_vectors)
+        vectors = centers[labels] + rng.normal(scale=0.6, size=(args.num_vectors, args.dimension)).astype(np.float32)
+        query_labels = rng.integers(0, args.num_clusters, size=args.num_queries)
+        queries = centers[query_labels] + rng.normal(scale=0.6, size=(args.num_queries, args.dimension)).astype(np.float32)
+
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def exact_top_k(vectors, queries, k):
+    """Exact cosine top-k used as ground truth."""
+    scores = queries @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def binary_top_k(vectors, queries, k, oversample):
+    """Exhaustive Hamming first stage with float rescoring.
+
+    Unlike the server's BIN_IVF_FLAT search every vector is scanned, so the
+    recall is an upper bound for the server's pipeline.
+    """
+    packed = np.packbits(vectors > 0, axis=1)
+    packed_queries = np.packbits(queries > 0, axis=1)
+    popcount = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+    results = []
+    for query, packed_query in zip(queries, packed_queries):
+        distances = popcount[np.bitwise_xor(packed, packed_query)].sum(axis=1)
+        candidates = np.argpartition(distances, min(k * oversample, len(distances) - 1))[:k * oversample]
+        rescored = vectors[candidates] @ query
+        results.append(candidates[np.argsort(-rescored)[:k]])
+    return np.asarray(results)
+
+
+def hnsw_top_k(vectors, queries, k):
+    """HNSW search with the server's index parameters, if hnswlib is available."""
+    try:
+        import hnswlib
+    except ImportError:
+        return None
+    index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+    index.init_index(max_elements=len(vectors), M=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION)
+    index.add_items(vectors)
+    index.set_ef(max(HNSW_EF, k))
+    labels, _ = index.knn_query(queries, k=k)
+    return labels
+
+
+def recall(found, truth):
+    """Mean recall@k of found ids against ground truth ids."""
+    hits = [len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]
+    return float(np.mean(hits))
+
+
+def memory_estimate(num_vectors, dimension):
+    """Estimate the resident index memory in bytes for each layout from the vector sizes alone."""
+    float_bytes = num_vectors * dimension * 4
+    # HNSW keeps the float vectors plus ~2*M neighbour ids per node on layer 0
+    hnsw_bytes = float_bytes + num_vectors * HNSW_M * 2 * 4
+    # The binary layout keeps 1 bit per dimension in memory, float vectors are mmapped
+    binary_bytes = num_vectors * dimension // 8
+    return {"hnsw_float": hnsw_bytes, "binary_resident": binary_bytes, "float_mmapped": float_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary quantization recall benchmark with a memory estimate")
+    parser.add_argument("--texts", type=str, help="Text file with one document per line to embed")
+    parser.add_argument("--num-vectors", type=int, default=50000, help="Synthetic corpus size")
+    parser.add_argument("--num-clusters", type=int, default=200, help="Synthetic topic clusters")
+    parser.add_argument("--dimension", type=int, default=384, help="Synthetic vector dimension")
+    parser.add_argument("--num-queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--oversample", type=str, default="1,2,4,8", help="Comma-separated oversample factors")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    vectors, queries = load_vectors(args)
+    truth = exact_top_k(vectors, queries, args.k)
+    report = {
+        "num_vectors": len(vectors),
+        "dimension": vectors.shape[1],
+        "k": args.k,
+        "memory_bytes_estimate": memory_estimate(len(vectors), vectors.shape[1]),
+        "binary_first_stage": "exhaustive Hamming scan, upper bound for the server's BIN_IVF_FLAT nprobe=16 search",
+        "recall": {}
+    }
+
+    start = time.perf_counter()
+    hnsw = hnsw_top_k(vectors, queries, args.k)
+    if hnsw is not None:
+        report["recall"]["hnsw"] = {"recall": recall(hnsw, truth), "seconds": time.perf_counter() - start}
+
+    for oversample in (int(x) for x in args.oversample.split(",")):
+        start = time.perf_counter()
+        found = binary_top_k(vectors, queries, args.k, oversample)
+        report["recall"][f"binary_exhaustive_x{oversample}"] = {
+            "recall": recall(found, truth),
+            "seconds": time.perf_counter() - start
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""
+Load test for the MCP server: many concurrent sessions replaying a tool mix.
+
+The generator opens --sessions MCP sessions and fires tool calls at --rate calls
+per second (Poisson arrivals, open loop: a slow server does not slow down the
+arrivals), picking the tool of each call from --mix and spreading calls over the
+sessions round robin. Latency is measured from the scheduled arrival time, so
+client-side queueing is not hidden. The report gives throughput, error counts
+and p50/p95/p99 latency per tool and overall as JSON, for regression tracking.
+
+With --spawn the server is started as a subprocess that runs fully offline:
+Milvus Lite in the server process (MILVUS_LITE_PATH pointing to a temporary file) and
+the embedding model from the local Hugging Face cache (HF_HUB_OFFLINE=1). Use a
+small model, e.g. --model all-MiniLM-L6-v2. The store is seeded with
+--seed-docs documents and FAQs before measuring.
+
+Usage:
+    python benchmarks/load_test.py --spawn --sessions 50 --rate 100 --duration 60
+    python benchmarks/load_test.py --url http://localhost:8080 --mix searchKnowledge=8,storeKnowledge=2
+    python benchmarks/load_test.py --spawn --output results/load.json
+"""
+import os
+import sys
+import time
+import json
+import random
+import signal
+import asyncio
+import argparse
+import tempfile
+import itertools
+import statistics
+import subprocess
+from pathlib import Path
+from contextlib import AsyncExitStack
+from collections import defaultdict
+
+import httpx
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+SERVER_DIR = Path(__file__).parent.parent
+
+TOOLS = ("storeKnowledge", "searchKnowledge", "storeFAQ", "searchFAQ")
+
+WORDS = (
+    "milvus vector index collection partition embedding query search recall latency throughput "
+    "cluster replica segment shard memory disk cache model token document chunk metadata schema "
+    "field filter score rerank hybrid sparse dense keyword server client session transport request "
+    "response timeout retry backup snapshot import export deploy config monitor metric trace log"
+).split()
+
+
+def sentence(rng: random.Random, min_words: int = 6, max_words: int = 24) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def parse_mix(mix: str):
+    """Parse "tool=weight,..." into tool names and weights."""
+    tools, weights = [], []
+    for part in mix.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in TOOLS:
+            raise SystemExit(f"Unknown tool in --mix: {name}")
+        tools.append(name)
+        weights.append(float(weight or 1))
+    return tools, weights
+
+
+def tool_arguments(tool: str, rng: random.Random, args, texts):
+    if tool == "storeKnowledge":
+        content = rng.choice(texts) if texts else " ".join(sentence(rng) for _ in range(rng.randint(3, 10)))
+        return {"content": content, "metadata": {"source": "load_test"}}
+    if tool == "storeFAQ":
+        return {"question": sentence(rng, 5, 12) + "?", "answer": sentence(rng, 10, 40), "metadata": {"source": "load_test"}}
+    query = rng.choice(texts)[:200] if texts and rng.random() < 0.5 else sentence(rng, 3, 12)
+    return {"query": query, "size": args.size}
+
+
+def classify(result) -> str:
+    """Return "ok" or the error kind of a tool call result."""
+    if result.isError:
+        return "tool_error"
+    for part in result.content:
+        text = getattr(part, "text", None)
+        if not text:
+            continue
+        try:
+            body = json.loads(text)
+        except json.JSONDecodeError:
+            return "invalid_json"
+        if isinstance(body, dict) and body.get("status") == "error":
+            return body.get("error", "error")
+    return "ok"
+
+
+def summarize(samples, elapsed):
+    samples = sorted(s * 1000 for s in samples)
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "mean_ms": round(statistics.fmean(samples), 2),
+        "p50_ms": round(samples[int(len(samples) * 0.50)], 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+        "max_ms": round(samples[-1], 2)
+    }
+
+
+class SpawnedServer:
+    """Run app.main as a subprocess with Milvus Lite and an offline model."""
+
+    def __init__(self, args, workdir: str):
+        self.url = f"http://127.0.0.1:{args.port}"
+        self.log_path = os.path.join(workdir, "server.log")
+        env = {
+            **os.environ,
+            "PORT": str(args.port),
+            "HOST": "127.0.0.1",
+            "WORKERS": "1",
+            "MCP_TRANSPORT": "http",
+            "MILVUS_LITE_PATH": args.milvus_lite_path or os.path.join(workdir, "milvus.db"),
+            "HF_HUB_OFFLINE": "1",
+            "TRANSFORMERS_OFFLINE": "1",
+        }
+        if args.model:
+            env["EMBEDDING_MODEL"] = args.model
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "app.main"], cwd=str(SERVER_DIR), env=env,
+            stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+    async def wait_ready(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise SystemExit(f"Server exited with code {self.process.returncode}, see {self.log_path}")
+                try:
+                    if (await client.get(f"{self.url}/api/v1/tools")).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.5)
+        raise SystemExit(f"Server not ready after {timeout}s, see {self.log_path}")
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self._log.close()
+
+
+async def open_sessions(stack: AsyncExitStack, args):
+    sessions = []
+    for _ in range(args.sessions):
+        if args.transport == "http":
+            read, write, _ = await stack.enter_async_context(streamablehttp_client(f"{args.url}/mcp"))
+        else:
+            read, write = await stack.enter_async_context(sse_client(f"{args.url}/sse"))
+        session = await stack.enter_async_context(ClientSession(read, write))
+        await session.initialize()
+        sessions.append(session)
+    return sessions
+
+
+async def seed(sessions, args, rng, texts):
+    """Fill the store so that searches have something to rank."""
+    semaphore = asyncio.Semaphore(len(sessions))
+    cycle = itertools.cycle(sessions)
+
+    async def store(tool):
+        async with semaphore:
+            result = await next(cycle).call_tool(tool, tool_arguments(tool, rng, args, texts))
+            if classify(result) != "ok":
+                raise RuntimeError(f"Seeding with {tool} failed: {result.content}")
+
+    await asyncio.gather(*(store(tool) for _ in range(args.seed_docs) for tool in ("storeKnowledge", "storeFAQ")))
+
+
+async def run_load(sessions, args, rng, texts):
+    """Fire calls at the target rate and collect latencies and error kinds."""
+    tools, weights = parse_mix(args.mix)
+    latencies = defaultdict(list)
+    outcomes = defaultdict(lambda: defaultdict(int))
+    cycle = itertools.cycle(sessions)
+    pending = set()
+    skipped = 0
+
+    async def fire(tool, session, scheduled, record):
+        try:
+            result = await session.call_tool(tool, tool_arguments(tool, rng, args, texts))
+            outcome = classify(result)
+        except Exception as e:
+            outcome = type(e).__name__
+        if record:
+            outcomes[tool][outcome] += 1
+            if outcome == "ok":
+                latencies[tool].append(time.perf_counter() - scheduled)
+
+    start = time.perf_counter()
+    measure_start = start + args.warmup
+    end = measure_start + args.duration
+    scheduled = start
+    while True:
+        scheduled += rng.expovariate(args.rate)
+        if scheduled >= end:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        record = scheduled >= measure_start
+        if len(pending) >= args.max_outstanding:
+            # The generator itself would queue; count instead of distorting the arrivals
+            skipped += record
+            continue
+        tool = rng.choices(tools, weights)[0]
+        task = asyncio.create_task(fire(tool, next(cycle), scheduled, record))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending, timeout=args.drain_timeout)
+    elapsed = args.duration
+
+    report = {"tools": {}, "skipped_client_saturated": skipped}
+    for tool in tools:
+        report["tools"][tool] = {
+            **summarize(latencies[tool], elapsed),
+            "outcomes": dict(outcomes[tool])
+        }
+    all_latencies = [l for tool in tools for l in latencies[tool]]
+    sent = sum(sum(o.values()) for o in outcomes.values())
+    report["overall"] = {
+        **summarize(all_latencies, elapsed),
+        "sent": sent,
+        "errors": sent - len(all_latencies),
+        "error_rate": round((sent - len(all_latencies)) / sent, 4) if sent else 0.0
+    }
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="MCP server load test")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Base URL of a running server")
+    parser.add_argument("--spawn", action="store_true", help="Start an offline server (Milvus Lite, local model) as a subprocess")
+    parser.add_argument("--port", type=int, default=18080, help="Port of the spawned server")
+    parser.add_argument("--milvus-lite-path", type=str, default=None, help="Milvus Lite file of the spawned server, defaults to a temporary file")
+    parser.add_argument("--model", type=str, default=None, help="EMBEDDING_MODEL of the spawned server (must be in the local cache)")
+    parser.add_argument("--startup-timeout", type=float, default=300.0, help="Seconds to wait for the spawned server")
+    parser.add_argument("--transport", choices=["http", "sse"], default="http", help="MCP transport of the sessions")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent MCP sessions")
+    parser.add_argument("--rate", type=float, default=50.0, help="Target tool calls per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", type=str, default="searchKnowledge=6,searchFAQ=3,storeKnowledge=1", help="Weighted tool mix")
+    parser.add_argument("--size", type=int, default=5, help="Results per search")
+    parser.add_argument("--seed-docs", type=int, default=200, help="Documents and FAQs stored before measuring")
+    parser.add_argument("--corpus", type=str, default=None, help="Text file with one document per line to store and query")
+    parser.add_argument("--max-outstanding", type=int, default=2000, help="In-flight calls before arrivals are skipped")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="Seconds to wait for in-flight calls at the end")
+    parser.add_argument("--random-seed", type=int, default=42, help="Seed for the tool mix and synthetic texts")
+    parser.add_argument("--output", type=str, default=None, help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    rng = random.Random(args.random_seed)
+    texts = []
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        if args.spawn:
+            server = SpawnedServer(args, workdir)
+            args.url = server.url
+        try:
+            if server:
+                await server.wait_ready(args.startup_timeout)
+            async with AsyncExitStack() as stack:
+                sessions = await open_sessions(stack, args)
+                if args.seed_docs:
+                    await seed(sessions, args, rng, texts)
+                report = await run_load(sessions, args, rng, texts)
+        finally:
+            if server:
+                server.stop()
+
+    report = {
+        "config": {
+            "url": args.url, "spawned": args.spawn, "transport": args.transport,
+            "sessions": args.sessions, "target_rate": args.rate, "duration_s": args.duration,
+            "mix": args.mix, "size": args.size, "seed_docs": args.seed_docs
+        },
+        **report
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
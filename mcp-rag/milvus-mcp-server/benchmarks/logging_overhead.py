@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Event-loop overhead of hot-path logging under the server's logging modes.
+
+The benchmark replays the per-search log line of MilvusService at a fixed rate
+(1000 per second by default) from an asyncio loop, as the search tools do, and
+measures for each configuration how long the logging call holds the loop and
+how late the loop falls behind its schedule:
+
+- sync:     lines are written to the stream on the calling thread (LOG_ENQUEUE=false)
+- queued:   lines are handed to a writer thread (LOG_ENQUEUE=true)
+- json:     the same with LOG_FORMAT=json
+- limited:  queued, with LOG_RATE_LIMIT=10 lines per second per message type
+- sampled:  queued, keeping LOG_SAMPLE_RATE of the lines
+- off:      the level filters the line out, as a lower bound
+
+With --sink pipe the stream is a pipe drained by a slow reader, like stderr
+under a terminal or a log collector that falls behind; with --sink file it is
+a regular file.
+
+Usage:
+    python benchmarks/logging_overhead.py
+    python benchmarks/logging_overhead.py --sink pipe --qps 1000 --duration 10
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+from pathlib import Path
+
+# Add the parent directory to the path to import the app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from app.utils.logging import configure_logging, should_log
+
+CONFIGURATIONS = {
+    "sync": {"enqueue": False},
+    "queued": {"enqueue": True},
+    "json": {"enqueue": True, "fmt": "json"},
+    "limited": {"enqueue": True, "rate_limit": 10},
+    "sampled": {"enqueue": True, "sample_rate": 0.1},
+    "off": {"level": "WARNING"},
+}
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class SlowPipe:
+    """A line-buffered pipe whose reader drains at most read_rate bytes per second."""
+
+    def __init__(self, read_rate: int):
+        read_fd, write_fd = os.pipe()
+        self.stream = os.fdopen(write_fd, "w", buffering=1, encoding="utf-8")
+        self._reader = os.fdopen(read_fd, "rb", buffering=0)
+        self.lines = 0
+        self._read_rate = read_rate
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        chunk = 4096
+        while True:
+            data = self._reader.read(chunk)
+            if not data:
+                break
+            self.lines += data.count(b"\n")
+            time.sleep(len(data) / self._read_rate)
+
+    def close(self):
+        """Close the write end and wait for the reader to drain the pipe."""
+        self.stream.close()
+        self._thread.join()
+
+
+async def replay(args):
+    """Emit the search log line at args.qps and time each call on the loop."""
+    calls, lags = [], []
+    interval = 1.0 / args.qps
+    start = time.perf_counter()
+    for i in range(int(args.qps * args.duration)):
+        scheduled = start + i * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lags.append(time.perf_counter() - scheduled)
+
+        query = f"how do I configure the vector index {i}"
+        t = time.perf_counter()
+        if should_log("search_knowledge"):
+            logger.info(f"Searching knowledge with query: {query}, size: {args.size}")
+        calls.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return calls, lags, elapsed
+
+
+def run(name, options, args, workdir):
+    """Measure one logging configuration."""
+    if args.sink == "pipe":
+        pipe = SlowPipe(args.pipe_read_rate)
+        stream = pipe.stream
+    else:
+        path = os.path.join(workdir, f"{name}.log")
+        stream = open(path, "w", buffering=1, encoding="utf-8")
+
+    settings = {"level": "INFO", "fmt": "text", "enqueue": False, "log_file": None,
+                "sample_rate": 1.0, "rate_limit": 0, **options}
+    configure_logging(stream=stream, **settings)
+    calls, lags, elapsed = asyncio.run(replay(args))
+    # Stop the writer thread so that every queued line is written
+    logger.remove()
+
+    if args.sink == "pipe":
+        pipe.close()
+        lines = pipe.lines
+    else:
+        stream.close()
+        with open(path, "rb") as f:
+            lines = f.read().count(b"\n")
+
+    calls = sorted(c * 1e6 for c in calls)
+    lags = sorted(l * 1000 for l in lags)
+    return {
+        "achieved_qps": round(len(calls) / elapsed, 1),
+        "lines_written": lines,
+        "call_us": {
+            "mean": round(statistics.fmean(calls), 2),
+            "p50": round(percentile(calls, 0.50), 2),
+            "p99": round(percentile(calls, 0.99), 2),
+            "max": round(calls[-1], 2)
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 0.50), 3),
+            "p99": round(percentile(lags, 0.99), 3),
+            "max": round(lags[-1], 3)
+        },
+        "loop_busy_pct": round(sum(calls) / 1e6 / elapsed * 100, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path logging overhead benchmark")
+    parser.add_argument("--qps", type=int, default=1000, help="Log lines attempted per second")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per configuration")
+    parser.add_argument("--size", type=int, default=5, help="Search size printed in the log line")
+    parser.add_argument("--sink", choices=["file", "pipe"], default="file", help="Where the console sink writes")
+    parser.add_argument("--pipe-read-rate", type=int, default=100000, help="Bytes per second drained from the pipe sink")
+    parser.add_argument("--configs", type=str, default=",".join(CONFIGURATIONS), help="Comma-separated configurations")
+    args = parser.parse_args()
+
+    report = {"qps": args.qps, "duration_s": args.duration, "sink": args.sink, "configurations": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in [c.strip() for c in args.configs.split(",") if c.strip()]:
+            if name not in CONFIGURATIONS:
+                raise SystemExit(f"Unknown configuration: {name}")
+            report["configurations"][name] = run(name, CONFIGURATIONS[name], args, workdir)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Handshake and per-call latency of the MCP transports.
+
+For SSE (/sse), streamable HTTP (/mcp) and stdio the benchmark measures the
+handshake a short-lived client pays before its first call (connect, initialize
+and tools/list) and the latency of tool calls inside an established session.
+Against a stateless server it also measures a bare JSON-RPC tools/call POST to
+/mcp, which needs no handshake at all, both over a pooled connection and with
+a fresh connection per call.
+
+The HTTP transports are measured against a running server; the stdio server is
+started as a subprocess (python -m app.main with MCP_TRANSPORT=stdio), so it
+needs the same Milvus and model configuration as the server.
+
+Usage:
+    python benchmarks/transport_latency.py --url http://localhost:8080
+    python benchmarks/transport_latency.py --transports sse,http --rounds 20 --calls 200
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+from contextlib import asynccontextmanager
+
+import httpx
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+SERVER_DIR = Path(__file__).parent.parent
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    samples = sorted(s * 1000 for s in samples)
+    if not samples:
+        return {}
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 2),
+        "p50_ms": round(samples[len(samples) // 2], 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        "max_ms": round(samples[-1], 2)
+    }
+
+
+@asynccontextmanager
+async def open_transport(transport, args):
+    """Open the read/write streams of a transport."""
+    if transport == "sse":
+        async with sse_client(f"{args.url}/sse") as (read, write):
+            yield read, write
+    elif transport == "http":
+        async with streamablehttp_client(f"{args.url}/mcp") as (read, write, _):
+            yield read, write
+    else:
+        params = StdioServerParameters(
+            command=sys.executable,
+            args=["-m", "app.main"],
+            env={**os.environ, "MCP_TRANSPORT": "stdio", "WORKERS": "1"},
+            cwd=str(SERVER_DIR)
+        )
+        async with stdio_client(params) as (read, write):
+            yield read, write
+
+
+async def measure_transport(transport, args):
+    """Measure handshake and in-session call latency of one transport."""
+    handshakes = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        async with open_transport(transport, args) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                await session.list_tools()
+                handshakes.append(time.perf_counter() - start)
+
+    calls = []
+    async with open_transport(transport, args) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            for i in range(args.warmup + args.calls):
+                start = time.perf_counter()
+                result = await session.call_tool(args.tool, {"query": f"{args.query} {i}", "size": args.size})
+                elapsed = time.perf_counter() - start
+                if result.isError:
+                    raise RuntimeError(f"{args.tool} failed over {transport}: {result.content}")
+                if i >= args.warmup:
+                    calls.append(elapsed)
+
+    return {"handshake": summarize(handshakes), "call": summarize(calls)}
+
+
+async def measure_stateless_post(args):
+    """Measure single-request tool calls against a stateless /mcp endpoint."""
+    headers = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+    def payload(i):
+        return {
+            "jsonrpc": "2.0",
+            "id": i,
+            "method": "tools/call",
+            "params": {"name": args.tool, "arguments": {"query": f"{args.query} {i}", "size": args.size}}
+        }
+
+    async def call(client, i):
+        start = time.perf_counter()
+        response = await client.post(f"{args.url}/mcp", json=payload(i), headers=headers)
+        response.raise_for_status()
+        elapsed = time.perf_counter() - start
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            # MCP_JSON_RESPONSE=false answers with a one-event SSE stream
+            message = json.loads(next(
+                line[len("data:"):] for line in response.text.splitlines() if line.startswith("data:")
+            ))
+        else:
+            message = response.json()
+        if "error" in message or message["result"].get("isError"):
+            raise RuntimeError(f"Stateless call failed: {message}")
+        return elapsed
+
+    pooled = []
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        for i in range(args.warmup + args.calls):
+            elapsed = await call(client, i)
+            if i >= args.warmup:
+                pooled.append(elapsed)
+
+    fresh = []
+    for i in range(args.rounds):
+        # A new client per call includes the TCP connect, like a one-off batch job
+        async with httpx.AsyncClient(timeout=args.timeout) as client:
+            fresh.append(await call(client, i))
+
+    return {"pooled_connection": summarize(pooled), "fresh_connection": summarize(fresh)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare MCP transport latency")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Base URL of the running server")
+    parser.add_argument("--transports", type=str, default="sse,http,stdio,stateless", help="Comma-separated transports to measure")
+    parser.add_argument("--tool", type=str, default="searchKnowledge", help="Tool to call")
+    parser.add_argument("--query", type=str, default="vector database", help="Query text for the tool")
+    parser.add_argument("--size", type=int, default=5, help="Results per search")
+    parser.add_argument("--rounds", type=int, default=10, help="Handshakes (and fresh-connection calls) per transport")
+    parser.add_argument("--calls", type=int, default=100, help="Measured tool calls per transport")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured calls before measuring")
+    parser.add_argument("--timeout", type=float, default=60.0, help="HTTP timeout in seconds")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    report = {"tool": args.tool, "transports": {}}
+    for transport in [t.strip() for t in args.transports.split(",") if t.strip()]:
+        if transport == "stateless":
+            report["transports"][transport] = await measure_stateless_post(args)
+        elif transport in ("sse", "http", "stdio"):
+            report["transports"][transport] = await measure_transport(transport, args)
+        else:
+            raise SystemExit(f"Unknown transport: {transport}")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
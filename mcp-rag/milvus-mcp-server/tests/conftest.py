@@ -0,0 +1,9 @@
+"""Shared test configuration.
+
+The scheduler and executor tests need neither Milvus nor the embedding model,
+they only import the app package from the project root.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
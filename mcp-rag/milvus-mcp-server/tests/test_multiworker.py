@@ -0,0 +1,15 @@
+"""Tests for the multi-worker startup checks."""
+import pytest
+
+from app import multiworker
+
+
+def test_stateful_streamable_http_is_refused(monkeypatch):
+    monkeypatch.setattr(multiworker, "MCP_STATELESS_HTTP", False)
+    forks = []
+    monkeypatch.setattr(multiworker, "_fork_worker", lambda *args, **kwargs: forks.append(args))
+
+    with pytest.raises(ValueError, match="MCP_STATELESS_HTTP"):
+        multiworker.run(2, "127.0.0.1", 18080)
+
+    assert forks == []
@@ -0,0 +1,56 @@
+"""Tests for how the REST API reports service errors."""
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from app.api.mcp import router
+from app.config.settings import STORE_BATCH_MAX_SIZE
+from app.asgi import add_exception_handlers
+from app.dependencies import get_milvus_service_dependency, get_tool_executor
+from app.services.milvus_service import MilvusService
+from app.services.tool_executor import ToolExecutor
+
+
+@pytest.fixture
+def service():
+    """A MilvusService without Milvus or models; requests it rejects fail before using either."""
+    milvus_service = MilvusService.__new__(MilvusService)
+    milvus_service.rerank_service = None
+    return milvus_service
+
+
+@pytest.fixture
+def client(service):
+    executor = ToolExecutor(max_workers=2, concurrency_limits={}, timeout=5, shed_queue_wait=0)
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(router)
+    add_exception_handlers(app)
+    app.dependency_overrides[get_milvus_service_dependency] = lambda: service
+    app.dependency_overrides[get_tool_executor] = lambda: executor
+    yield TestClient(app)
+    executor.shutdown()
+
+
+def test_rerank_without_a_rerank_model_is_a_client_error(client):
+    response = client.post("/api/v1/searchKnowledge", json={"query": "milvus", "rerank": True})
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid_request"
+    assert "RERANK_MODEL" in response.json()["message"]
+
+
+def test_an_oversized_batch_is_a_client_error(client):
+    documents = [{"content": f"document {i}"} for i in range(STORE_BATCH_MAX_SIZE + 1)]
+
+    response = client.post("/api/v1/storeKnowledgeBatch", json={"documents": documents})
+
+    assert response.status_code == 400
+    assert "split it into smaller batches" in response.json()["message"]
+
+
+def test_an_empty_batch_is_a_client_error(client):
+    response = client.post("/api/v1/storeFAQBatch", json={"faqs": []})
+
+    assert response.status_code == 400
+    assert response.json() == {"status": "error", "error": "invalid_request", "message": "The batch is empty"}
@@ -0,0 +1,151 @@
+"""Tests for the weighted fair ToolScheduler."""
+import asyncio
+
+from app.services.scheduler import ToolScheduler
+
+
+async def settle():
+    """Let every task that can make progress run."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def hold(scheduler, request_class, order, session_id=None):
+    """Acquire a slot, record the grant and keep the slot until cancelled."""
+    await scheduler.acquire(request_class, session_id)
+    order.append(request_class if session_id is None else session_id)
+
+
+def test_backlogged_classes_share_slots_by_weight():
+    async def main():
+        scheduler = ToolScheduler(slots=1, weights={"read": 4.0, "write": 1.0}, session_quota=0)
+        await scheduler.acquire("write")
+        order = []
+        for _ in range(10):
+            asyncio.ensure_future(hold(scheduler, "write", order))
+            asyncio.ensure_future(hold(scheduler, "read", order))
+        await settle()
+
+        running = "write"
+        for _ in range(10):
+            scheduler.release(running)
+            await settle()
+            running = order[-1]
+        return order
+
+    order = asyncio.run(main())
+
+    assert order[:10].count("read") == 8
+
+
+def test_an_idle_class_does_not_bank_credit():
+    async def main():
+        scheduler = ToolScheduler(slots=1, weights={"read": 1.0, "write": 1.0}, session_quota=0)
+        for _ in range(5):
+            await scheduler.acquire("read")
+            scheduler.release("read")
+        await scheduler.acquire("read")
+        order = []
+        for _ in range(3):
+            asyncio.ensure_future(hold(scheduler, "read", order))
+        for _ in range(3):
+            asyncio.ensure_future(hold(scheduler, "write", order))
+        await settle()
+
+        running = "read"
+        for _ in range(4):
+            scheduler.release(running)
+            await settle()
+            running = order[-1]
+        return order
+
+    order = asyncio.run(main())
+
+    # Reads ran alone earlier, writes alternate with them instead of being owed five slots
+    assert order.count("write") == 2
+
+
+def test_a_session_cannot_take_more_than_its_quota():
+    async def main():
+        scheduler = ToolScheduler(slots=3, weights={"read": 1.0}, session_quota=2)
+        order = []
+        tasks = [asyncio.ensure_future(hold(scheduler, "read", order, session)) for session in ("a", "a", "a", "b")]
+        await settle()
+        granted = list(order)
+
+        scheduler.release("read", "a")
+        await settle()
+        for task in tasks:
+            task.cancel()
+        return granted, order, scheduler.stats()
+
+    granted, order, stats = asyncio.run(main())
+
+    assert granted == ["a", "a", "b"]
+    assert order == ["a", "a", "b", "a"]
+    assert stats["running"] == 3
+
+
+def test_cancelled_waiters_give_up_their_place():
+    async def main():
+        scheduler = ToolScheduler(slots=1, weights={"read": 1.0}, session_quota=0)
+        await scheduler.acquire("read")
+        order = []
+        cancelled = asyncio.ensure_future(hold(scheduler, "read", order, "cancelled"))
+        waiting = asyncio.ensure_future(hold(scheduler, "read", order, "waiting"))
+        await settle()
+
+        cancelled.cancel()
+        await settle()
+        scheduler.release("read")
+        await settle()
+        waiting.cancel()
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(main())
+
+    assert order == ["waiting"]
+    assert stats["running"] == 1
+    assert stats["classes"]["read"]["queued"] == 0
+
+
+def test_a_waiter_cancelled_after_its_grant_returns_the_slot():
+    async def main():
+        scheduler = ToolScheduler(slots=1, weights={"read": 1.0}, session_quota=0)
+        await scheduler.acquire("read")
+        waiter = asyncio.ensure_future(scheduler.acquire("read"))
+        await settle()
+
+        # Grant the slot and cancel the waiter before it gets to run
+        scheduler.release("read")
+        waiter.cancel()
+        await settle()
+        return waiter.cancelled(), scheduler.stats()
+
+    cancelled, stats = asyncio.run(main())
+
+    assert cancelled
+    assert stats["running"] == 0
+
+
+def test_stats_report_queue_lengths_and_waits():
+    async def main():
+        scheduler = ToolScheduler(slots=1, weights={"read": 4.0, "write": 1.0}, session_quota=0)
+        await scheduler.acquire("read")
+        waiter = asyncio.ensure_future(scheduler.acquire("write"))
+        await settle()
+        queued = scheduler.stats()
+
+        await asyncio.sleep(0.02)
+        scheduler.release("read")
+        wait = await waiter
+        return queued, wait, scheduler.stats()
+
+    queued, wait, stats = asyncio.run(main())
+
+    assert queued["classes"]["write"]["queued"] == 1
+    assert queued["classes"]["read"]["running"] == 1
+    assert wait >= 0.02
+    assert stats["classes"]["write"]["wait_count"] == 1
+    assert stats["classes"]["write"]["wait_max_ms"] >= 20
+    assert stats["classes"]["read"]["weight"] == 4.0
@@ -0,0 +1,172 @@
+"""Tests for ToolExecutor concurrency limits, deadlines and load shedding."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.tool_executor import OverloadedError, ToolExecutor
+
+
+@pytest.fixture
+def release():
+    """An event blocked tool calls wait for, set at the end of every test."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def executor(**kwargs):
+    kwargs.setdefault("max_workers", 4)
+    kwargs.setdefault("concurrency_limits", {})
+    kwargs.setdefault("timeout", 5)
+    kwargs.setdefault("shed_queue_wait", 0)
+    return ToolExecutor(**kwargs)
+
+
+async def until(condition):
+    """Wait until a condition set by a worker thread holds."""
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_calls_run_on_the_pool_and_return_their_result():
+    tools = executor()
+
+    result = asyncio.run(tools.run("searchKnowledge", lambda a, b=0: a + b, 1, b=2))
+
+    assert result == 3
+    assert tools.stats()["in_flight"] == {"searchKnowledge": 0}
+    tools.shutdown()
+
+
+def test_each_tool_is_capped_at_its_concurrency_limit(release):
+    tools = executor(concurrency_limits={"storeKnowledge": 1})
+    running = {"storeKnowledge": 0, "searchKnowledge": 0}
+    peak = {"storeKnowledge": 0, "searchKnowledge": 0}
+    lock = threading.Lock()
+
+    def work(tool):
+        with lock:
+            running[tool] += 1
+            peak[tool] = max(peak[tool], running[tool])
+        release.wait(5)
+        with lock:
+            running[tool] -= 1
+
+    async def main():
+        stores = [asyncio.ensure_future(tools.run("storeKnowledge", work, "storeKnowledge")) for _ in range(3)]
+        searches = [asyncio.ensure_future(tools.run("searchKnowledge", work, "searchKnowledge")) for _ in range(2)]
+        await until(lambda: running["searchKnowledge"] == 2 and running["storeKnowledge"] == 1)
+        stats = tools.stats()
+        release.set()
+        await asyncio.gather(*stores, *searches)
+        return stats
+
+    stats = asyncio.run(main())
+
+    assert peak == {"storeKnowledge": 1, "searchKnowledge": 2}
+    assert stats["queued"]["storeKnowledge"] == 2
+    assert stats["in_flight"] == {"storeKnowledge": 1, "searchKnowledge": 2}
+    tools.shutdown()
+
+
+def test_a_call_past_its_deadline_times_out_but_keeps_its_slot(release):
+    tools = executor(max_workers=1, timeout=0.1)
+    done = threading.Event()
+
+    def work():
+        release.wait(5)
+        done.set()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await tools.run("searchKnowledge", work)
+        held = tools.stats()
+        release.set()
+        await until(done.is_set)
+        await until(lambda: tools.stats()["scheduler"]["running"] == 0)
+        return held, tools.stats()
+
+    held, stats = asyncio.run(main())
+
+    # The worker thread cannot be interrupted, its slot is only returned when it finishes
+    assert held["in_flight"] == {"searchKnowledge": 1}
+    assert held["scheduler"]["running"] == 1
+    assert stats["in_flight"] == {"searchKnowledge": 0}
+    tools.shutdown()
+
+
+def test_a_queued_call_times_out_at_its_deadline(release):
+    tools = executor(concurrency_limits={"storeKnowledge": 1}, timeout=0.2)
+
+    async def main():
+        blocked = asyncio.ensure_future(tools.run("storeKnowledge", release.wait, 5))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await tools.run("storeKnowledge", lambda: None)
+        elapsed = time.monotonic() - started
+        release.set()
+        # The blocked call is past its deadline as well
+        await asyncio.gather(blocked, return_exceptions=True)
+        return elapsed
+
+    elapsed = asyncio.run(main())
+
+    assert 0.15 <= elapsed < 1
+    assert tools.stats()["queued"]["storeKnowledge"] == 0
+    assert tools.stats()["queue_wait_ewma_ms"]["storeKnowledge"] > 0
+    tools.shutdown()
+
+
+def test_calls_are_shed_while_the_queue_is_backed_up(release):
+    tools = executor(concurrency_limits={"storeKnowledge": 1}, shed_queue_wait=1.0)
+
+    async def main():
+        running = asyncio.ensure_future(tools.run("storeKnowledge", release.wait, 5))
+        queued = asyncio.ensure_future(tools.run("storeKnowledge", lambda: "queued"))
+        await asyncio.sleep(0.05)
+        tools._wait_ewma["storeKnowledge"] = 2.5
+
+        with pytest.raises(OverloadedError) as shed:
+            await tools.run("storeKnowledge", lambda: None)
+        # Other tools are not affected by the backed-up queue
+        other = await tools.run("searchKnowledge", lambda: "search")
+
+        release.set()
+        results = await asyncio.gather(running, queued)
+        return shed.value, other, results
+
+    error, other, results = asyncio.run(main())
+
+    assert error.tool == "storeKnowledge"
+    assert error.retry_after == 3
+    assert other == "search"
+    assert results == [True, "queued"]
+    assert tools.stats()["shed"] == {"storeKnowledge": 1}
+    tools.shutdown()
+
+
+def test_a_slow_average_alone_does_not_shed_calls():
+    tools = executor(shed_queue_wait=1.0)
+    tools._wait_ewma["storeKnowledge"] = 2.5
+
+    result = asyncio.run(tools.run("storeKnowledge", lambda: "stored"))
+
+    # Nothing is queued any more, so the backlog behind the average has drained
+    assert result == "stored"
+    assert tools.stats()["shed"] == {}
+    tools.shutdown()
+
+
+def test_queue_waits_are_smoothed():
+    tools = executor()
+
+    tools._record_wait("searchKnowledge", 1.0)
+    tools._record_wait("searchKnowledge", 0.0)
+
+    assert tools.stats()["queue_wait_ewma_ms"]["searchKnowledge"] == pytest.approx(800)
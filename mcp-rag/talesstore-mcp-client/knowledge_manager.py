@@ -1,6 +1,7 @@
 import json
 from mcp import ClientSession
 from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
 from typing import Any, List
 from contextlib import AsyncExitStack
 import asyncio
@@ -60,15 +61,19 @@ class MCPClient:
         
         for attempt in range(max_retries):
             try:
-                self._client = sse_client(self.host, timeout=10)  # 创建SSE客户端，设置超时时间为10秒
-                # 使用异步上下文管理器栈(exit_stack)进入SSE客户端的异步上下文
-                stdio_transport = await self.exit_stack.enter_async_context(self._client)  # 进入异步上下文并获取传输对象
-                read, write = stdio_transport  # 解包获取读写通道
-                
-                # Add a short delay to ensure server initialization is complete
-                await asyncio.sleep(1)
+                if self.host.rstrip('/').endswith('/mcp'):
+                    # Streamable HTTP：每次调用是一个普通的 HTTP 请求，无需维持长连接
+                    self._client = streamablehttp_client(self.host, timeout=10)
+                    read, write, _ = await self.exit_stack.enter_async_context(self._client)
+                else:
+                    self._client = sse_client(self.host, timeout=10)  # 创建SSE客户端，设置超时时间为10秒
+                    # 使用异步上下文管理器栈(exit_stack)进入SSE客户端的异步上下文
+                    stdio_transport = await self.exit_stack.enter_async_context(self._client)  # 进入异步上下文并获取传输对象
+                    read, write = stdio_transport  # 解包获取读写通道
                 
                 self.session = await self.exit_stack.enter_async_context(ClientSession(read, write))  # 创建并进入客户端会话
+                # 握手完成即表示服务器已就绪，无需固定等待
+                await self.session.initialize()
                 
                 # Test the connection by listing tools
                 await self.get_available_tools()